@@ -1,9 +1,14 @@
 
+import time
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
 
+from cachetools import TTLCache
+
 from sqlalchemy import select
 
+from app.auth.principal import ClaimsPrincipal, principal_cache
+from app.auth.revocation import revocation_list
 from app.database import async_db
 from app.models import user_model
 from app.schemas.token import TokenData
@@ -18,19 +23,42 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
+CLAIMS_TOKEN_EXPIRE_MINUTES = settings.claims_token_expire_minutes
+
+# Recently verified tokens, so a client's repeated requests skip the signature check
+_verified_tokens = TTLCache(maxsize=settings.verified_tokens_max, ttl=60)
 
 
-async def create_access_token(data: dict):
+async def create_access_token(data: dict, user: user_model.User = None):
     """
     Generate a JWT access token
+
+    When `settings.access_token_claims` is on and the user is given, the token also
+    carries the user's role, blocked, verified and active flags and password change
+    time, and expires after `CLAIMS_TOKEN_EXPIRE_MINUTES`. See `get_current_user_claims`.
+
     Args:
         data (dict): payload to include in the access token
+        user (user_model.User, optional): the user the token is issued to
     Returns:
         str: the access token
     """
     to_encode = data.copy()
-
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    now = datetime.now(timezone.utc)
+
+    if settings.access_token_claims and user is not None:
+        expire = now + timedelta(minutes=CLAIMS_TOKEN_EXPIRE_MINUTES)
+        to_encode.update({
+            "claims": True,
+            "iat": int(now.timestamp()),
+            "role": user.role,
+            "blocked": user.blocked,
+            "verified": user.verified,
+            "active": user.active,
+            "pwd": int(user.password_changed.timestamp()),
+        })
+    else:
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
 
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
@@ -38,6 +66,28 @@ async def create_access_token(data: dict):
     return encoded_jwt
 
 
+def decode_token(token: str) -> dict:
+    """
+    Verify a token's signature and expiry and return its payload.
+
+    Args:
+        token (str): The token to decode.
+
+    Returns:
+        dict: The payload.
+
+    Raises:
+        JWTError: If the token is invalid or expired.
+    """
+    payload = _verified_tokens.get(token)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        return payload
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    _verified_tokens[token] = payload
+    return payload
+
+
 def verify_access_token(token: str, credentials_exception):
     """
     Verify an access token and retrieve the user's ID.
@@ -55,7 +105,7 @@ def verify_access_token(token: str, credentials_exception):
 
     try:
 
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         id: str = payload.get("user_id")
         if id is None:
             raise credentials_exception
@@ -66,33 +116,95 @@ def verify_access_token(token: str, credentials_exception):
 
     return token_data
     
+def _credentials_exception():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED, 
+        detail="Could not validate credentials", 
+        headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(async_db.get_async_session)):
     """
     Get the currently authenticated user.
 
+    The user is served from `principal_cache` when possible, so most requests do not
+    touch the database. The result is a read-only `Principal`; handlers that modify
+    the user must load the row with `get_token_user` or a query of their own.
+
     Args:
         token (str): The access token.
         db (AsyncSession): The database session.
 
     Returns:
-        user_model.User: The currently authenticated user.
+        Principal: The currently authenticated user, or None if it no longer exists.
 
     Raises:
         HTTPException: If the credentials are invalid.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED, 
-        detail="Could not validate credentials", 
-        headers={"WWW-Authenticate": "Bearer"}
-        )
-    
-    token = verify_access_token(token, credentials_exception)
-    
-    
+    token = verify_access_token(token, _credentials_exception())
+
+    principal = principal_cache.get(token.id)
+    if principal is not None:
+        return principal
+
     user = await db.execute(select(user_model.User).filter(user_model.User.id == token.id))
     user = user.scalar()
+    if user is None:
+        return None
     
-    return user
+    return principal_cache.put(user)
+
+
+async def get_current_user_claims(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(async_db.get_async_session)):
+    """
+    Get the currently authenticated user for read-only endpoints, trusting token claims.
+
+    A claims token whose user has not been revoked since it was issued is answered from
+    the token alone. Any other token goes through `get_current_user`. Handlers using
+    this dependency may read only id, role, blocked, verified, active and password_changed.
+
+    Args:
+        token (str): The access token.
+        db (AsyncSession): The database session, used only when the claims cannot be trusted.
+
+    Returns:
+        ClaimsPrincipal | Principal: The currently authenticated user.
+
+    Raises:
+        HTTPException: If the credentials are invalid.
+    """
+    try:
+        payload = decode_token(token)
+    except JWTError:
+        raise _credentials_exception()
+
+    if payload.get("claims") and payload.get("user_id") is not None:
+        await revocation_list.ensure_fresh(db)
+        if not revocation_list.is_revoked(int(payload["user_id"]), payload["iat"]):
+            return ClaimsPrincipal(payload)
+
+    return await get_current_user(token, db)
+
+
+async def get_token_user(token: str, db: AsyncSession):
+    """
+    Load the `User` row a token belongs to, bypassing the principal cache.
+
+    Args:
+        token (str): The access token.
+        db (AsyncSession): The database session.
+
+    Returns:
+        user_model.User: The user, or None if it no longer exists.
+
+    Raises:
+        HTTPException: If the credentials are invalid.
+    """
+    token = verify_access_token(token, _credentials_exception())
+
+    user = await db.execute(select(user_model.User).filter(user_model.User.id == token.id))
+    return user.scalar()
 
 
 async def create_refresh_token(user_id: str):
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.config.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+PASSWORD_WORKERS = settings.password_workers
+
+# bcrypt releases the GIL, so hashes on this pool run in parallel with the event loop
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+_slots = asyncio.Semaphore(PASSWORD_WORKERS)
+
+
+class PasswordStats:
+    """Queueing and timing counters of the password work done by this worker."""
+
+    def __init__(self):
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "workers": PASSWORD_WORKERS,
+            "waiting": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_seconds / self.completed * 1e3, 3) if self.completed else 0.0,
+            "avg_run_ms": round(self.run_seconds / self.completed * 1e3, 3) if self.completed else 0.0,
+        }
+
+
+stats = PasswordStats()
+
+
+async def _run(fn: Callable[..., T], *args) -> T:
+    """
+    Run a bcrypt call on the password pool once one of its slots is free.
+
+    Raises:
+        HTTPException: 503 if no slot frees up within `settings.password_timeout` seconds.
+    """
+    loop = asyncio.get_running_loop()
+    queued = time.perf_counter()
+
+    stats.waiting += 1
+    try:
+        await asyncio.wait_for(_slots.acquire(), timeout=settings.password_timeout)
+    except asyncio.TimeoutError:
+        stats.timeouts += 1
+        logger.warning("Password check timed out after %.1f s in queue (%d waiting)",
+                       settings.password_timeout, stats.waiting)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Server is busy, please try again",
+                            headers={"Retry-After": "1"})
+    finally:
+        stats.waiting -= 1
+
+    started = time.perf_counter()
+    stats.running += 1
+    try:
+        return await loop.run_in_executor(_executor, fn, *args)
+    finally:
+        stats.running -= 1
+        _slots.release()
+        stats.completed += 1
+        stats.wait_seconds += started - queued
+        stats.run_seconds += time.perf_counter() - started
+
+
+async def hash_password(password: str) -> str:
+    """
+    Hash a password off the event loop.
+
+    Args:
+        password (str): The password to hash.
+
+    Returns:
+        str: The hashed password.
+    """
+    return await _run(pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a plaintext password against its hash off the event loop.
+
+    Args:
+        plain_password (str): The plaintext password to compare.
+        hashed_password (str): The hashed password to compare against.
+
+    Returns:
+        bool: True if the passwords match, False otherwise.
+    """
+    return await _run(pwd_context.verify, plain_password, hashed_password)
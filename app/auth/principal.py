@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from cachetools import TTLCache
+
+from app.config.config import settings
+from app.models import user_model
+
+
+class Principal:
+    """
+    Read-only snapshot of the authenticated user, with the `User` attributes routers read.
+
+    Secrets (password hash, refresh token) are deliberately left out; handlers that
+    change the user load the `User` row themselves.
+    """
+
+    __slots__ = ("id", "email", "user_name", "avatar", "created_at", "role", "verified",
+                 "blocked", "active", "password_changed", "token_verify")
+
+    def __init__(self, user: user_model.User):
+        for name in self.__slots__:
+            object.__setattr__(self, name, getattr(user, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Principal is read-only, load the User row to change '{name}'")
+
+
+class ClaimsPrincipal:
+    """
+    The authorization fields carried by a claims access token, shaped like `Principal`.
+
+    Only id, role, blocked, verified, active and password_changed are available.
+    """
+
+    __slots__ = ("id", "role", "blocked", "verified", "active", "password_changed")
+
+    def __init__(self, payload: dict):
+        object.__setattr__(self, "id", int(payload["user_id"]))
+        object.__setattr__(self, "role", payload["role"])
+        object.__setattr__(self, "blocked", payload["blocked"])
+        object.__setattr__(self, "verified", payload["verified"])
+        object.__setattr__(self, "active", payload["active"])
+        object.__setattr__(self, "password_changed", datetime.fromtimestamp(payload["pwd"], timezone.utc))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"ClaimsPrincipal is read-only, load the User row to change '{name}'")
+
+
+class PrincipalCache:
+    """
+    Per-worker cache of authenticated users, keyed by user ID.
+
+    Changes to a user made by this worker (block, password change, verification,
+    profile update, deletion) call `invalidate()`. Entries expire after `max_age`
+    seconds, which bounds how long a change made by another worker goes unnoticed.
+    """
+
+    def __init__(self, max_age: float, max_users: int):
+        self._users = TTLCache(maxsize=max_users, ttl=max_age)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        principal = self._users.get(user_id)
+        if principal is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return principal
+
+    def put(self, user: user_model.User) -> Principal:
+        principal = Principal(user)
+        self._users[principal.id] = principal
+        return principal
+
+    def invalidate(self, user_id: int):
+        self._users.pop(user_id, None)
+
+    def as_dict(self) -> dict:
+        return {
+            "users": len(self._users),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+principal_cache = PrincipalCache(max_age=settings.principal_max_age, max_users=settings.principal_max_users)
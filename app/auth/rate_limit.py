@@ -0,0 +1,176 @@
+import math
+import time
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+from cachetools import LRUCache
+from fastapi import HTTPException, Request, status
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config.config import settings
+from app.database.async_db import engine_asinc
+from app.models import user_model
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by an arbitrary string, e.g. an email or a client IP.
+
+    Each key may spend `burst` attempts at once and regains `rate_per_minute` per
+    minute. The buckets are rows of `auth_rate_limits`, so every worker and host draws
+    on the same budget and the whole deployment admits the configured rate. Each
+    limiter prefixes its keys with `name`.
+
+    Every worker also keeps a local copy of the buckets it has used, updated from the
+    shared row on each visit and refilled at the same rate in between. Other workers
+    only ever take tokens from the shared row, so the copy never holds fewer than
+    the row: when the copy is empty the attempt is rejected without a database
+    round trip. The least recently used keys are forgotten beyond `max_keys`, which
+    only sends their next attempt to the shared row.
+    """
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_keys: int = 100000):
+        self.name = name
+        self.rate = rate_per_minute / 60
+        self.burst = float(burst)
+        self._local = LRUCache(maxsize=max_keys)
+        self.allowed = 0
+        self.limited = 0
+        self.limited_locally = 0
+
+    def key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    def tokens(self, stored: float, elapsed: float) -> float:
+        return min(self.burst, stored + elapsed * self.rate)
+
+    def local_tokens(self, key: str, now: float) -> float:
+        tokens, updated = self._local.get(key, (self.burst, now))
+        return self.tokens(tokens, now - updated)
+
+    def remember(self, key: str, tokens: float, now: float):
+        self._local[key] = (tokens, now)
+
+    def wait_time(self, tokens: float) -> float:
+        """Seconds until a bucket holding `tokens` may spend an attempt; 0 if it may right now."""
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    @property
+    def refill_seconds(self) -> float:
+        """Time for an empty bucket to fill up again, after which its row carries no information."""
+        return self.burst / self.rate
+
+    def as_dict(self) -> dict:
+        return {
+            "keys": len(self._local),
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "limited_locally": self.limited_locally,
+        }
+
+
+email_limiter = TokenBucketLimiter("email", settings.auth_email_rate_per_minute, settings.auth_email_burst)
+ip_limiter = TokenBucketLimiter("ip", settings.auth_ip_rate_per_minute, settings.auth_ip_burst)
+# Refreshing needs a valid token, and many users may share one address behind a NAT
+refresh_ip_limiter = TokenBucketLimiter("refresh_ip", settings.auth_refresh_ip_rate_per_minute,
+                                        settings.auth_refresh_ip_burst)
+
+LIMITERS = (email_limiter, ip_limiter, refresh_ip_limiter)
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def _reject(waits: List[Tuple[TokenBucketLimiter, float]]):
+    """Raise a 429 if any of `waits` is positive, counting the attempt against each limiter that refused it."""
+    wait = max(seconds for _, seconds in waits)
+    if wait > 0:
+        for limiter, seconds in waits:
+            if seconds > 0:
+                limiter.limited += 1
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail="Too many attempts, please try again later",
+                            headers={"Retry-After": str(math.ceil(wait))})
+
+
+async def enforce(request: Request, scope: str, email: Optional[str] = None,
+                  by_ip: TokenBucketLimiter = ip_limiter, engine: AsyncEngine = engine_asinc):
+    """
+    Admit an authentication attempt or reject it before any other database or bcrypt work.
+
+    The attempt is charged to the client IP and, when given, to the email. It is
+    admitted only if both buckets have an attempt left; a rejected attempt costs nothing.
+    The worker's local buckets turn away attempts it already knows to be over budget.
+    The rest are read and spent in a short transaction on the shared rows, holding
+    them locked, so concurrent attempts on any worker are counted exactly once.
+
+    Args:
+        request (Request): The incoming request.
+        scope (str): Name of the protected action; each action has its own buckets.
+        email (str, optional): The account the attempt targets.
+        by_ip (TokenBucketLimiter, optional): The limiter of the client IP. Defaults to `ip_limiter`.
+        engine (AsyncEngine, optional): The primary database. Defaults to `engine_asinc`.
+
+    Raises:
+        HTTPException: 429 with Retry-After when either bucket is empty.
+    """
+    checks: List[Tuple[TokenBucketLimiter, str]] = [(by_ip, by_ip.key(f"{scope}:{client_ip(request)}"))]
+    if email:
+        checks.append((email_limiter, email_limiter.key(f"{scope}:{email.strip().lower()}")))
+
+    now = time.monotonic()
+    local = [(limiter, limiter.wait_time(limiter.local_tokens(key, now))) for limiter, key in checks]
+    if any(seconds > 0 for _, seconds in local):
+        for limiter, seconds in local:
+            if seconds > 0:
+                limiter.limited_locally += 1
+        _reject(local)
+
+    table = user_model.AuthRateLimit
+    async with engine.begin() as conn:
+        # Missing buckets start full; creating them first lets FOR UPDATE lock every one.
+        # Rows are always taken in key order, so two attempts cannot deadlock.
+        await conn.execute(insert(table).values(sorted(
+            ({"key": key, "tokens": limiter.burst} for limiter, key in checks), key=lambda row: row["key"]
+        )).on_conflict_do_nothing(index_elements=[table.key]))
+
+        rows = await conn.execute(
+            select(table.key, table.tokens, func.extract("epoch", func.now() - table.updated_at))
+            .where(table.key.in_([key for _, key in checks]))
+            .order_by(table.key)
+            .with_for_update()
+        )
+        stored = {key: (tokens, max(float(elapsed), 0.0)) for key, tokens, elapsed in rows}
+
+        buckets = [(limiter, key, limiter.tokens(*stored[key])) for limiter, key in checks]
+        waits = [(limiter, limiter.wait_time(tokens)) for limiter, _, tokens in buckets]
+        if any(seconds > 0 for _, seconds in waits):
+            for limiter, key, tokens in buckets:
+                limiter.remember(key, tokens, now)
+            _reject(waits)
+
+        for limiter, key, tokens in buckets:
+            await conn.execute(update(table).where(table.key == key).values(
+                tokens=tokens - 1, updated_at=func.now()
+            ))
+            limiter.remember(key, tokens - 1, now)
+            limiter.allowed += 1
+
+
+async def prune_buckets(engine: AsyncEngine = engine_asinc):
+    """
+    Delete the buckets that have filled up again, which are the same as no bucket at all.
+
+    Args:
+        engine (AsyncEngine, optional): The primary database. Defaults to `engine_asinc`.
+    """
+    table = user_model.AuthRateLimit
+    async with engine.begin() as conn:
+        for limiter in LIMITERS:
+            await conn.execute(delete(table).where(
+                table.key.startswith(f"{limiter.name}:"),
+                table.updated_at < func.now() - timedelta(seconds=limiter.refill_seconds)
+            ))
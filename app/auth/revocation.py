@@ -0,0 +1,108 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.principal import principal_cache
+from app.config.config import settings
+from app.models import user_model
+
+
+class RevocationList:
+    """
+    Per-worker copy of `token_revocations`: users whose claims tokens may be stale.
+
+    A claims token issued at or before its user's revocation time is no longer
+    trusted on its own. Only revocations younger than a claims token's lifetime
+    matter, so the list stays small. It is reloaded at most every `refresh_every`
+    seconds, which bounds how long another worker's revocation goes unnoticed here;
+    revocations made by this worker apply immediately.
+    """
+
+    def __init__(self, refresh_every: float, horizon: float):
+        self.refresh_every = refresh_every
+        self.horizon = horizon
+        self._revoked: Dict[int, float] = {}
+        self._loaded_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def is_revoked(self, user_id: int, issued_at: float) -> bool:
+        revoked_at = self._revoked.get(user_id)
+        return revoked_at is not None and revoked_at >= issued_at
+
+    def add(self, user_id: int, revoked_at: float):
+        self._revoked[user_id] = max(revoked_at, self._revoked.get(user_id, revoked_at))
+
+    async def ensure_fresh(self, db: AsyncSession):
+        """
+        Reload the list from the database if it is older than `refresh_every` seconds.
+
+        Args:
+            db (AsyncSession): The database session.
+        """
+        if time.monotonic() - self._loaded_at < self.refresh_every:
+            return
+
+        async with self._lock:
+            if time.monotonic() - self._loaded_at < self.refresh_every:
+                return
+
+            loaded_at = time.monotonic()
+            since = datetime.now(timezone.utc) - timedelta(seconds=self.horizon)
+            result = await db.execute(
+                select(user_model.TokenRevocation.user_id, user_model.TokenRevocation.revoked_at)
+                .where(user_model.TokenRevocation.revoked_at > since)
+            )
+            self._revoked = {user_id: revoked_at.timestamp() for user_id, revoked_at in result.all()}
+            self._loaded_at = loaded_at
+
+    def as_dict(self) -> dict:
+        return {
+            "users": len(self._revoked),
+            "age_s": round(time.monotonic() - self._loaded_at, 3) if self._loaded_at > float("-inf") else None,
+        }
+
+
+revocation_list = RevocationList(
+    refresh_every=settings.revocation_refresh_seconds,
+    horizon=settings.claims_token_expire_minutes * 60,
+)
+
+
+async def revoke_user(db: AsyncSession, user_id: int):
+    """
+    Stop trusting the claims tokens already issued to a user, and drop the cached principal.
+
+    Call after committing a change to the user's role, blocked, verified or active
+    status or password. Requests carrying older tokens fall back to a database lookup.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (int): The ID of the user.
+    """
+    principal_cache.invalidate(user_id)
+
+    stmt = insert(user_model.TokenRevocation).values(user_id=user_id, revoked_at=func.now())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[user_model.TokenRevocation.user_id],
+        set_={"revoked_at": stmt.excluded.revoked_at}
+    ).returning(user_model.TokenRevocation.revoked_at)
+    revoked_at = await db.scalar(stmt)
+    await db.commit()
+    revocation_list.add(user_id, revoked_at.timestamp())
+
+
+async def prune_revocations(db: AsyncSession):
+    """
+    Delete revocations older than the lifetime of a claims token.
+
+    Args:
+        db (AsyncSession): The database session.
+    """
+    since = datetime.now(timezone.utc) - timedelta(seconds=revocation_list.horizon)
+    await db.execute(delete(user_model.TokenRevocation).where(user_model.TokenRevocation.revoked_at <= since))
+    await db.commit()
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -26,6 +28,50 @@ class Settings(BaseSettings):
     rout_image: str
     bucket_name_user_avatar: str
     bucket_name_room_image: str
+    room_directory_max_age: int = 15
+    messages_page_max: int = 100
+    sync_settle_seconds: float = 2
+    decrypt_workers: int = 0
+    plaintext_cache_bytes: int = 32 * 1024 * 1024
+    hot_tail_max_age: float = 5
+    hot_tail_max_rooms: int = 1000
+    hot_tail_max_messages: int = 50000
+    room_meta_max_age: float = 30
+    room_meta_max_rooms: int = 10000
+    principal_max_age: float = 30
+    principal_max_users: int = 100000
+    password_workers: int = 4
+    password_timeout: float = 5
+    access_token_claims: bool = False
+    claims_token_expire_minutes: int = 5
+    revocation_refresh_seconds: float = 10
+    auth_email_rate_per_minute: float = 5
+    auth_email_burst: int = 5
+    auth_ip_rate_per_minute: float = 30
+    auth_ip_burst: int = 20
+    auth_refresh_ip_rate_per_minute: float = 300
+    auth_refresh_ip_burst: int = 100
+    verified_tokens_max: int = 10000
+    db_pool_size: int = 5
+    db_max_overflow: int = 5
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    database_replica_url: Optional[str] = None
+    replica_max_lag_seconds: float = 2
+    replica_lag_check_seconds: float = 1
+    read_your_writes_seconds: float = 10
+    startup_attempts: int = 5
+    startup_retry_delay: float = 1
+    client_start_timeout: float = 10
+    partition_months_ahead: int = 3
+    # Absolute path on persistent storage shared by every host; see `app.services.message_archive`
+    archive_dir: str = "/var/lib/project_chat/archive"
+    archive_after_days: int = 180
+    archive_segment_messages: int = 5000
+    archive_cache_segments: int = 32
+    debug: bool = False
+    query_repeat_warning: int = 10
     model_config = SettingsConfigDict(env_file = ".env")
    
 
@@ -3,12 +3,57 @@ import secrets
 import string
 
 from datetime import datetime, timedelta
+from typing import Optional
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 import pytz
-from sqlalchemy import select
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
 from app.models import user_model, room_model, company_model
 from app.config.utils import generate_random_code
+from app.auth import rate_limit, revocation
+from app.config.config import settings
+from app.database import partitions
+from app.database.async_db import engine_asinc
+from app.services import room_stats
+from app.services.message_archive import archive_old_messages
+from app.services.room_directory import room_directory
+from app.services.room_meta import room_meta
+
+# Held for its whole life by the one process that runs the scheduled jobs
+SCHEDULER_LOCK_KEY = 7305004
+
+
+async def acquire_scheduler_lock(engine: AsyncEngine = engine_asinc) -> Optional[AsyncConnection]:
+    """
+    Try once to become the process that runs the scheduled jobs.
+
+    The jobs touch shared tables and files, so of all the workers on all hosts only the
+    one holding a session-level advisory lock schedules them. The lock goes with the
+    connection: when its worker exits, the next worker to start takes it over.
+
+    Args:
+        engine (AsyncEngine, optional): The primary database. Defaults to `engine_asinc`.
+
+    Returns:
+        AsyncConnection | None: The connection holding the lock, to pass to `release_scheduler_lock`
+        on shutdown; None if another process holds it.
+    """
+    conn = await engine.connect()
+    locked = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": SCHEDULER_LOCK_KEY})
+    await conn.commit()
+    if not locked:
+        await conn.close()
+        return None
+    return conn
+
+
+async def release_scheduler_lock(conn: AsyncConnection):
+    # Pooled connections outlive close(), and the lock would go with them
+    await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEDULER_LOCK_KEY})
+    await conn.commit()
+    await conn.close()
+
 
 # scheduler = AsyncIOScheduler()
 def setup_scheduler(db_session_factory):
@@ -16,6 +61,11 @@ def setup_scheduler(db_session_factory):
     scheduler.add_job(delete_old_rooms, 'cron', day='*', hour='0', args=[db_session_factory])
     scheduler.add_job(delete_test_users, 'cron', day='*', hour='0', args=[db_session_factory])
     scheduler.add_job(update_access_token, 'interval', hours=4, args=[db_session_factory])
+    scheduler.add_job(reconcile_room_stats, 'cron', day='*', hour='3')
+    scheduler.add_job(prune_token_revocations, 'interval', hours=1, args=[db_session_factory])
+    scheduler.add_job(prune_rate_limits, 'interval', hours=1)
+    scheduler.add_job(create_message_partitions, 'cron', day='*', hour='2', args=[db_session_factory])
+    scheduler.add_job(archive_messages, 'cron', day='*', hour='4', args=[db_session_factory])
     # scheduler.add_job(update_access_token, 'interval', minutes=1, args=[db_session_factory]) # test functionality
 
     scheduler.start()
@@ -31,6 +81,9 @@ async def delete_old_rooms(db_session_factory):
         for room in old_rooms:
             await db.delete(room)
         await db.commit()
+        room_directory.invalidate()
+        for room in old_rooms:
+            room_meta.invalidate(room.id)
         
         
 async def delete_test_users(db_session_factory):
@@ -57,4 +110,33 @@ async def update_access_token(db_session_factory):
             db.add(company)
         await db.commit()
 
-    
+
+async def reconcile_room_stats():
+    # A connection of its own: the job holds an advisory lock across its many commits
+    async with engine_asinc.connect() as conn:
+        await room_stats.reconcile_room_stats(conn)
+
+
+async def prune_token_revocations(db_session_factory):
+    async with db_session_factory() as db:
+        await revocation.prune_revocations(db)
+
+
+async def prune_rate_limits():
+    await rate_limit.prune_buckets()
+
+
+async def create_message_partitions(db_session_factory):
+    async with db_session_factory() as db:
+        await partitions.ensure_partitions(await db.connection(), settings.partition_months_ahead)
+        await db.commit()
+
+
+async def archive_messages(db_session_factory):
+    older_than = timedelta(days=settings.archive_after_days)
+    async with db_session_factory() as db:
+        await archive_old_messages(db, older_than)
+    # Partitions are detached concurrently, which cannot happen inside a transaction
+    async with engine_asinc.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await partitions.drop_empty_partitions(conn, "socket", datetime.now(pytz.utc) - older_than)
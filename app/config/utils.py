@@ -1,49 +1,14 @@
 import shutil
 from typing import Union
 import uuid
-from passlib.context import CryptContext
 import secrets
 import hashlib
 import string, random
 import os
 from fastapi import HTTPException, UploadFile
 from tempfile import NamedTemporaryFile
-from b2sdk.v2 import InMemoryAccountInfo, B2Api
 from .config import settings
-
-info = InMemoryAccountInfo()
-b2_api = B2Api(info)
-b2_api.authorize_account("production", settings.backblaze_id, settings.backblaze_key)
-
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def hash(password: str):
-    """
-    Hash a password using the CryptContext from passlib.context.
-
-    Args:
-        password (str): The password to hash.
-
-    Returns:
-        str: The hashed password.
-    """
-    return pwd_context.hash(password)
-
-
-def verify(plain_password, hashed_password):
-    """
-    Verify that a plaintext password matches a previously hashed password.
-
-    Args:
-        plain_password (str): The plaintext password to compare.
-        hashed_password (str): The hashed password to compare against.
-
-    Returns:
-        bool: True if the passwords match, False otherwise.
-    """
-    return pwd_context.verify(plain_password, hashed_password)
+from app.services import clients
 
 
 def generate_unique_token(email: str) -> str:
@@ -120,6 +85,7 @@ async def upload_to_backblaze(file: Union[UploadFile, str], image_backed: str) -
         unique_filename = generate_unique_filename(file_name)
 
         bucket_name = image_backed
+        b2_api = await clients.b2.get()
         bucket = b2_api.get_bucket_by_name(bucket_name)
 
         # Upload file to Backblaze B2
@@ -131,6 +97,8 @@ async def upload_to_backblaze(file: Union[UploadFile, str], image_backed: str) -
         # Get public URL of the uploaded file
         download_url = b2_api.get_download_url_for_file_name(bucket_name, unique_filename)
         return download_url
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
     finally:
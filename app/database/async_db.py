@@ -1,19 +1,151 @@
+import asyncio
+import logging
+import time
 
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import exc, text
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from typing import AsyncGenerator
 from app.config.config import settings
 
 
-
+logger = logging.getLogger(__name__)
 
 
 ASINC_SQLALCHEMY_DATABASE_URL = f'postgresql+asyncpg://{settings.database_name}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_username}'
 
-engine_asinc = create_async_engine(ASINC_SQLALCHEMY_DATABASE_URL)
-async_session_maker = sessionmaker(engine_asinc, class_=AsyncSession, expire_on_commit=False)
+
+class PoolStats:
+    """How long this worker's requests waited for a pooled connection."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def observe(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+
+# Keyed by the pool's logging name, "primary" or "replica"
+pool_stats = {"primary": PoolStats(), "replica": PoolStats()}
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """`AsyncAdaptedQueuePool` that records the time spent waiting for a connection."""
+
+    def _do_get(self):
+        stats = pool_stats[self._orig_logging_name]
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.observe(time.perf_counter() - started)
+
+
+def _create_engine(url: str, name: str):
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_logging_name=name,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+
+class PrimarySession(Session):
+    """Sessions bound to the primary, so session events can tell them from replica reads."""
+
+
+# The only engine of the process for writes: every request, job and script shares its pool
+engine_asinc = _create_engine(ASINC_SQLALCHEMY_DATABASE_URL, "primary")
+async_session_maker = sessionmaker(engine_asinc, class_=AsyncSession, sync_session_class=PrimarySession,
+                                   expire_on_commit=False)
+
+# Optional streaming replica for read-only endpoints, see `app.database.replica`
+engine_replica = _create_engine(settings.database_replica_url, "replica") if settings.database_replica_url else None
+replica_session_maker = (
+    sessionmaker(engine_replica, class_=AsyncSession, expire_on_commit=False) if engine_replica else None
+)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Yield the database session of a request.
+
+    FastAPI caches dependencies per request, so the endpoint and every dependency
+    asking for a session (`get_current_user` included) share this one, and a request
+    never holds more than one pooled connection. Code running inside a request should
+    take this session as an argument rather than open another from `async_session_maker`.
+    """
     async with async_session_maker() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+async def check_database(engine=engine_asinc, timeout: float = 2) -> None:
+    """
+    Run a trivial query, raising if the database does not answer within `timeout` seconds.
+
+    Args:
+        engine (AsyncEngine, optional): The engine to check. Defaults to the primary.
+        timeout (float, optional): Seconds to wait for the answer. Defaults to 2.
+    """
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.wait_for(ping(), timeout=timeout)
+
+
+async def wait_for_database(attempts: int = settings.startup_attempts, delay: float = settings.startup_retry_delay):
+    """
+    Wait for the primary to accept connections, retrying `attempts` times with a growing delay.
+
+    Raises:
+        Exception: The last connection error, once every attempt has failed.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            await check_database(timeout=settings.db_pool_timeout)
+            logger.info("Database connection was successful")
+            return
+        except Exception as error:
+            logger.warning("Connection to database failed (attempt %d/%d): %s", attempt, attempts, error)
+            if attempt == attempts:
+                raise
+            await asyncio.sleep(delay * attempt)
+
+
+def pool_status(engine=engine_asinc) -> dict:
+    """
+    Gauges of a connection pool of this worker.
+
+    Args:
+        engine (AsyncEngine, optional): The engine whose pool to report. Defaults to the primary.
+
+    Returns:
+        dict: Pool size and usage, and the checkout wait times so far.
+    """
+    pool = engine.pool
+    stats = pool_stats[pool._orig_logging_name]
+    return {
+        "size": pool.size(),
+        "max_overflow": settings.db_max_overflow,
+        "in_use": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": stats.checkouts,
+        "timeouts": stats.timeouts,
+        "avg_wait_ms": round(stats.wait_seconds / stats.checkouts * 1e3, 3) if stats.checkouts else 0.0,
+        "max_wait_ms": round(stats.max_wait_seconds * 1e3, 3),
+    }
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.async_db import async_session_maker
+from app.models import messages_model
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+VOTE_COUNTS_SQL = text("""
+    UPDATE socket
+       SET vote_count = COALESCE(v.total, 0)
+      FROM socket AS s
+      LEFT JOIN (
+            SELECT message_id, SUM(dir) AS total
+              FROM votes
+             WHERE message_id >= :low AND message_id < :high
+             GROUP BY message_id
+      ) AS v ON v.message_id = s.id
+     WHERE socket.id = s.id
+       AND s.id >= :low AND s.id < :high
+       AND socket.vote_count IS DISTINCT FROM COALESCE(v.total, 0)
+""")
+
+ROOM_IDS_SQL = text("""
+    UPDATE socket
+       SET room_id = rooms.id
+      FROM rooms
+     WHERE rooms.name_room = socket.rooms
+       AND socket.room_id IS NULL
+       AND socket.id >= :low AND socket.id < :high
+""")
+
+
+async def backfill_vote_counts(db: AsyncSession, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Recompute `socket.vote_count` from `votes`, one ID range per transaction.
+
+    The `socket_on_vote` trigger keeps the counter current once installed; this job
+    fills in the messages voted on before it existed. Short batches keep row locks
+    brief, so it can run while the API and the socket service are serving traffic,
+    and it is safe to re-run: only rows whose counter disagrees are written.
+
+    Args:
+        db (AsyncSession): The database session.
+        batch_size (int): Number of message IDs per transaction.
+
+    Returns:
+        int: The number of messages whose counter was corrected.
+    """
+    max_id = await db.scalar(select(func.max(messages_model.Socket.id)))
+    await db.commit()
+    if max_id is None:
+        return 0
+
+    updated = 0
+    for low in range(0, max_id + 1, batch_size):
+        result = await db.execute(VOTE_COUNTS_SQL, {"low": low, "high": low + batch_size})
+        await db.commit()
+        updated += result.rowcount
+        logger.info("Vote counts backfilled up to id %d (%d corrected)", low + batch_size, updated)
+    return updated
+
+
+async def backfill_room_ids(db: AsyncSession, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Fill `socket.room_id` from the room name of messages sent before the column existed.
+
+    The `socket_room_id` trigger fills it for every new message; like the vote counts,
+    this runs in short ID-range transactions and only touches rows still missing it.
+
+    Args:
+        db (AsyncSession): The database session.
+        batch_size (int): Number of message IDs per transaction.
+
+    Returns:
+        int: The number of messages filled in.
+    """
+    max_id = await db.scalar(select(func.max(messages_model.Socket.id)))
+    await db.commit()
+    if max_id is None:
+        return 0
+
+    updated = 0
+    for low in range(0, max_id + 1, batch_size):
+        result = await db.execute(ROOM_IDS_SQL, {"low": low, "high": low + batch_size})
+        await db.commit()
+        updated += result.rowcount
+        logger.info("Room IDs backfilled up to id %d (%d filled)", low + batch_size, updated)
+    return updated
+
+
+async def main():
+    async with async_session_maker() as db:
+        await backfill_vote_counts(db)
+
+
+if __name__ == "__main__":
+    # python -m app.database.backfill
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
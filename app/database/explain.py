@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import logging
+import re
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database.async_db import engine_asinc
+from app.database.database import Base
+from app.database.schema import INDEXES
+from app.models import user_model, room_model, image_model, password_model, messages_model  # noqa: F401, registers the tables
+
+
+logger = logging.getLogger(__name__)
+
+# Everything happens in this schema, which is dropped at the end; the real tables are never touched
+BENCH_SCHEMA = "explain_bench"
+
+SEED = [
+    """INSERT INTO users (email, user_name, password, avatar, token_verify)
+       SELECT 'user' || g || '@bench.test', 'user' || g, 'x', 'a', md5(g::text)
+         FROM generate_series(1, :users) AS g""",
+    """INSERT INTO rooms (name_room, image_room, owner)
+       SELECT 'room' || g, 'i', 1 + g % :users FROM generate_series(1, :rooms) AS g""",
+    """INSERT INTO socket (room_id, message, receiver_id, created_at)
+       SELECT 1 + g % :rooms, 'm', 1 + g % :users, now() - g * interval '1 second'
+         FROM generate_series(1, :messages) AS g""",
+    """INSERT INTO votes (user_id, message_id, dir)
+       SELECT 1 + g % :users, g, 1 FROM generate_series(1, :messages / 5) AS g""",
+    """INSERT INTO user_status (room_id, name_room, user_id, user_name)
+       SELECT 1 + g % :rooms, 'room' || (1 + g % :rooms), g, 'user' || g FROM generate_series(1, :users) AS g""",
+    """INSERT INTO tabs_info (name_tab, owner_id) SELECT 'tab', g FROM generate_series(1, :users) AS g""",
+    """INSERT INTO tabs (tab_id, user_id, room_id)
+       SELECT 1 + g % :users, 1 + g % :users, 1 + g % :rooms FROM generate_series(1, :users * 3) AS g""",
+    """INSERT INTO room_invitations (room_id, sender_id, recipient_id, status)
+       SELECT 1 + g % :rooms, 1, 1 + g % :users, (ARRAY['pending', 'accepted', 'declined'])[1 + g % 3]::invitation_status
+         FROM generate_series(1, :users * 2) AS g""",
+    """INSERT INTO bans (user_id, room_id) SELECT 1 + g % :users, 1 + g % :rooms FROM generate_series(1, :users) AS g""",
+    """INSERT INTO role_in_room (user_id, room_id) SELECT 1 + g % :users, 1 + g % :rooms FROM generate_series(1, :users * 2) AS g""",
+    """INSERT INTO password_reset (email, reset_code)
+       SELECT 'user' || (1 + g % :users) || '@bench.test', lpad((g % 1000000)::text, 6, '0')
+         FROM generate_series(1, :users * 2) AS g""",
+]
+
+# The statements behind the hot endpoints, with parameters that hit the synthetic data
+HOT_QUERIES: List[Tuple[str, str]] = [
+    ("newest page of a room (GET /messages/{room_id})",
+     "SELECT * FROM socket WHERE room_id = 7 ORDER BY created_at DESC, id DESC LIMIT 51"),
+    ("votes of a message (vote trigger, GET /vote)",
+     "SELECT * FROM votes WHERE message_id = 4242"),
+    ("users in a room (room_stats trigger, reconcile)",
+     "SELECT count(*) FROM user_status WHERE room_id = 7"),
+    ("rooms in a tab (GET /tabs/{tab_id})",
+     "SELECT * FROM tabs WHERE user_id = 42 AND tab_id = 42"),
+    ("pending invitations (GET /invitations)",
+     "SELECT * FROM room_invitations WHERE recipient_id = 42 AND status = 'pending'"),
+    ("ban check in a room",
+     "SELECT * FROM bans WHERE room_id = 7 AND user_id = 42"),
+    ("role of a user in a room",
+     "SELECT * FROM role_in_room WHERE room_id = 7 AND user_id = 42"),
+    ("email verification (GET /success_registration)",
+     "SELECT * FROM users WHERE token_verify = md5('42')"),
+    ("reset code check (password_reset_mobile)",
+     "SELECT * FROM password_reset WHERE email = 'user42@bench.test' AND reset_code = '000084'"),
+]
+
+EXECUTION_TIME = re.compile(r"Execution Time: ([\d.]+) ms")
+
+
+async def explain_all(conn: AsyncConnection) -> Dict[str, str]:
+    plans = {}
+    for label, sql in HOT_QUERIES:
+        result = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"))
+        plans[label] = "\n".join(row[0] for row in result)
+    return plans
+
+
+def execution_ms(plan: str) -> float:
+    match = EXECUTION_TIME.search(plan)
+    return float(match.group(1)) if match else float("nan")
+
+
+def report(before: Dict[str, str], after: Dict[str, str], sizes: dict) -> str:
+    lines = ["# Hot query plans, before and after the index pack", "",
+             "Synthetic data: " + ", ".join(f"{count} {name}" for name, count in sizes.items()), "",
+             "| query | before ms | after ms |", "|---|---|---|"]
+    for label, _ in HOT_QUERIES:
+        lines.append(f"| {label} | {execution_ms(before[label]):.3f} | {execution_ms(after[label]):.3f} |")
+
+    for label, sql in HOT_QUERIES:
+        lines += ["", f"## {label}", "", "```sql", sql, "```", "",
+                  "Before:", "", "```", before[label], "```", "", "After:", "", "```", after[label], "```"]
+    return "\n".join(lines) + "\n"
+
+
+async def run(users: int, rooms: int, messages: int) -> str:
+    """
+    Load a synthetic dataset into a scratch schema and explain the hot queries without and with `INDEXES`.
+
+    Args:
+        users (int): Number of users; tabs, invitations, roles and reset codes scale with it.
+        rooms (int): Number of rooms.
+        messages (int): Number of messages; a fifth of them get a vote.
+
+    Returns:
+        str: A Markdown report with the execution times and both plans of every query.
+    """
+    sizes = {"users": users, "rooms": rooms, "messages": messages}
+    async with engine_asinc.connect() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+        await conn.execute(text(f"SET search_path TO {BENCH_SCHEMA}"))
+        try:
+            await conn.run_sync(Base.metadata.create_all)
+            for sql in SEED:
+                await conn.execute(text(sql), sizes)
+            await conn.execute(text("ANALYZE"))
+            await conn.commit()
+            logger.info("Loaded %s", sizes)
+
+            before = await explain_all(conn)
+
+            for name, table, columns in INDEXES:
+                await conn.execute(text(f"CREATE INDEX {name} ON {table} ({columns})"))
+            await conn.execute(text("ANALYZE"))
+            await conn.commit()
+
+            after = await explain_all(conn)
+        finally:
+            await conn.rollback()
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+            await conn.commit()
+
+    await engine_asinc.dispose()
+    return report(before, after, sizes)
+
+
+if __name__ == "__main__":
+    # python -m app.database.explain --output plans.md
+    parser = argparse.ArgumentParser(description="EXPLAIN (ANALYZE, BUFFERS) the hot queries before and after the index pack.")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--rooms", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=500000)
+    parser.add_argument("--output", help="Write the report to this file instead of stdout.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    markdown = asyncio.run(run(args.users, args.rooms, args.messages))
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(markdown)
+    else:
+        print(markdown)
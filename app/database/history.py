@@ -0,0 +1,588 @@
+# The DDL of each migration in `app.database.migrate`, frozen as it shipped.
+#
+# A migration runs only the statements written for it, so a fresh database and an
+# upgraded one pass through the same states. Never edit a block once its migration
+# has shipped: a later schema change gets a new migration and a new block here, and
+# `app.database.schema` is updated to describe the result.
+
+
+# 1: tables, columns and triggers
+
+BASELINE_TYPES = [
+    ("userrole", "'super_admin', 'admin', 'user'"),
+    ("userroleinroom", "'admin', 'owner', 'moderator', 'user'"),
+    ("invitation_status", "'pending', 'accepted', 'declined'"),
+]
+
+# The tables as the models declared them, for databases that never had them
+BASELINE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS "imagesAll" (
+        id SERIAL NOT NULL,
+        image_room VARCHAR NOT NULL,
+        images VARCHAR NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS "ix_imagesAll_id" ON "imagesAll" (id)',
+    """
+    CREATE TABLE IF NOT EXISTS "imagesAvatar" (
+        id SERIAL NOT NULL,
+        avatar VARCHAR NOT NULL,
+        images_url VARCHAR NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS "ix_imagesAvatar_id" ON "imagesAvatar" (id)',
+    """
+    CREATE TABLE IF NOT EXISTS "imagesRooms" (
+        id SERIAL NOT NULL,
+        rooms VARCHAR NOT NULL,
+        images_url VARCHAR NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS "ix_imagesRooms_id" ON "imagesRooms" (id)',
+    """
+    CREATE TABLE IF NOT EXISTS password_reset (
+        id SERIAL NOT NULL,
+        email VARCHAR,
+        reset_code VARCHAR,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        is_active BOOLEAN,
+        PRIMARY KEY (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_password_reset_email ON password_reset (email)",
+    "CREATE INDEX IF NOT EXISTS ix_password_reset_id ON password_reset (id)",
+    """
+    CREATE TABLE IF NOT EXISTS token_revocations (
+        user_id INTEGER NOT NULL,
+        revoked_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        PRIMARY KEY (user_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_deactivation (
+        id SERIAL NOT NULL,
+        email VARCHAR NOT NULL,
+        user_name VARCHAR NOT NULL,
+        deactivated_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        reason VARCHAR,
+        roles JSON,
+        PRIMARY KEY (id),
+        CONSTRAINT uq_deactivation_email UNIQUE (email),
+        CONSTRAINT uq_deactivation_user_name UNIQUE (user_name)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL NOT NULL,
+        email VARCHAR NOT NULL,
+        user_name VARCHAR NOT NULL,
+        password VARCHAR NOT NULL,
+        avatar VARCHAR NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        verified BOOLEAN DEFAULT 'false' NOT NULL,
+        token_verify VARCHAR,
+        refresh_token VARCHAR,
+        role userrole,
+        blocked BOOLEAN DEFAULT 'false' NOT NULL,
+        password_changed TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        active BOOLEAN DEFAULT 'True' NOT NULL,
+        PRIMARY KEY (id),
+        CONSTRAINT uq_user_email UNIQUE (email),
+        CONSTRAINT uq_user_name UNIQUE (user_name),
+        UNIQUE (email),
+        UNIQUE (user_name)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)",
+    """
+    CREATE TABLE IF NOT EXISTS private_messages (
+        id SERIAL NOT NULL,
+        sender_id INTEGER NOT NULL,
+        receiver_id INTEGER NOT NULL,
+        message VARCHAR,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        is_read BOOLEAN NOT NULL,
+        "fileUrl" VARCHAR,
+        edited BOOLEAN DEFAULT 'false',
+        id_return INTEGER,
+        PRIMARY KEY (id),
+        FOREIGN KEY(sender_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(receiver_id) REFERENCES users (id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_private_messages_id ON private_messages (id)",
+    "CREATE INDEX IF NOT EXISTS ix_private_messages_receiver_id ON private_messages (receiver_id)",
+    "CREATE INDEX IF NOT EXISTS ix_private_messages_sender_id ON private_messages (sender_id)",
+    """
+    CREATE TABLE IF NOT EXISTS rooms (
+        id SERIAL NOT NULL,
+        name_room VARCHAR NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        image_room VARCHAR NOT NULL,
+        owner INTEGER NOT NULL,
+        secret_room BOOLEAN,
+        block BOOLEAN DEFAULT 'false' NOT NULL,
+        delete_at TIMESTAMP WITH TIME ZONE,
+        PRIMARY KEY (id),
+        UNIQUE (name_room),
+        FOREIGN KEY(owner) REFERENCES users (id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tabs_info (
+        id SERIAL NOT NULL,
+        name_tab VARCHAR,
+        image_tab VARCHAR,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        owner_id INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(owner_id) REFERENCES users (id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_tabs_info_id ON tabs_info (id)",
+    """
+    CREATE TABLE IF NOT EXISTS user_online_time (
+        id SERIAL NOT NULL,
+        user_id INTEGER NOT NULL,
+        session_start TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        session_end TIMESTAMP WITH TIME ZONE,
+        total_online_time INTERVAL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_user_online_time_id ON user_online_time (id)",
+    """
+    CREATE TABLE IF NOT EXISTS bans (
+        id SERIAL NOT NULL,
+        user_id INTEGER NOT NULL,
+        room_id INTEGER NOT NULL,
+        start_time TIMESTAMP WITHOUT TIME ZONE,
+        end_time TIMESTAMP WITHOUT TIME ZONE,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(room_id) REFERENCES rooms (id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_bans_id ON bans (id)",
+    """
+    CREATE TABLE IF NOT EXISTS private_message_votes (
+        user_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        dir INTEGER,
+        PRIMARY KEY (user_id, message_id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(message_id) REFERENCES private_messages (id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS role_in_room (
+        id SERIAL NOT NULL,
+        user_id INTEGER NOT NULL,
+        room_id INTEGER NOT NULL,
+        role userroleinroom,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(room_id) REFERENCES rooms (id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_role_in_room_id ON role_in_room (id)",
+    """
+    CREATE TABLE IF NOT EXISTS room_invitations (
+        id SERIAL NOT NULL,
+        room_id INTEGER,
+        sender_id INTEGER,
+        recipient_id INTEGER,
+        status invitation_status,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(room_id) REFERENCES rooms (id),
+        FOREIGN KEY(sender_id) REFERENCES users (id),
+        FOREIGN KEY(recipient_id) REFERENCES users (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_room_invitations_id ON room_invitations (id)",
+    """
+    CREATE TABLE IF NOT EXISTS room_stats (
+        room_id INTEGER NOT NULL,
+        count_messages INTEGER DEFAULT '0' NOT NULL,
+        count_users INTEGER DEFAULT '0' NOT NULL,
+        last_activity TIMESTAMP WITH TIME ZONE,
+        PRIMARY KEY (room_id),
+        FOREIGN KEY(room_id) REFERENCES rooms (id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rooms_manager_my_rooms (
+        id SERIAL NOT NULL,
+        user_id INTEGER NOT NULL,
+        room_id INTEGER NOT NULL,
+        favorite BOOLEAN,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(room_id) REFERENCES rooms (id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rooms_manager_secret (
+        id SERIAL NOT NULL,
+        user_id INTEGER NOT NULL,
+        room_id INTEGER NOT NULL,
+        favorite BOOLEAN,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(room_id) REFERENCES rooms (id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS socket (
+        id SERIAL NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        message VARCHAR,
+        receiver_id INTEGER,
+        rooms VARCHAR NOT NULL,
+        id_return INTEGER,
+        "fileUrl" VARCHAR,
+        edited BOOLEAN DEFAULT 'false',
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        vote_count INTEGER DEFAULT '0' NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(receiver_id) REFERENCES users (id) ON DELETE SET NULL,
+        FOREIGN KEY(rooms) REFERENCES rooms (name_room) ON DELETE CASCADE ON UPDATE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_socket_id ON socket (id)",
+    """
+    CREATE TABLE IF NOT EXISTS tabs (
+        id SERIAL NOT NULL,
+        tab_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        room_id INTEGER NOT NULL,
+        tab_name VARCHAR,
+        favorite BOOLEAN,
+        PRIMARY KEY (id),
+        FOREIGN KEY(tab_id) REFERENCES tabs_info (id) ON DELETE CASCADE,
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(room_id) REFERENCES rooms (id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_status (
+        id SERIAL NOT NULL,
+        room_id INTEGER NOT NULL,
+        name_room VARCHAR NOT NULL,
+        user_id INTEGER NOT NULL,
+        user_name VARCHAR NOT NULL,
+        status BOOLEAN DEFAULT 'True' NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(room_id) REFERENCES rooms (id) ON DELETE CASCADE,
+        FOREIGN KEY(name_room) REFERENCES rooms (name_room) ON DELETE CASCADE ON UPDATE CASCADE,
+        UNIQUE (user_id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_user_status_id ON user_status (id)",
+    """
+    CREATE TABLE IF NOT EXISTS votes (
+        user_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        dir INTEGER,
+        PRIMARY KEY (user_id, message_id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(message_id) REFERENCES socket (id) ON DELETE CASCADE
+    )
+    """,
+]
+
+# Columns added to tables that already existed before the migrations
+BASELINE_COLUMNS = [
+    "ALTER TABLE socket ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()",
+    "ALTER TABLE socket ADD COLUMN IF NOT EXISTS vote_count INTEGER NOT NULL DEFAULT 0",
+]
+
+BASELINE_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION room_stats_on_room() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO room_stats (room_id) VALUES (NEW.id) ON CONFLICT (room_id) DO NOTHING;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION room_stats_on_message() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE room_stats
+               SET count_messages = room_stats.count_messages + 1,
+                   last_activity = GREATEST(room_stats.last_activity, NEW.created_at)
+              FROM rooms
+             WHERE rooms.name_room = NEW.rooms AND room_stats.room_id = rooms.id;
+            RETURN NEW;
+        END IF;
+
+        UPDATE room_stats
+           SET count_messages = GREATEST(room_stats.count_messages - 1, 0)
+          FROM rooms
+         WHERE rooms.name_room = OLD.rooms AND room_stats.room_id = rooms.id;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION room_stats_on_status() RETURNS trigger AS $$
+    DECLARE
+        old_room_id INTEGER;
+    BEGIN
+        IF TG_OP = 'UPDATE' THEN
+            IF OLD.name_room IS NOT DISTINCT FROM NEW.name_room THEN
+                RETURN NEW;
+            END IF;
+            SELECT id INTO old_room_id FROM rooms WHERE name_room = OLD.name_room;
+            -- A rename cascading from rooms.name_room is not a membership change
+            IF old_room_id IS NULL THEN
+                RETURN NEW;
+            END IF;
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE room_stats
+               SET count_users = GREATEST(room_stats.count_users - 1, 0)
+              FROM rooms
+             WHERE rooms.name_room = OLD.name_room AND room_stats.room_id = rooms.id;
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'INSERT') THEN
+            UPDATE room_stats
+               SET count_users = room_stats.count_users + 1
+              FROM rooms
+             WHERE rooms.name_room = NEW.name_room AND room_stats.room_id = rooms.id;
+            RETURN NEW;
+        END IF;
+
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION socket_touch() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at = now();
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION socket_on_vote() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE socket
+               SET vote_count = vote_count - COALESCE(OLD.dir, 0), updated_at = now()
+             WHERE id = OLD.message_id;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'INSERT') THEN
+            UPDATE socket
+               SET vote_count = vote_count + COALESCE(NEW.dir, 0), updated_at = now()
+             WHERE id = NEW.message_id;
+            RETURN NEW;
+        END IF;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+# (name, table, timing, function)
+BASELINE_TRIGGERS = [
+    ("room_stats_room_insert", "rooms", "AFTER INSERT", "room_stats_on_room"),
+    ("room_stats_message_change", "socket", "AFTER INSERT OR DELETE", "room_stats_on_message"),
+    ("room_stats_status_change", "user_status", "AFTER INSERT OR UPDATE OF name_room OR DELETE", "room_stats_on_status"),
+    ("socket_touch", "socket", 'BEFORE UPDATE OF message, "fileUrl", edited', "socket_touch"),
+    ("socket_on_vote", "votes", "AFTER INSERT OR UPDATE OR DELETE", "socket_on_vote"),
+]
+
+# (name, table, function) of the triggers installed by worker startup before there were migrations
+BASELINE_RETIRED_TRIGGERS = [
+    ("socket_touch_on_vote", "votes", "socket_touch_on_vote"),
+]
+
+
+# 2: seed room_stats, while messages still name their room
+
+SEED_ROOM_STATS = """
+    INSERT INTO room_stats (room_id, count_messages, count_users, last_activity)
+    SELECT rooms.id, COALESCE(messages.count, 0), COALESCE(users.count, 0), messages.last_activity
+      FROM rooms
+      LEFT JOIN (
+            SELECT rooms AS name_room, count(id) AS count, max(created_at) AS last_activity
+              FROM socket GROUP BY rooms
+      ) AS messages ON messages.name_room = rooms.name_room
+      LEFT JOIN (
+            SELECT name_room, count(id) AS count FROM user_status GROUP BY name_room
+      ) AS users ON users.name_room = rooms.name_room
+        ON CONFLICT (room_id) DO UPDATE
+       SET count_messages = excluded.count_messages,
+           count_users = excluded.count_users,
+           last_activity = excluded.last_activity
+"""
+
+
+# 4: hot path indexes, (name, table, columns)
+
+HOT_PATH_INDEXES = [
+    ("ix_socket_rooms_created_at_id", "socket", "rooms, created_at, id"),
+    ("ix_votes_message_id", "votes", "message_id"),
+    ("ix_user_status_name_room", "user_status", "name_room"),
+    ("ix_tabs_user_id_tab_id", "tabs", "user_id, tab_id"),
+    ("ix_room_invitations_recipient_id_status", "room_invitations", "recipient_id, status"),
+    ("ix_bans_room_id_user_id", "bans", "room_id, user_id"),
+    ("ix_role_in_room_room_id_user_id", "role_in_room", "room_id, user_id"),
+    ("ix_users_token_verify", "users", "token_verify"),
+    ("ix_password_reset_email_reset_code", "password_reset", "email, reset_code"),
+]
+
+
+# 5: socket.room_id
+
+ROOM_ID_COLUMN = "ALTER TABLE socket ADD COLUMN IF NOT EXISTS room_id INTEGER"
+
+ROOM_ID_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION socket_room_id() RETURNS trigger AS $$
+    BEGIN
+        -- Dual write while the socket service moves from room names to room IDs
+        IF NEW.room_id IS NULL THEN
+            SELECT id INTO NEW.room_id FROM rooms WHERE name_room = NEW.rooms;
+        ELSIF NEW.rooms IS NULL THEN
+            SELECT name_room INTO NEW.rooms FROM rooms WHERE id = NEW.room_id;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION room_stats_on_message() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE room_stats
+               SET count_messages = room_stats.count_messages + 1,
+                   last_activity = GREATEST(room_stats.last_activity, NEW.created_at)
+             WHERE room_stats.room_id = NEW.room_id;
+            RETURN NEW;
+        END IF;
+
+        UPDATE room_stats
+           SET count_messages = GREATEST(room_stats.count_messages - 1, 0)
+         WHERE room_stats.room_id = OLD.room_id;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION room_stats_on_status() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.room_id IS NOT DISTINCT FROM NEW.room_id THEN
+            RETURN NEW;
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE room_stats
+               SET count_users = GREATEST(room_stats.count_users - 1, 0)
+             WHERE room_stats.room_id = OLD.room_id;
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'INSERT') THEN
+            UPDATE room_stats
+               SET count_users = room_stats.count_users + 1
+             WHERE room_stats.room_id = NEW.room_id;
+            RETURN NEW;
+        END IF;
+
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+ROOM_ID_TRIGGERS = [
+    ("room_stats_status_change", "user_status", "AFTER INSERT OR UPDATE OF room_id OR DELETE", "room_stats_on_status"),
+    ("socket_room_id", "socket", "BEFORE INSERT", "socket_room_id"),
+]
+
+
+# 6: backfill and index socket.room_id
+
+ROOM_ID_INDEXES = [
+    ("ix_socket_room_id_created_at_id", "socket", "room_id, created_at, id"),
+    ("ix_user_status_room_id", "user_status", "room_id"),
+]
+
+# Replaced by the two above
+ROOM_NAME_INDEXES = [
+    "ix_socket_rooms_created_at_id",
+    "ix_user_status_name_room",
+]
+
+# The backfill fires no triggers, and the room_id triggers missed every legacy message
+# deleted before it, so each room is counted again. Run one room per transaction: the
+# row lock taken first makes the recount see every writer that already counted.
+LOCK_ROOM_STATS = "SELECT 1 FROM room_stats WHERE room_id = :room_id FOR UPDATE"
+
+RECOUNT_ROOM_STATS = """
+    UPDATE room_stats
+       SET count_messages = (SELECT count(*) FROM socket WHERE room_id = :room_id),
+           count_users = (SELECT count(*) FROM user_status WHERE room_id = :room_id),
+           last_activity = COALESCE((SELECT max(created_at) FROM socket WHERE room_id = :room_id), last_activity)
+     WHERE room_id = :room_id
+"""
+
+
+# 8: vote cleanup triggers
+
+VOTE_CLEANUP_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION socket_delete_votes() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM votes WHERE message_id = OLD.id;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION private_messages_delete_votes() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM private_message_votes WHERE message_id = OLD.id;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+VOTE_CLEANUP_TRIGGERS = [
+    ("socket_delete_votes", "socket", "AFTER DELETE", "socket_delete_votes"),
+    ("private_messages_delete_votes", "private_messages", "AFTER DELETE", "private_messages_delete_votes"),
+]
+
+
+# 10: room_stats.archived_messages
+
+ARCHIVED_MESSAGES_COLUMN = \
+    "ALTER TABLE room_stats ADD COLUMN IF NOT EXISTS archived_messages INTEGER NOT NULL DEFAULT 0"
+
+
+# 11: auth_rate_limits
+
+AUTH_RATE_LIMITS_TABLE = """
+    CREATE UNLOGGED TABLE IF NOT EXISTS auth_rate_limits (
+        key VARCHAR NOT NULL,
+        tokens FLOAT NOT NULL,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        PRIMARY KEY (key)
+    )
+"""
@@ -0,0 +1,328 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from app.config.config import settings
+from app.database import history, partitions
+from app.database.async_db import engine_asinc
+from app.database.backfill import backfill_room_ids, backfill_vote_counts
+from app.database.schema import SCHEMA_LOCK_KEY, missing_objects
+
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    """
+    One step of the schema history.
+
+    A transactional migration runs in one transaction together with the row recording
+    it. A non-transactional one gets an autocommit connection, for statements such as
+    `CREATE INDEX CONCURRENTLY` or batched backfills, and must be safe to re-run:
+    if it is interrupted it runs again from the start.
+    """
+    version: int
+    name: str
+    apply: Callable[[AsyncConnection], Awaitable[None]]
+    transactional: bool = True
+
+
+async def create_index_concurrently(conn: AsyncConnection, name: str, table: str, columns: str,
+                                    where: Optional[str] = None, unique: bool = False):
+    """
+    Build an index without blocking writes to the table.
+
+    An index left invalid by an interrupted build is dropped and built again.
+
+    Args:
+        conn (AsyncConnection): An autocommit connection.
+        name (str): The index name.
+        table (str): The table to index.
+        columns (str): The indexed column list, e.g. "room_id, created_at DESC".
+        where (str, optional): Predicate of a partial index.
+        unique (bool, optional): Build a unique index. Defaults to False.
+    """
+    invalid = await conn.scalar(text("""
+        SELECT NOT i.indisvalid FROM pg_index AS i JOIN pg_class AS c ON c.oid = i.indexrelid
+         WHERE c.relname = :name
+    """), {"name": name})
+    if invalid:
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+    predicate = f" WHERE {where}" if where else ""
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    await conn.execute(text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns}){predicate}"))
+
+
+async def add_constraint(conn: AsyncConnection, table: str, name: str, definition: str):
+    """
+    Add a constraint as NOT VALID, unless it exists: existing rows are not checked, so the table is locked only briefly.
+
+    Check them later with `ALTER TABLE ... VALIDATE CONSTRAINT`, which does not block writes.
+    """
+    exists = await conn.scalar(text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": name})
+    if not exists:
+        await conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition} NOT VALID"))
+
+
+async def set_not_null(conn: AsyncConnection, table: str, column: str):
+    """
+    Make a column NOT NULL without holding an exclusive lock for a full table scan.
+
+    A validated CHECK constraint proves the column has no NULLs, so `SET NOT NULL` skips its own scan.
+
+    Args:
+        conn (AsyncConnection): An autocommit connection.
+        table (str): The table.
+        column (str): The column to constrain.
+    """
+    check = f"{table}_{column}_not_null"
+    await add_constraint(conn, table, check, f"CHECK ({column} IS NOT NULL)")
+    await conn.execute(text(f"ALTER TABLE {table} VALIDATE CONSTRAINT {check}"))
+    await conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL"))
+    await conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {check}"))
+
+
+async def _create_triggers(conn: AsyncConnection, triggers: List[Tuple[str, str, str, str]]):
+    for name, table, timing, function in triggers:
+        await conn.execute(text(f"DROP TRIGGER IF EXISTS {name} ON {table}"))
+        await conn.execute(text(
+            f"CREATE TRIGGER {name} {timing} ON {table} FOR EACH ROW EXECUTE FUNCTION {function}()"
+        ))
+
+
+async def _execute_all(conn: AsyncConnection, statements: List[str]):
+    for sql in statements:
+        await conn.execute(text(sql))
+
+
+async def _baseline(conn: AsyncConnection):
+    for name, labels in history.BASELINE_TYPES:
+        await conn.execute(text(f"""
+            DO $$ BEGIN
+                CREATE TYPE {name} AS ENUM ({labels});
+            EXCEPTION WHEN duplicate_object THEN NULL;
+            END $$
+        """))
+    await _execute_all(conn, history.BASELINE_TABLES)
+    await _execute_all(conn, history.BASELINE_COLUMNS)
+
+    for name, table, function in history.BASELINE_RETIRED_TRIGGERS:
+        await conn.execute(text(f"DROP TRIGGER IF EXISTS {name} ON {table}"))
+        await conn.execute(text(f"DROP FUNCTION IF EXISTS {function}()"))
+    await _execute_all(conn, history.BASELINE_FUNCTIONS)
+    await _create_triggers(conn, history.BASELINE_TRIGGERS)
+
+
+async def _seed_room_stats(conn: AsyncConnection):
+    if await conn.scalar(text("SELECT NOT EXISTS (SELECT 1 FROM room_stats)")):
+        await conn.execute(text(history.SEED_ROOM_STATS))
+
+
+async def _backfill_vote_counts(conn: AsyncConnection):
+    async with AsyncSession(bind=conn) as db:
+        await backfill_vote_counts(db)
+
+
+async def _build_indexes(conn: AsyncConnection, indexes: List[Tuple[str, str, str]]):
+    for name, table, columns in indexes:
+        logger.info("Building index %s", name)
+        await create_index_concurrently(conn, name, table, columns)
+
+
+async def _hot_path_indexes(conn: AsyncConnection):
+    await _build_indexes(conn, history.HOT_PATH_INDEXES)
+
+
+async def _socket_room_id(conn: AsyncConnection):
+    # The column, the trigger filling it for writers that still send room names,
+    # and the room_stats triggers keyed by it
+    await conn.execute(text(history.ROOM_ID_COLUMN))
+    await _execute_all(conn, history.ROOM_ID_FUNCTIONS)
+    await _create_triggers(conn, history.ROOM_ID_TRIGGERS)
+    await add_constraint(conn, "socket", "socket_room_id_fkey",
+                         "FOREIGN KEY (room_id) REFERENCES rooms (id) ON DELETE CASCADE")
+
+
+async def _backfill_room_ids(conn: AsyncConnection):
+    async with AsyncSession(bind=conn) as db:
+        await backfill_room_ids(db)
+    await _build_indexes(conn, history.ROOM_ID_INDEXES)
+    for name in history.ROOM_NAME_INDEXES:
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    await conn.execute(text("ALTER TABLE socket VALIDATE CONSTRAINT socket_room_id_fkey"))
+    await set_not_null(conn, "socket", "room_id")
+
+    # room_stats was seeded by room name, and the room_id triggers could not count legacy rows
+    await conn.execute(text("INSERT INTO room_stats (room_id) SELECT id FROM rooms ON CONFLICT (room_id) DO NOTHING"))
+    room_ids = (await conn.scalars(text("SELECT room_id FROM room_stats ORDER BY room_id"))).all()
+    async with conn.engine.connect() as recount:
+        for room_id in room_ids:
+            await recount.execute(text(history.LOCK_ROOM_STATS), {"room_id": room_id})
+            await recount.execute(text(history.RECOUNT_ROOM_STATS), {"room_id": room_id})
+            await recount.commit()
+    logger.info("Recounted room_stats of %d rooms", len(room_ids))
+
+
+async def _retire_socket_rooms(conn: AsyncConnection):
+    # Renaming a room no longer cascades into its messages. The column itself is dropped
+    # once the socket service writes room_id.
+    await conn.execute(text("ALTER TABLE socket DROP CONSTRAINT IF EXISTS socket_rooms_fkey"))
+    await conn.execute(text("ALTER TABLE socket ALTER COLUMN rooms DROP NOT NULL"))
+
+
+async def _vote_cleanup_triggers(conn: AsyncConnection):
+    await _execute_all(conn, history.VOTE_CLEANUP_FUNCTIONS)
+    await _create_triggers(conn, history.VOTE_CLEANUP_TRIGGERS)
+
+
+async def _archived_messages(conn: AsyncConnection):
+    await conn.execute(text(history.ARCHIVED_MESSAGES_COLUMN))
+
+
+async def _auth_rate_limits(conn: AsyncConnection):
+    await conn.execute(text(history.AUTH_RATE_LIMITS_TABLE))
+
+
+async def _partition_messages(conn: AsyncConnection):
+    # Current rows stay where they are, as a partition ending at least a month from now
+    boundary = partitions.add_months(partitions.month_start(datetime.now(timezone.utc).date()), 2)
+    for table in partitions.PARTITIONED_TABLES:
+        if not await partitions.is_partitioned(conn, table):
+            # Prepared online, so that the swap itself only touches the catalog
+            check = f"{table}_legacy_bound"
+            await create_index_concurrently(conn, f"{table}_id_created_at_key", table, "id, created_at", unique=True)
+            await conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {check}"))
+            await add_constraint(conn, table, check, f"CHECK (created_at < {partitions.bound(boundary)})")
+            await conn.execute(text(f"ALTER TABLE {table} VALIDATE CONSTRAINT {check}"))
+
+            async with conn.engine.begin() as swap:
+                await partitions.attach_legacy(swap, table, boundary)
+
+        await partitions.create_partitions(conn, table,
+                                           partitions.add_months(boundary, settings.partition_months_ahead))
+
+
+# Append only; never edit or reorder a migration that has shipped, nor the DDL it runs from `app.database.history`.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "tables, columns and triggers", _baseline),
+    Migration(2, "seed room_stats", _seed_room_stats, transactional=False),
+    Migration(3, "backfill socket.vote_count", _backfill_vote_counts, transactional=False),
+    Migration(4, "hot path indexes", _hot_path_indexes, transactional=False),
+    Migration(5, "socket.room_id", _socket_room_id),
+    Migration(6, "backfill and index socket.room_id", _backfill_room_ids, transactional=False),
+    Migration(7, "retire socket.rooms", _retire_socket_rooms),
+    Migration(8, "vote cleanup triggers", _vote_cleanup_triggers),
+    Migration(9, "monthly partitions of socket and private_messages", _partition_messages, transactional=False),
+    Migration(10, "room_stats.archived_messages", _archived_messages),
+    Migration(11, "auth_rate_limits", _auth_rate_limits),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+    )
+"""
+
+
+async def current_version(conn: AsyncConnection) -> Optional[int]:
+    """
+    Return the newest applied migration, or None if the database has never been migrated.
+
+    Args:
+        conn (AsyncConnection): A database connection.
+    """
+    if await conn.scalar(text("SELECT to_regclass('schema_migrations')")) is None:
+        return None
+    return await conn.scalar(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations"))
+
+
+async def migrate(engine: AsyncEngine = engine_asinc, target: int = SCHEMA_VERSION) -> List[int]:
+    """
+    Apply the pending migrations up to `target`, in order.
+
+    A session-level advisory lock lets only one runner at a time touch the schema.
+
+    Args:
+        engine (AsyncEngine, optional): The engine of the database to migrate. Defaults to the primary.
+        target (int, optional): The version to stop at. Defaults to the newest.
+
+    Returns:
+        List[int]: The versions applied by this run.
+    """
+    applied = []
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        await conn.execute(text(VERSION_TABLE))
+        await conn.commit()
+        try:
+            done = {row[0] for row in await conn.execute(text("SELECT version FROM schema_migrations"))}
+            await conn.commit()
+
+            for migration in MIGRATIONS:
+                if migration.version in done or migration.version > target:
+                    continue
+
+                logger.info("Applying migration %d: %s", migration.version, migration.name)
+                if migration.transactional:
+                    await migration.apply(conn)
+                else:
+                    async with engine.connect() as autocommit:
+                        await autocommit.execution_options(isolation_level="AUTOCOMMIT")
+                        await migration.apply(autocommit)
+
+                await conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                                   {"version": migration.version, "name": migration.name})
+                await conn.commit()
+                applied.append(migration.version)
+        finally:
+            await conn.rollback()
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEMA_LOCK_KEY})
+            await conn.commit()
+
+    return applied
+
+
+async def verify_schema(engine: AsyncEngine = engine_asinc):
+    """
+    Check at startup that the database has been migrated to the version this code expects.
+
+    At exactly that version the database must also hold every column, trigger and index
+    of the catalogue in `app.database.schema`; a gap means the migrations and the
+    catalogue disagree.
+
+    Raises:
+        RuntimeError: If migrations are pending or the catalogue is not met.
+    """
+    async with engine.connect() as conn:
+        version = await current_version(conn)
+        missing = await missing_objects(conn) if version == SCHEMA_VERSION else []
+
+    if version is None or version < SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema is at version {version}, this build needs {SCHEMA_VERSION}; "
+                           f"run `python -m app.database.migrate` first")
+    if version > SCHEMA_VERSION:
+        logger.warning("Database schema is at version %d, newer than this build's %d", version, SCHEMA_VERSION)
+    if missing:
+        raise RuntimeError(f"Database schema is at version {version} but lacks {', '.join(missing)}")
+
+
+async def main():
+    applied = await migrate()
+    logger.info("Schema at version %d (%s)", SCHEMA_VERSION,
+                f"applied {applied}" if applied else "already up to date")
+    await engine_asinc.dispose()
+
+
+if __name__ == "__main__":
+    # python -m app.database.migrate
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
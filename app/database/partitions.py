@@ -0,0 +1,255 @@
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database.schema import SCHEMA_LOCK_KEY
+
+
+logger = logging.getLogger(__name__)
+
+# Message tables partitioned by month on created_at, with the table of votes on their messages.
+# A foreign key cannot reference `id` alone on a partitioned table, so votes are removed by trigger instead.
+PARTITIONED_TABLES = {
+    "socket": ("votes", "votes_message_id_fkey"),
+    "private_messages": ("private_message_votes", "private_message_votes_message_id_fkey"),
+}
+
+# The partitions of a table with the upper bound of each
+PARTITIONS_SQL = text(r"""
+    SELECT c.relname, (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \(''([^'']+)''\)'))[1]::timestamptz
+      FROM pg_inherits AS i JOIN pg_class AS c ON c.oid = i.inhrelid
+     WHERE i.inhparent = CAST(:table AS regclass)
+""")
+
+# The same with each partition's bound clause, and whether a concurrent detach of it was interrupted
+DETACHABLE_SQL = text(r"""
+    SELECT c.relname, (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \(''([^'']+)''\)'))[1]::timestamptz,
+           pg_get_expr(c.relpartbound, c.oid), i.inhdetachpending
+      FROM pg_inherits AS i JOIN pg_class AS c ON c.oid = i.inhrelid
+     WHERE i.inhparent = CAST(:table AS regclass)
+""")
+
+# SQLSTATE of a lock not granted within lock_timeout
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def bound(month: date) -> str:
+    """The SQL literal of midnight UTC at the start of `month`."""
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+async def is_partitioned(conn: AsyncConnection, table: str) -> bool:
+    return bool(await conn.scalar(text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"),
+                                  {"table": table}))
+
+
+async def attach_legacy(conn: AsyncConnection, table: str, boundary: date):
+    """
+    Replace `table` with a table partitioned by month and attach the old one as its first partition.
+
+    The old table keeps every row written before `boundary`, so nothing is copied. It
+    must already have a unique index `<table>_id_created_at_key` and a validated
+    `<table>_legacy_bound` check on `created_at < boundary`; with them the swap only
+    touches the catalog. Indexes, foreign keys and triggers move to the new parent,
+    which propagates them to every partition.
+
+    Args:
+        conn (AsyncConnection): A connection inside an open transaction.
+        table (str): One of `PARTITIONED_TABLES`.
+        boundary (date): First day of the first monthly partition.
+    """
+    legacy = f"{table}_legacy"
+    votes_table, votes_fkey = PARTITIONED_TABLES[table]
+    params = {"table": legacy}
+
+    # Fail fast instead of queueing every writer behind the rename
+    await conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+    await conn.execute(text(f"ALTER TABLE {votes_table} DROP CONSTRAINT IF EXISTS {votes_fkey}"))
+    await conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+
+    # Triggers on the partition would fire a second time next to the parent's clones
+    triggers = (await conn.execute(text("""
+        SELECT tgname, pg_get_triggerdef(oid) FROM pg_trigger
+         WHERE tgrelid = CAST(:table AS regclass) AND NOT tgisinternal
+    """), params)).all()
+    for name, _ in triggers:
+        await conn.execute(text(f"DROP TRIGGER {name} ON {legacy}"))
+
+    # The primary key of a partitioned table has to include the partition key
+    pkey = await conn.scalar(text(
+        "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'p'"
+    ), params)
+    await conn.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT {pkey}"))
+    await conn.execute(text(f"ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_pkey "
+                            f"PRIMARY KEY USING INDEX {table}_id_created_at_key"))
+
+    # Index names are schema-wide, so the partition's give theirs up to the parent's
+    indexes = (await conn.execute(text("""
+        SELECT c.relname, pg_get_indexdef(i.indexrelid) FROM pg_index AS i JOIN pg_class AS c ON c.oid = i.indexrelid
+         WHERE i.indrelid = CAST(:table AS regclass) AND NOT i.indisprimary
+    """), params)).all()
+    for name, _ in indexes:
+        await conn.execute(text(f"ALTER INDEX {name} RENAME TO {name}_legacy"))
+
+    foreign_keys = (await conn.execute(text("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+         WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'
+    """), params)).all()
+    # The key becomes (id, created_at): `id` stays unique only because every partition draws it from this sequence
+    sequence = await conn.scalar(text("SELECT pg_get_serial_sequence(:table, 'id')"), params)
+    if sequence is None:
+        raise RuntimeError(f"{table}.id has no sequence of its own, nothing would keep it unique once partitioned")
+
+    await conn.execute(text(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"))
+    await conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)"))
+    await conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {legacy} "
+                            f"FOR VALUES FROM (MINVALUE) TO ({bound(boundary)})"))
+    await conn.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_legacy_bound"))
+
+    # Created on the parent after the attach, each one adopts the partition's equivalent instead of building it
+    for _, definition in indexes:
+        await conn.execute(text(re.sub(r" ON (ONLY )?\S+ USING ", f" ON {table} USING ", definition, count=1)))
+    for name, definition in foreign_keys:
+        await conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}"))
+    for _, definition in triggers:
+        await conn.execute(text(re.sub(r" ON \S+ FOR EACH ", f" ON {table} FOR EACH ", definition, count=1)))
+
+    # Otherwise dropping the old partition would drop the sequence with it
+    await conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+    if await conn.scalar(text(f"SELECT (SELECT max(id) FROM {table}) > last_value FROM {sequence}")):
+        raise RuntimeError(f"Sequence {sequence} is behind the ids already in {table}; new rows would reuse them")
+    logger.info("Partitioned %s, rows before %s stay in %s", table, boundary, legacy)
+
+
+async def create_partitions(conn: AsyncConnection, table: str, until: date) -> List[str]:
+    """
+    Create the monthly partitions of `table` that follow its newest one, up to `until`.
+
+    Args:
+        conn (AsyncConnection): A database connection.
+        table (str): A partitioned table.
+        until (date): First day of the first month not to create.
+
+    Returns:
+        List[str]: The partitions created.
+    """
+    bounds = [upper for _, upper in await conn.execute(PARTITIONS_SQL, {"table": table}) if upper is not None]
+    upper = max(bounds, default=None)
+    month = upper.astimezone(timezone.utc).date() if upper else month_start(datetime.now(timezone.utc).date())
+
+    created = []
+    while month < until:
+        next_month = add_months(month, 1)
+        name = partition_name(table, month)
+        await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                                f"FOR VALUES FROM ({bound(month)}) TO ({bound(next_month)})"))
+        created.append(name)
+        month = next_month
+    return created
+
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int) -> List[str]:
+    """
+    Make sure every partitioned message table has partitions for the next `months_ahead` months.
+
+    Run daily by the scheduler, so a month's partition exists long before its first
+    message; an insert with no partition to land in would fail. Tables that have not
+    been partitioned yet are skipped.
+
+    Args:
+        conn (AsyncConnection): A connection inside an open transaction.
+        months_ahead (int): Number of months after the current one to cover.
+
+    Returns:
+        List[str]: The partitions created.
+    """
+    # Only one runner at a time creates partitions, and never during a migration
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+
+    until = add_months(month_start(datetime.now(timezone.utc).date()), months_ahead + 1)
+    created = []
+    for table in PARTITIONED_TABLES:
+        if await is_partitioned(conn, table):
+            created += await create_partitions(conn, table, until)
+    if created:
+        logger.info("Created partitions %s", ", ".join(created))
+    return created
+
+
+async def drop_empty_partitions(conn: AsyncConnection, table: str, before: datetime,
+                                lock_timeout: str = "5s") -> List[str]:
+    """
+    Drop the partitions of `table` that end by `before` and hold no rows, such as months moved to the archive.
+
+    A partition is detached with `DETACH PARTITION ... CONCURRENTLY`, which never blocks
+    reads or writes of the parent, then locked and checked again: a row that arrived
+    in the meantime puts it back instead of being dropped with it. The detach waits at
+    most `lock_timeout` for its locks; a partition that cannot be detached in time is
+    left for the next run, and so is one whose detach was interrupted, which that run
+    finalizes.
+
+    Args:
+        conn (AsyncConnection): An autocommit connection; `CONCURRENTLY` cannot run in a transaction.
+        table (str): A partitioned table.
+        before (datetime): Only partitions whose upper bound is not after this are dropped.
+        lock_timeout (str, optional): Longest wait for a lock, as a Postgres interval. Defaults to "5s".
+
+    Returns:
+        List[str]: The partitions dropped.
+    """
+    if not await is_partitioned(conn, table):
+        return []
+
+    await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+    await conn.execute(text(f"SET lock_timeout = '{lock_timeout}'"))
+    dropped = []
+    try:
+        for name, upper, partition_bound, pending in (await conn.execute(DETACHABLE_SQL, {"table": table})).all():
+            if upper is None or upper > before:
+                continue
+            try:
+                if pending:
+                    await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name} FINALIZE"))
+                elif await conn.scalar(text(f"SELECT NOT EXISTS (SELECT 1 FROM {name})")):
+                    await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY"))
+                else:
+                    continue
+
+                # Detached, the partition is out of every query, so nothing holds this lock for long
+                async with conn.engine.begin() as drop:
+                    await drop.execute(text(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE"))
+                    if await drop.scalar(text(f"SELECT NOT EXISTS (SELECT 1 FROM {name})")):
+                        await drop.execute(text(f"DROP TABLE {name}"))
+                        dropped.append(name)
+                    else:
+                        logger.warning("Partition %s received rows while it was detached, attaching it again", name)
+                        await drop.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} {partition_bound}"))
+            except DBAPIError as error:
+                if getattr(error.orig, "sqlstate", None) != LOCK_NOT_AVAILABLE:
+                    raise
+                logger.warning("Partition %s is busy, leaving it for the next run", name)
+    finally:
+        await conn.execute(text("RESET lock_timeout"))
+        await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEMA_LOCK_KEY})
+
+    if dropped:
+        logger.info("Dropped empty partitions %s", ", ".join(dropped))
+    return dropped
@@ -0,0 +1,73 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    """The SQL statements run while a tracker was active: how many, how long, and which ones repeated."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+
+    def observe(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def most_repeated(self) -> Tuple[str, int]:
+        """The statement run most often and how many times, the usual sign of a query in a loop."""
+        if not self.statements:
+            return "", 0
+        return self.statements.most_common(1)[0]
+
+    def report(self) -> str:
+        lines = [f"{self.count} statements in {self.seconds * 1e3:.1f} ms"]
+        lines += [f"  {times} x {' '.join(statement.split())}" for statement, times in self.statements.most_common()]
+        return "\n".join(lines)
+
+
+# Trackers active in the current task, innermost last; every one of them counts each statement
+_trackers: ContextVar[Tuple[QueryStats, ...]] = ContextVar("query_trackers", default=())
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Count the statements run by the current task inside the block, on any engine.
+
+    Trackers nest: a test tracking a whole request also sees the statements counted
+    by the request's own tracker.
+    """
+    stats = QueryStats()
+    token = _trackers.set(_trackers.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _trackers.reset(token)
+
+
+# Registered on the Engine class, so the primary, the replica and the engines of scripts are all counted.
+# SQLAlchemy runs the async engines' statements in a greenlet that shares the task's context.
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    if _trackers.get():
+        conn.info["query_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    trackers = _trackers.get()
+    started = conn.info.pop("query_started", None)
+    if not trackers or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    for stats in trackers:
+        stats.observe(statement, elapsed)
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import AsyncGenerator, Optional
+
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.config import settings
+from app.database import async_db
+
+
+logger = logging.getLogger(__name__)
+
+# Lag and replayed WAL position of the replica. The lag is NULL, i.e. unknown, when the
+# server is not a standby or its WAL receiver is not connected: with the receiver gone
+# nothing new arrives, so received and replayed positions match although the data is stale.
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END, pg_last_wal_replay_lsn()::text
+""")
+
+# The client carries the primary's WAL position after its last write, in a cookie or this header
+READ_AFTER_COOKIE = "read_after"
+READ_AFTER_HEADER = "X-Read-After"
+
+
+def parse_lsn(lsn: Optional[str]) -> Optional[int]:
+    """A Postgres WAL position such as "16/B374D848" as an integer, or None if it is not one."""
+    high, _, low = (lsn or "").partition("/")
+    try:
+        return (int(high, 16) << 32) | int(low, 16)
+    except ValueError:
+        return None
+
+
+class ReplicaRouter:
+    """
+    Chooses between the replica and the primary for read-only requests.
+
+    Reads go to the replica while its replay lag, checked at most every `check_every`
+    seconds, stays within `max_lag`; otherwise, if the lag is unknown or the check
+    fails, they fall back to the primary. A client that has just written carries the
+    primary's WAL position from after the write (see `read_your_writes`) and reads
+    from the primary until the replica is known to have replayed that far, on
+    whichever worker or host serves it.
+    """
+
+    def __init__(self, max_lag: float, check_every: float):
+        self.max_lag = max_lag
+        self.check_every = check_every
+        self._lock = asyncio.Lock()
+        self._checked_at = float("-inf")
+        self.lag: Optional[float] = None
+        self.replay_lsn: Optional[int] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.pinned_reads = 0
+
+    def is_pinned(self, read_after: Optional[int]) -> bool:
+        """Whether the replica may not have replayed up to `read_after` yet."""
+        return read_after is not None and (self.replay_lsn is None or self.replay_lsn < read_after)
+
+    async def replica_usable(self) -> bool:
+        """Whether the replica is configured and its last measured lag is acceptable."""
+        if async_db.engine_replica is None:
+            return False
+
+        if time.monotonic() - self._checked_at >= self.check_every:
+            async with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_every:
+                    await self._check_lag()
+
+        return self.lag is not None and self.lag <= self.max_lag
+
+    async def _check_lag(self):
+        self._checked_at = time.monotonic()
+        try:
+            async with async_db.engine_replica.connect() as conn:
+                lag, replay_lsn = (await conn.execute(LAG_QUERY)).one()
+        except Exception as error:
+            logger.warning("Replica lag check failed, reading from the primary: %s", error)
+            self.lag, self.replay_lsn = None, None
+            return
+
+        if lag is None:
+            logger.warning("Replica is not streaming from the primary, reading from the primary")
+        self.lag = float(lag) if lag is not None else None
+        self.replay_lsn = parse_lsn(replay_lsn)
+
+    async def session_maker(self, read_after: Optional[int]):
+        """
+        Pick the session factory for a read-only request.
+
+        Args:
+            read_after (int, optional): WAL position the client's reads must include, if it wrote recently.
+
+        Returns:
+            sessionmaker: The replica's factory, or the primary's.
+        """
+        replica_usable = await self.replica_usable()
+        if replica_usable and self.is_pinned(read_after):
+            self.pinned_reads += 1
+            return async_db.async_session_maker
+
+        if replica_usable:
+            self.replica_reads += 1
+            return async_db.replica_session_maker
+
+        self.primary_reads += 1
+        return async_db.async_session_maker
+
+    def as_dict(self) -> dict:
+        stats = {
+            "configured": async_db.engine_replica is not None,
+            "lag_s": self.lag,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "pinned_reads": self.pinned_reads,
+        }
+        if async_db.engine_replica is not None:
+            stats["pool"] = async_db.pool_status(async_db.engine_replica)
+        return stats
+
+
+replica_router = ReplicaRouter(
+    max_lag=settings.replica_max_lag_seconds,
+    check_every=settings.replica_lag_check_seconds,
+)
+
+
+# Read-your-writes: `read_your_writes` gives each request a flag, set when one of its primary sessions commits a write.
+# The flag is a mutable holder, so the endpoint's context, a copy of the middleware's, can still set it.
+_request_writes: ContextVar[Optional[dict]] = ContextVar("request_writes", default=None)
+
+
+@event.listens_for(async_db.PrimarySession, "do_orm_execute")
+def _note_statement_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(async_db.PrimarySession, "after_flush")
+def _note_flush_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(async_db.PrimarySession, "after_commit")
+def _note_committed_write(session):
+    writes = _request_writes.get()
+    if session.info.pop("wrote", False) and writes is not None:
+        writes["committed"] = True
+
+
+async def read_your_writes(request: Request, call_next):
+    """
+    HTTP middleware handing a client that wrote the primary's WAL position after its write.
+
+    The position goes out as the `read_after` cookie and the `X-Read-After` header,
+    for clients that do not keep cookies to send back. `get_read_session` keeps their
+    reads on the primary until the replica has replayed that far. The cookie expires
+    after `read_your_writes_seconds`, by which time a healthy replica has long caught up.
+    """
+    writes = {"committed": False}
+    token = _request_writes.set(writes)
+    try:
+        response = await call_next(request)
+    finally:
+        _request_writes.reset(token)
+
+    if writes["committed"] and async_db.engine_replica is not None:
+        async with async_db.engine_asinc.connect() as conn:
+            lsn = await conn.scalar(text("SELECT pg_current_wal_lsn()::text"))
+        response.headers[READ_AFTER_HEADER] = lsn
+        response.set_cookie(READ_AFTER_COOKIE, lsn, max_age=int(settings.read_your_writes_seconds),
+                            httponly=True, samesite="lax")
+    return response
+
+
+def _read_after(request: Request) -> Optional[int]:
+    return parse_lsn(request.headers.get(READ_AFTER_HEADER) or request.cookies.get(READ_AFTER_COOKIE))
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Yield a session for a read-only endpoint, on the replica when it is safe to use.
+
+    Never write through this session. Clients that wrote recently, and send back
+    the position `read_your_writes` gave them, read from the primary until the
+    replica has caught up with their write.
+    """
+    maker = await replica_router.session_maker(_read_after(request))
+    async with maker() as session:
+        yield session
@@ -0,0 +1,192 @@
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+
+# Messages are written by the socket service, not by this API, so derived
+# data that has to follow every write is maintained inside Postgres.
+
+SCHEMA_LOCK_KEY = 7305001
+
+# The schema as the migrations in `app.database.migrate` leave it, checked by `verify_schema`.
+# A migration runs its own frozen DDL from `app.database.history`; change this catalogue
+# together with the migration, never instead of one.
+
+# (table, column) of the columns migrations added to tables that already existed
+COLUMNS = [
+    ("socket", "updated_at"),
+    ("socket", "vote_count"),
+    ("socket", "room_id"),
+    ("room_stats", "archived_messages"),
+]
+
+FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION room_stats_on_room() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO room_stats (room_id) VALUES (NEW.id) ON CONFLICT (room_id) DO NOTHING;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION room_stats_on_message() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE room_stats
+               SET count_messages = room_stats.count_messages + 1,
+                   last_activity = GREATEST(room_stats.last_activity, NEW.created_at)
+             WHERE room_stats.room_id = NEW.room_id;
+            RETURN NEW;
+        END IF;
+
+        UPDATE room_stats
+           SET count_messages = GREATEST(room_stats.count_messages - 1, 0)
+         WHERE room_stats.room_id = OLD.room_id;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION room_stats_on_status() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.room_id IS NOT DISTINCT FROM NEW.room_id THEN
+            RETURN NEW;
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE room_stats
+               SET count_users = GREATEST(room_stats.count_users - 1, 0)
+             WHERE room_stats.room_id = OLD.room_id;
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'INSERT') THEN
+            UPDATE room_stats
+               SET count_users = room_stats.count_users + 1
+             WHERE room_stats.room_id = NEW.room_id;
+            RETURN NEW;
+        END IF;
+
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION socket_room_id() RETURNS trigger AS $$
+    BEGIN
+        -- Dual write while the socket service moves from room names to room IDs
+        IF NEW.room_id IS NULL THEN
+            SELECT id INTO NEW.room_id FROM rooms WHERE name_room = NEW.rooms;
+        ELSIF NEW.rooms IS NULL THEN
+            SELECT name_room INTO NEW.rooms FROM rooms WHERE id = NEW.room_id;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION socket_touch() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at = now();
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION socket_on_vote() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE socket
+               SET vote_count = vote_count - COALESCE(OLD.dir, 0), updated_at = now()
+             WHERE id = OLD.message_id;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'INSERT') THEN
+            UPDATE socket
+               SET vote_count = vote_count + COALESCE(NEW.dir, 0), updated_at = now()
+             WHERE id = NEW.message_id;
+            RETURN NEW;
+        END IF;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION socket_delete_votes() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM votes WHERE message_id = OLD.id;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION private_messages_delete_votes() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM private_message_votes WHERE message_id = OLD.id;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+# (name, table, timing, function)
+TRIGGERS = [
+    ("room_stats_room_insert", "rooms", "AFTER INSERT", "room_stats_on_room"),
+    ("room_stats_message_change", "socket", "AFTER INSERT OR DELETE", "room_stats_on_message"),
+    ("room_stats_status_change", "user_status", "AFTER INSERT OR UPDATE OF room_id OR DELETE", "room_stats_on_status"),
+    ("socket_room_id", "socket", "BEFORE INSERT", "socket_room_id"),
+    ("socket_touch", "socket", 'BEFORE UPDATE OF message, "fileUrl", edited', "socket_touch"),
+    ("socket_on_vote", "votes", "AFTER INSERT OR UPDATE OR DELETE", "socket_on_vote"),
+    # Stand in for ON DELETE CASCADE, which cannot reference a partitioned table by id alone
+    ("socket_delete_votes", "socket", "AFTER DELETE", "socket_delete_votes"),
+    ("private_messages_delete_votes", "private_messages", "AFTER DELETE", "private_messages_delete_votes"),
+]
+
+# Secondary indexes of the hot paths: (name, table, columns), built online by the migrations.
+# Messages are paged by (created_at, id) within a room, newest first, which a backward scan serves.
+INDEXES = [
+    ("ix_socket_room_id_created_at_id", "socket", "room_id, created_at, id"),
+    ("ix_votes_message_id", "votes", "message_id"),
+    ("ix_user_status_room_id", "user_status", "room_id"),
+    ("ix_tabs_user_id_tab_id", "tabs", "user_id, tab_id"),
+    ("ix_room_invitations_recipient_id_status", "room_invitations", "recipient_id, status"),
+    ("ix_bans_room_id_user_id", "bans", "room_id, user_id"),
+    ("ix_role_in_room_room_id_user_id", "role_in_room", "room_id, user_id"),
+    ("ix_users_token_verify", "users", "token_verify"),
+    ("ix_password_reset_email_reset_code", "password_reset", "email, reset_code"),
+]
+
+
+async def missing_objects(conn: AsyncConnection) -> List[str]:
+    """
+    List the columns, triggers and indexes of the catalogue that the database lacks.
+
+    Args:
+        conn (AsyncConnection): A database connection.
+
+    Returns:
+        List[str]: One entry per missing object, e.g. "trigger socket_touch on socket".
+    """
+    missing = []
+    for table, column in COLUMNS:
+        found = await conn.scalar(text("""
+            SELECT 1 FROM information_schema.columns
+             WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column
+        """), {"table": table, "column": column})
+        if not found:
+            missing.append(f"column {table}.{column}")
+
+    for name, table, _, _ in TRIGGERS:
+        found = await conn.scalar(text("""
+            SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass(:table) AND tgname = :name AND NOT tgisinternal
+        """), {"table": table, "name": name})
+        if not found:
+            missing.append(f"trigger {name} on {table}")
+
+    for name, table, _ in INDEXES:
+        found = await conn.scalar(text("""
+            SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(:name) AND indrelid = to_regclass(:table)
+        """), {"table": table, "name": name})
+        if not found:
+            missing.append(f"index {name} on {table}")
+    return missing
@@ -1,5 +1,8 @@
 
-from sched import scheduler
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
@@ -16,28 +19,42 @@ from .routers.invitations import invitation_secret_room
 from .routers.token_test import ass
 from .routers.reset import password_reset, password_reset_mobile, change_and_block
 from .routers.mail import contact_form
+from .routers.health import health
+
+
+from .config.scheduler import acquire_scheduler_lock, release_scheduler_lock, setup_scheduler#, scheduler
+from app.config.config import settings
+from app.database.async_db import async_session_maker, engine_asinc, engine_replica, wait_for_database
+from app.database.migrate import verify_schema
+from app.database.query_counter import track_queries
+from app.database.replica import read_your_writes
+from app.services.clients import external_clients
 
 
-from .config.scheduler import setup_scheduler#, scheduler
-from .database.database import engine
-from app.database.async_db import async_session_maker, engine_asinc
-from app.models import user_model, room_model, image_model, password_model, messages_model
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Storage clients start in the background: a slow B2 or Supabase must not hold up the worker
+    client_tasks = [asyncio.create_task(client.start()) for client in external_clients]
 
+    await wait_for_database()
+    # Schema changes are applied by `python -m app.database.migrate` before the workers start
+    await verify_schema()
+    # One process in the deployment runs the scheduled jobs
+    scheduler_lock = await acquire_scheduler_lock()
+    scheduler = setup_scheduler(async_session_maker) if scheduler_lock is not None else None
+
+    yield
+
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
+        await release_scheduler_lock(scheduler_lock)
+    for task in client_tasks:
+        task.cancel()
+    await engine_asinc.dispose()
+    if engine_replica is not None:
+        await engine_replica.dispose()
 
-async def init_db():
-    async with engine_asinc.begin() as conn:
-        await conn.run_sync(user_model.Base.metadata.create_all)
-        await conn.run_sync(room_model.Base.metadata.create_all)
-        await conn.run_sync(image_model.Base.metadata.create_all)
-        await conn.run_sync(password_model.Base.metadata.create_all)
-        await conn.run_sync(messages_model.Base.metadata.create_all)
-        
-def startup_event():
-    setup_scheduler(async_session_maker)
-    
-async def on_shutdown():
-    scheduler.shutdown()
 
 app = FastAPI(
     root_path="/api",
@@ -45,8 +62,7 @@ app = FastAPI(
     title="Chat",
     description="Chat documentation",
     version="0.1.3",
-    on_startup=[init_db, startup_event],
-    # on_shutdown=[on_shutdown]
+    lifespan=lifespan,
 )
 
 origins = ["*"]
@@ -57,8 +73,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-DB-Queries", "X-DB-Time-Ms", "X-Read-After"],
 )
 
+app.middleware("http")(read_your_writes)
+
+logger = logging.getLogger(__name__)
+
+
+@app.middleware("http")
+async def count_queries(request: Request, call_next):
+    # Statements per request: in debug mode as response headers, and a warning for any statement run in a loop
+    with track_queries() as queries:
+        response = await call_next(request)
+
+    if settings.debug:
+        response.headers["X-DB-Queries"] = str(queries.count)
+        response.headers["X-DB-Time-Ms"] = f"{queries.seconds * 1e3:.1f}"
+
+    statement, times = queries.most_repeated()
+    if settings.query_repeat_warning and times >= settings.query_repeat_warning:
+        logger.warning("Possible N+1 in %s %s: %d statements, one of them %d times: %s",
+                       request.method, request.url.path, queries.count, times, " ".join(statement.split()))
+    return response
+
 # Setup Scheduler
 
 
@@ -101,6 +139,8 @@ app.include_router(verify_user.router)
 # Check token
 app.include_router(ass.router)
 
+app.include_router(health.router)
+
 
 
 
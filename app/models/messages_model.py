@@ -11,6 +11,11 @@ from app.database.database import Base
 
 
 
+# `socket` and `private_messages` are partitioned by month on created_at (see `app.database.partitions`).
+# Their only unique constraint in the database is the key (id, created_at): Postgres cannot enforce `id`
+# alone across partitions. The ORM still takes `id` as the identity because every row draws it from the
+# one sequence owned by the parent table, which `attach_legacy` checks; nothing may insert explicit ids
+# or reset that sequence.
 class Socket(Base):
     __tablename__ = 'socket'
     
@@ -18,10 +23,14 @@ class Socket(Base):
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
     message = Column(String)
     receiver_id = Column(Integer, ForeignKey('users.id', ondelete='SET NULL'))
-    rooms = Column(String, ForeignKey('rooms.name_room', ondelete='CASCADE', onupdate='CASCADE'), nullable=False)
+    room_id = Column(Integer, ForeignKey('rooms.id', ondelete='CASCADE'), nullable=False)
+    # Retired: room name at send time, kept for the socket service until it writes room_id; never read
+    rooms = Column(String)
     id_return = Column(Integer)
     fileUrl = Column(String)
     edited = Column(Boolean, server_default='false') 
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    vote_count = Column(Integer, nullable=False, server_default='0')
     
     
     
@@ -106,4 +106,15 @@ class Ban(Base):
     start_time = Column(DateTime)
     end_time = Column(DateTime)
     
-    user = relationship("User", back_populates="bans")
\ No newline at end of file
+    user = relationship("User", back_populates="bans")
+    
+    
+class RoomStats(Base):
+    __tablename__ = 'room_stats'
+    
+    room_id = Column(Integer, ForeignKey("rooms.id", ondelete="CASCADE"), primary_key=True)
+    count_messages = Column(Integer, nullable=False, server_default='0')
+    # Messages moved to the cold archive, not counted by count_messages any more
+    archived_messages = Column(Integer, nullable=False, server_default='0')
+    count_users = Column(Integer, nullable=False, server_default='0')
+    last_activity = Column(TIMESTAMP(timezone=True), nullable=True)
@@ -1,6 +1,6 @@
 from datetime import timedelta
 from tkinter import CASCADE
-from sqlalchemy import JSON, Column, Integer, Interval, String, Boolean, ForeignKey, Enum, UniqueConstraint
+from sqlalchemy import JSON, Column, Float, Integer, Interval, String, Boolean, ForeignKey, Enum, UniqueConstraint
 from sqlalchemy.sql.expression import text
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from sqlalchemy.orm import relationship
@@ -80,5 +80,20 @@ class UserDeactivation(Base):
         UniqueConstraint('user_name', name='uq_deactivation_user_name'),
     )
 
-    
- 
\ No newline at end of file
+
+class TokenRevocation(Base):
+    __tablename__ = 'token_revocations'
+
+    # No foreign key: deleting a user must leave the revocation in place
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    revoked_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+
+
+class AuthRateLimit(Base):
+    __tablename__ = 'auth_rate_limits'
+    # Throttling state only: losing it on a crash merely resets the budgets
+    __table_args__ = {'prefixes': ['UNLOGGED']}
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
@@ -0,0 +1,74 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from app.auth import passwords, rate_limit
+from app.auth.principal import principal_cache
+from app.auth.revocation import revocation_list
+from app.database import async_db
+from app.database.async_db import pool_status
+from app.database.replica import replica_router
+from app.services import message_crypto
+from app.services.clients import external_clients
+from app.services.hot_tail import hot_tail
+from app.services.message_archive import message_archive
+from app.services.plaintext_cache import plaintext_cache
+from app.services.room_meta import room_meta
+
+
+router = APIRouter(
+    prefix="/health",
+    tags=['Health'],
+)
+
+
+async def _database_status(engine) -> dict:
+    try:
+        await async_db.check_database(engine)
+    except Exception as error:
+        return {"ok": False, "error": f"{type(error).__name__}: {error}"}
+    return {"ok": True}
+
+
+@router.get("/ready", include_in_schema=False)
+async def get_ready():
+    """
+    Report whether this worker can serve traffic, and the state of each dependency.
+
+    The worker is ready when the primary database answers. The replica and the storage
+    clients are reported too, but only degrade the features that use them.
+
+    Returns:
+        JSONResponse: 200 when ready, 503 otherwise.
+    """
+    dependencies = {"database": await _database_status(async_db.engine_asinc)}
+    if async_db.engine_replica is not None:
+        dependencies["replica"] = await _database_status(async_db.engine_replica)
+    for client in external_clients:
+        dependencies[client.name] = client.as_dict()
+
+    ready = dependencies["database"]["ok"]
+    return JSONResponse(status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+                        content={"ready": ready, "dependencies": dependencies})
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Report the in-process counters of this worker.
+
+    Returns:
+        dict: Counters grouped by subsystem.
+    """
+    return {
+        "db_pool": pool_status(),
+        "db_replica": replica_router.as_dict(),
+        "decrypt": message_crypto.stats.as_dict(),
+        "plaintext_cache": plaintext_cache.as_dict(),
+        "hot_tail": hot_tail.as_dict(),
+        "message_archive": message_archive.as_dict(),
+        "room_meta": room_meta.as_dict(),
+        "principal": principal_cache.as_dict(),
+        "revocations": revocation_list.as_dict(),
+        "rate_limit": {limiter.name: limiter.as_dict() for limiter in rate_limit.LIMITERS},
+        "passwords": passwords.stats.as_dict(),
+    }
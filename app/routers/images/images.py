@@ -1,6 +1,8 @@
 from fastapi import status, HTTPException, Depends, APIRouter, Response
-from sqlalchemy.orm import Session
-from app.database.database import get_db
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.database.async_db import get_async_session
 from app.models import image_model
 from app.schemas import image
 
@@ -11,34 +13,38 @@ router = APIRouter(
 
 
 @router.get("/")
-async def get_images(db: Session = Depends(get_db)):
-    posts = db.query(image_model.ImagesAll).all()
+async def get_images(db: AsyncSession = Depends(get_async_session)):
+    result = await db.execute(select(image_model.ImagesAll))
+    posts = result.scalars().all()
     return posts
 
 @router.get("/avatars")
-async def get_images(db: Session = Depends(get_db)):
-    posts = db.query(image_model.ImagesAvatar).all()
+async def get_images(db: AsyncSession = Depends(get_async_session)):
+    result = await db.execute(select(image_model.ImagesAvatar))
+    posts = result.scalars().all()
     return posts
 
 @router.get("/rooms")
-async def get_images(db: Session = Depends(get_db)):
-    posts = db.query(image_model.ImagesRooms).all()
+async def get_images(db: AsyncSession = Depends(get_async_session)):
+    result = await db.execute(select(image_model.ImagesRooms))
+    posts = result.scalars().all()
     return posts
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=image.ImagesResponse)
-async def create_image(images: image.ImagesCreate, db: Session = Depends(get_db)):
+async def create_image(images: image.ImagesCreate, db: AsyncSession = Depends(get_async_session)):
  
     images = image_model.ImagesAll(**images.model_dump())
     db.add(images)
-    db.commit()
-    db.refresh(images)    
+    await db.commit()
+    await db.refresh(images)    
     return images
 
 
 
 @router.get("/{image_room}")
-async def get_room(image_room: str, db: Session = Depends(get_db)):
-    post = db.query(image_model.ImagesAll).filter(image_model.ImagesAll.image_room == image_room).all()
+async def get_room(image_room: str, db: AsyncSession = Depends(get_async_session)):
+    result = await db.execute(select(image_model.ImagesAll).where(image_model.ImagesAll.image_room == image_room))
+    post = result.scalars().all()
     
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
@@ -47,13 +53,13 @@ async def get_room(image_room: str, db: Session = Depends(get_db)):
 
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_room(id: int, db: Session = Depends(get_db)):
-    post = db.query(image_model.ImagesAll).filter(image_model.ImagesAll.id == id)
+async def delete_room(id: int, db: AsyncSession = Depends(get_async_session)):
+    post = await db.get(image_model.ImagesAll, id)
     
-    if post.first() == None:
+    if post == None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Image_room with: {id} not found")
     
-    post.delete(synchronize_session=False)
-    db.commit()
+    await db.execute(delete(image_model.ImagesAll).where(image_model.ImagesAll.id == id))
+    await db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
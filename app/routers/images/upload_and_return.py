@@ -1,46 +1,43 @@
 from fastapi import File, UploadFile, APIRouter
-from supabase import create_client, Client
-from app.config.config import settings
+from supabase import Client
+from app.services import clients
 
 from fastapi import Depends, APIRouter
-from sqlalchemy.orm import Session
-from app.database.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.async_db import get_async_session
 from app.models import image_model
 from app.schemas import image
 
 
 
-url: str = settings.supabase_url
-key: str = settings.supabase_key
-supabase: Client = create_client(url, key)
-
 router = APIRouter(
     prefix="/upload",
     tags=['Upload file'],  
 )
 
 # Upload to server and database images for avatars
-def public_url(bucket_name, file_path):
+def public_url(supabase: Client, bucket_name, file_path):
     res = supabase.storage.from_(bucket_name).get_public_url(file_path)
     return res
 
-async def create_image_avatars(images: image.UploadAvatar, db: Session = Depends(get_db)):
+async def create_image_avatars(images: image.UploadAvatar, db: AsyncSession = Depends(get_async_session)):
  
     images = image_model.ImagesAvatar(**images.model_dump())
     db.add(images)
-    db.commit()
-    db.refresh(images)    
+    await db.commit()
+    await db.refresh(images)    
     return images
 
 
 @router.post("/upload-avatar")
 async def upload_to_avatars(name: str, 
                             file: UploadFile = File(...), 
-                            db: Session = Depends(get_db), 
+                            db: AsyncSession = Depends(get_async_session), 
                             bucket_name: str = "image_avatars"):
     """
     Upload a file to supabase storage and add its URL to the database.
     """
+    supabase = await clients.supabase.get()
     try:
         # download the image
         file_path = file.filename
@@ -50,7 +47,7 @@ async def upload_to_avatars(name: str,
         upload_response = supabase.storage.from_(bucket_name).upload(file_path, contents, file_options={"contentType": file_mime_type})
         
         # get published url
-        public_url_response = public_url(bucket_name, file_path)
+        public_url_response = public_url(supabase, bucket_name, file_path)
 
         # created object and upload to database
         image_data = {"images_url": public_url_response, "avatar": name}
@@ -65,21 +62,22 @@ async def upload_to_avatars(name: str,
     
     
 # Upload to server and database images for rooms
-async def create_image_rooms(images: image.UploadRooms, db: Session = Depends(get_db)):
+async def create_image_rooms(images: image.UploadRooms, db: AsyncSession = Depends(get_async_session)):
  
     images = image_model.ImagesRooms(**images.model_dump())
     db.add(images)
-    db.commit()
-    db.refresh(images)    
+    await db.commit()
+    await db.refresh(images)    
     return images
 
     
 @router.post("/upload-rooms")
 async def upload_to_rooms(name: str,
                         file: UploadFile = File(...),
-                        db: Session = Depends(get_db),
+                        db: AsyncSession = Depends(get_async_session),
                         bucket_name: str = "image_rooms"):
 
+    supabase = await clients.supabase.get()
     try:
         # download the image
         file_path = file.filename
@@ -89,7 +87,7 @@ async def upload_to_rooms(name: str,
         upload_response = supabase.storage.from_(bucket_name).upload(file_path, contents, file_options={"contentType": file_mime_type})
         
         # get published url
-        public_url_response = public_url(bucket_name, file_path)
+        public_url_response = public_url(supabase, bucket_name, file_path)
 
         # created object and upload to database
         image_data = {"images_url": public_url_response, "rooms": name}
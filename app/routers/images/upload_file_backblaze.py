@@ -1,19 +1,14 @@
 import shutil
 import random
 import string
-from b2sdk.v2 import InMemoryAccountInfo, B2Api
 from tempfile import NamedTemporaryFile
 from fastapi import APIRouter, File, HTTPException, UploadFile, Query
 from fastapi.responses import JSONResponse
-from app.config.config import settings
+from app.services import clients
 import os
 
 
 
-info = InMemoryAccountInfo()
-b2_api = B2Api(info)
-b2_api.authorize_account("production", settings.backblaze_id, settings.backblaze_key)
-
 router = APIRouter(
     prefix="/upload-to-backblaze",
     tags=['Upload file'],
@@ -81,6 +76,7 @@ async def upload_to_backblaze(file: UploadFile = File(..., limit="25MB")):
 
         bucket_name = "chatall"
         # Get the bucket by name
+        b2_api = await clients.b2.get()
         bucket = b2_api.get_bucket_by_name(bucket_name)
 
         # Generate a unique filename for the uploaded file
@@ -95,6 +91,8 @@ async def upload_to_backblaze(file: UploadFile = File(..., limit="25MB")):
         # Get the download URL for the uploaded file
         download_url = b2_api.get_download_url_for_file_name(bucket_name, unique_filename)
         return JSONResponse(status_code=200, content=download_url)
+    except HTTPException:
+        raise
     except Exception as e:
         # Raise a HTTPException with a 500 status code and the error message
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
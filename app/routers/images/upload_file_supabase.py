@@ -1,13 +1,8 @@
 from fastapi import APIRouter, File, UploadFile
-from supabase import create_client, Client
-from app.config.config import settings
+from supabase import Client
+from app.services import clients
 import re
 
-# Налаштування Supabase
-url: str = settings.supabase_url
-key: str = settings.supabase_key
-supabase: Client = create_client(url, key)
-
 router = APIRouter(
     prefix="/upload",
     tags=['Upload file'],
@@ -37,7 +32,7 @@ def generate_new_name(existing_files, original_filename):
 
     return new_filename
 
-def public_url(bucket_name, file_path):
+def public_url(supabase: Client, bucket_name, file_path):
     res = supabase.storage.from_(bucket_name).get_public_url(file_path)
     return res
 
@@ -53,6 +48,7 @@ async def upload_to_supabase(file: UploadFile = File(..., limit="25MB"), bucket_
     Returns:
         str: The public URL of the uploaded file, or an error message.
     """
+    supabase = await clients.supabase.get()
     try:
         # List existing files in the bucket
         existing_files = [f['name'] for f in supabase.storage.from_(bucket_name).list()]
@@ -65,7 +61,7 @@ async def upload_to_supabase(file: UploadFile = File(..., limit="25MB"), bucket_
         # Upload the file
         upload_response = supabase.storage.from_(bucket_name).upload(file_path, contents, file_options={"contentType": file_mime_type})
         
-        return public_url(bucket_name, file_path)
+        return public_url(supabase, bucket_name, file_path)
 
     except Exception as error:
         return {"error": str(error)}
@@ -83,6 +79,7 @@ async def upload_to_supabase_user_avatars(file: UploadFile = File(..., limit="15
     Returns:
         str: The public URL of the uploaded file, or an error message.
     """
+    supabase = await clients.supabase.get()
     try:
         # List existing files in the bucket
         existing_files = [f['name'] for f in supabase.storage.from_(bucket_name).list()]
@@ -95,7 +92,7 @@ async def upload_to_supabase_user_avatars(file: UploadFile = File(..., limit="15
         # Upload the file
         upload_response = supabase.storage.from_(bucket_name).upload(file_path, contents, file_options={"contentType": file_mime_type})
         
-        return public_url(bucket_name, file_path)
+        return public_url(supabase, bucket_name, file_path)
 
     except Exception as error:
         return {"error": str(error)}
\ No newline at end of file
@@ -1,10 +1,8 @@
 from typing import List
 from fastapi import status, HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.auth import oauth2
-from app.database.database import get_db
 from app.database.async_db import get_async_session
 
 from app.models import room_model, user_model
@@ -17,13 +15,13 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[InvitationSchema])
-async def get_pending_invitations(db: Session = Depends(get_db), 
-                                  current_user: user_model.User = Depends(oauth2.get_current_user)):
+async def get_pending_invitations(db: AsyncSession = Depends(get_async_session), 
+                                  current_user: user_model.User = Depends(oauth2.get_current_user_claims)):
     """
     Get a list of all pending invitations for the current user.
 
     Parameters:
-        db (Session): The database session object
+        db (AsyncSession): The database session object
         current_user (user_model.User): The current user
 
     Returns:
@@ -32,10 +30,11 @@ async def get_pending_invitations(db: Session = Depends(get_db),
     Raises:
         HTTPException: If no invitations are found
     """
-    invitations = db.query(room_model.RoomInvitation).filter(
+    result = await db.execute(select(room_model.RoomInvitation).where(
         room_model.RoomInvitation.recipient_id == current_user.id,
         room_model.RoomInvitation.status == 'pending'
-    ).all()
+    ))
+    invitations = result.scalars().all()
     
     if not invitations:
         raise HTTPException(status_code=404, detail="No pending invitations found")
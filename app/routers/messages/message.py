@@ -1,18 +1,24 @@
-from fastapi import status, HTTPException, Depends, APIRouter
-from sqlalchemy import desc, func
+from fastapi import status, HTTPException, Depends, APIRouter, Response
+from sqlalchemy import asc, desc, func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.exc import NoResultFound
 
 from app.auth import oauth2
 from app.database.async_db import get_async_session
-from app.models import user_model, room_model, messages_model
+from app.database.replica import get_read_session
+from app.models import user_model, messages_model
 from app.schemas import message
 from app.config.config import settings
+from app.services.cursors import encode_cursor, decode_cursor
+from app.services.hot_tail import hot_tail
+from app.services.message_archive import Position, message_archive
+from app.services.message_crypto import decrypt_messages
+from app.services.plaintext_cache import plaintext_cache
+from app.services.room_meta import RoomMeta, room_meta
 from sqlalchemy.future import select
-from typing import List
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 
-import base64
-from cryptography.fernet import Fernet, InvalidToken
 
 router = APIRouter(
     prefix="/messages",
@@ -23,37 +29,15 @@ router = APIRouter(
 
 
 
-key = settings.key_crypto
-cipher = Fernet(key)
-
-def is_base64(s):
-    try:
-        return base64.b64encode(base64.b64decode(s)).decode('utf-8') == s
-    except Exception:
-        return False
-
-
-async def async_decrypt(encoded_data: str):
-    if not is_base64(encoded_data):
-       
-        return encoded_data  
-
-    try:
-        encrypted = base64.b64decode(encoded_data.encode('utf-8'))
-        decrypted = cipher.decrypt(encrypted).decode('utf-8')
-        return decrypted
-    except InvalidToken:
-        return None
-
 @router.get("/", response_model=List[message.SocketModel], include_in_schema=False)
-async def get_posts(session: AsyncSession = Depends(get_async_session), 
+async def get_posts(session: AsyncSession = Depends(get_read_session), 
                     limit: int = 50, skip: int = 0):
     
     """
     Retrieves a list of socket messages with associated user details, paginated by a limit and offset.
 
     Args:
-        session (AsyncSession, optional): Asynchronous database session. Defaults to Depends(get_async_session).
+        session (AsyncSession, optional): Read-only database session, possibly on the replica. Defaults to Depends(get_read_session).
         limit (int, optional): Maximum number of messages to retrieve. Defaults to 50.
         skip (int, optional): Number of messages to skip for pagination. Defaults to 0.
 
@@ -64,13 +48,9 @@ async def get_posts(session: AsyncSession = Depends(get_async_session),
     query = select(
         messages_model.Socket, 
         user_model.User, 
-        func.coalesce(func.sum(messages_model.Vote.dir), 0).label('votes')
-    ).outerjoin(
-        messages_model.Vote, messages_model.Socket.id == messages_model.Vote.message_id
+        messages_model.Socket.vote_count.label('votes')
     ).join(
         user_model.User, messages_model.Socket.receiver_id == user_model.User.id
-    ).group_by(
-        messages_model.Socket.id, user_model.User.id
     ).order_by(
         desc(messages_model.Socket.created_at)
     ).limit(50)
@@ -82,9 +62,10 @@ async def get_posts(session: AsyncSession = Depends(get_async_session),
     raw_messages = result.all()
 
     # Convert raw messages to SocketModel
+    plaintexts = await decrypt_messages([socket.id for socket, _, _ in raw_messages],
+                                        [socket.message for socket, _, _ in raw_messages])
     messages = []
-    for socket, user, votes in raw_messages:
-        decrypted_message = await async_decrypt(socket.message)
+    for (socket, user, votes), decrypted_message in zip(raw_messages, plaintexts):
         messages.append(
             message.SocketModel(
                 created_at=socket.created_at,
@@ -103,65 +84,32 @@ async def get_posts(session: AsyncSession = Depends(get_async_session),
     messages.reverse()
     return messages
 
-async def check_room_blocked(room_id: int, session: AsyncSession):
-    query = select(room_model.Rooms).where(room_model.Rooms.id == room_id, room_model.Rooms.block.is_(True))
-    try:
-        result = await session.execute(query)
-        room_record = result.scalar_one()
-        return True
-    except NoResultFound:
-        return False
-
-@router.get("/{room_id}", response_model=List[message.SocketModel])
-async def get_messages_room(room_id: int, 
-                            session: AsyncSession = Depends(get_async_session), 
-                            limit: int = 50, skip: int = 0):
-    """
-    Retrieves a list of socket messages with associated user details, paginated by a limit and offset.
+async def get_open_room(room_id: int, session: AsyncSession) -> RoomMeta:
+    room = await room_meta.get(session, room_id)
+    if room is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    if room.block:
+        raise HTTPException(status_code=403, detail="Room is blocked")
+    return room
 
-    Args:
-        rooms (str): The rooms of the message.
-        session (AsyncSession, optional): Asynchronous database session. Defaults to Depends(get_async_session).
-        limit (int, optional): Maximum number of messages to retrieve. Defaults to 50.
-        skip (int, optional): Number of messages to skip for pagination. Defaults to 0.
 
-    Returns:
-        List[schemas.SocketModel]: A list of socket messages along with user details, structured as per SocketModel schema.
-    """
-    room_blocked = await check_room_blocked(room_id, session)  
-    if room_blocked:
-        raise HTTPException(status_code=403, detail="Room is blocked")
-    
-    room = select(room_model.Rooms).where(room_model.Rooms.id == room_id)
-    result = await session.execute(room)
-    existing_room = result.scalar_one_or_none()
-    if existing_room is None:
-        raise HTTPException(status_code=404, detail="Room not found")
-    
-    
-    query = select(
-    messages_model.Socket, 
-    user_model.User, 
-    func.coalesce(func.sum(messages_model.Vote.dir), 0).label('votes')
-    ).outerjoin(
-        messages_model.Vote, messages_model.Socket.id == messages_model.Vote.message_id
+def room_messages_query(room_id: int):
+    return select(
+        messages_model.Socket, 
+        user_model.User, 
+        messages_model.Socket.vote_count.label('votes')
     ).outerjoin( 
         user_model.User, messages_model.Socket.receiver_id == user_model.User.id
     ).filter(
-        messages_model.Socket.rooms == existing_room.name_room
-    ).group_by(
-        messages_model.Socket.id, user_model.User.id
-    ).order_by(
-        desc(messages_model.Socket.created_at)
+        messages_model.Socket.room_id == room_id
     )
 
-    result = await session.execute(query)
-    raw_messages = result.all()
 
-    # Convert raw messages to SocketModel
+async def to_socket_models(raw_messages) -> List[message.SocketModel]:
+    plaintexts = await decrypt_messages([socket.id for socket, _, _ in raw_messages],
+                                        [socket.message for socket, _, _ in raw_messages])
     messages = []
-    for socket, user, votes in raw_messages:
-        decrypted_message = await async_decrypt(socket.message)
+    for (socket, user, votes), decrypted_message in zip(raw_messages, plaintexts):
         messages.append(
             message.SocketModel(
                 created_at=socket.created_at,
@@ -177,12 +125,217 @@ async def get_messages_room(room_id: int,
                 edited=socket.edited
             )
         )
+    return messages
+
+
+async def archived_messages(room_id: int, cursor: Optional[Position], direction: Literal["before", "after"],
+                            limit: int, session: AsyncSession) -> List[message.SocketModel]:
+    """
+    Read a page of a room's history from the cold archive, in the order of `direction`.
+
+    The authors are loaded in one query; votes are as they stood when the messages were archived.
+    """
+    rows = await message_archive.page(room_id, cursor, direction, limit)
+    if not rows:
+        return []
+
+    receiver_ids = {row["receiver_id"] for row in rows if row["receiver_id"] is not None}
+    users = {}
+    if receiver_ids:
+        result = await session.execute(select(user_model.User).where(user_model.User.id.in_(receiver_ids)))
+        users = {user.id: user for user in result.scalars()}
+
+    return await to_socket_models([
+        (SimpleNamespace(**row), users.get(row["receiver_id"]), row["vote_count"]) for row in rows
+    ])
+
+
+async def newest_messages(room: RoomMeta, limit: int, session: AsyncSession):
+    """
+    Return the newest `limit` messages of a room in chronological order, and whether older ones exist.
+
+    Served from `hot_tail` when the room's tail is buffered; otherwise the newest
+    `hot_tail.depth` messages are read once and buffered for the following requests.
+    """
+    cached = hot_tail.page(room.id, limit)
+    if cached is not None:
+        return cached
+
+    version = hot_tail.version(room.id)
+    depth = max(limit, hot_tail.depth)
+    query = room_messages_query(room.id).order_by(
+        desc(messages_model.Socket.created_at), desc(messages_model.Socket.id)
+    ).limit(depth + 1)
+
+    result = await session.execute(query)
+    raw_messages = result.all()
+    has_more = len(raw_messages) > depth
+
+    messages = await to_socket_models(raw_messages[:depth])
     messages.reverse()
+    hot_tail.fill(room.id, version, messages, has_more)
+    return messages[-limit:], has_more or len(messages) > limit
+
+
+@router.get("/{room_id}", response_model=List[message.SocketModel])
+async def get_messages_room(room_id: int, 
+                            response: Response,
+                            session: AsyncSession = Depends(get_read_session), 
+                            limit: int = 50,
+                            cursor: Optional[str] = None,
+                            direction: Literal["before", "after"] = "before"):
+    """
+    Retrieves one page of socket messages with associated user details, using keyset pagination.
+
+    Pages are addressed by a `(created_at, id)` cursor. Without a cursor the newest page is returned.
+    Messages moved to the cold archive are paged through as if they were still in the table.
+    When more messages exist in the requested direction, the cursor of the next page is returned
+    in the `X-Next-Cursor` response header.
+
+    Args:
+        room_id (int): The ID of the room.
+        response (Response): The outgoing response, used to set `X-Next-Cursor`.
+        session (AsyncSession, optional): Read-only database session, possibly on the replica. Defaults to Depends(get_read_session).
+        limit (int, optional): Page size, capped at `settings.messages_page_max`. Defaults to 50.
+        cursor (str, optional): Cursor returned by a previous page.
+        direction (str, optional): "before" for older messages, "after" for newer ones. Defaults to "before".
+
+    Returns:
+        List[schemas.SocketModel]: The page of messages in chronological order.
+    """
+    limit = max(1, min(limit, settings.messages_page_max))
+
+    existing_room = await get_open_room(room_id, session)
+
+    # The newest page is served from this worker's buffer of the room's tail
+    if cursor is None and direction == "before":
+        messages, has_more = await newest_messages(existing_room, limit, session)
+        # A room whose table rows do not fill the page continues in the archive
+        if not has_more and len(messages) < limit:
+            edge = (messages[0].created_at, messages[0].id) if messages else None
+            missing = limit - len(messages)
+            older = await archived_messages(room_id, edge, "before", missing + 1, session)
+            has_more = len(older) > missing
+            messages = older[:missing][::-1] + messages
+        if has_more:
+            edge = messages[0]
+            response.headers["X-Next-Cursor"] = encode_cursor(edge.created_at, edge.id)
+        return messages
+
+    cursor_position = decode_cursor(cursor) if cursor is not None else None
+
+    # Older history lives in the archive: a page going forward starts there, and one
+    # going back continues there once the table runs out. One extra message tells
+    # whether another page exists.
+    messages = []
+    if direction == "after":
+        messages = await archived_messages(room_id, cursor_position, direction, limit + 1, session)
+
+    if len(messages) <= limit:
+        query = room_messages_query(existing_room.id)
+
+        position = tuple_(messages_model.Socket.created_at, messages_model.Socket.id)
+        if cursor_position is not None:
+            cursor_created_at, cursor_id = cursor_position
+            query = query.filter(position < tuple_(cursor_created_at, cursor_id) if direction == "before"
+                                 else position > tuple_(cursor_created_at, cursor_id))
+            # Redundant with the row comparison, but only a plain bound on created_at lets Postgres prune partitions
+            query = query.filter(messages_model.Socket.created_at <= cursor_created_at if direction == "before"
+                                 else messages_model.Socket.created_at >= cursor_created_at)
+
+        if direction == "before":
+            query = query.order_by(desc(messages_model.Socket.created_at), desc(messages_model.Socket.id))
+        else:
+            query = query.order_by(asc(messages_model.Socket.created_at), asc(messages_model.Socket.id))
+
+        result = await session.execute(query.limit(limit + 1 - len(messages)))
+        messages += await to_socket_models(result.all())
+
+    if direction == "before" and len(messages) <= limit:
+        edge = (messages[-1].created_at, messages[-1].id) if messages else cursor_position
+        messages += await archived_messages(room_id, edge, direction, limit + 1 - len(messages), session)
+
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if has_more:
+        edge = messages[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(edge.created_at, edge.id)
+
+    if direction == "before":
+        messages.reverse()
     return messages
 
 
 
 
+@router.get("/{room_id}/sync", response_model=message.SocketDelta,
+            responses={204: {"description": "Nothing changed since the watermark"}})
+async def sync_messages_room(room_id: int,
+                             last_id: int,
+                             since: Optional[datetime] = None,
+                             since_id: int = 0,
+                             session: AsyncSession = Depends(get_async_session)):
+    """
+    Returns what changed in a room since the client's last sync.
+
+    `messages` holds messages newer than `last_id`, by ID. `changed` holds already-seen
+    messages edited or re-voted after the (`since`, `since_id`) cursor, by (updated_at, id).
+    Each list is paged on its own watermark, so both always move forward. Feed the
+    returned `last_id`, `since` and `since_id` into the next call. When nothing changed
+    the response is an empty 204; the first call, without `since`, always gets a body.
+
+    `updated_at` is the time the writing transaction started, not when it committed.
+    Changes younger than `sync_settle_seconds` are held back until the next call, so a
+    slower transaction committing later does not land behind the cursor.
+
+    Args:
+        room_id (int): The ID of the room.
+        last_id (int): ID of the newest message the client has.
+        since (datetime, optional): Watermark returned by the previous sync.
+        since_id (int, optional): Message ID part of the watermark returned by the previous sync.
+        session (AsyncSession, optional): Asynchronous database session. Defaults to Depends(get_async_session).
+
+    Returns:
+        schemas.SocketDelta: New and changed messages plus the next watermarks.
+    """
+    existing_room = await get_open_room(room_id, session)
+    limit = settings.messages_page_max
+    settled = await session.scalar(select(func.now() - timedelta(seconds=settings.sync_settle_seconds)))
+
+    new_query = room_messages_query(existing_room.id).filter(
+        messages_model.Socket.id > last_id
+    ).order_by(asc(messages_model.Socket.id)).limit(limit)
+    new_messages = (await session.execute(new_query)).all()
+
+    changed_messages = []
+    if since is not None:
+        changed_query = room_messages_query(existing_room.id).filter(
+            messages_model.Socket.id <= last_id,
+            tuple_(messages_model.Socket.updated_at, messages_model.Socket.id) > tuple_(since, since_id),
+            messages_model.Socket.updated_at <= settled
+        ).order_by(asc(messages_model.Socket.updated_at), asc(messages_model.Socket.id)).limit(limit)
+        changed_messages = (await session.execute(changed_query)).all()
+
+        if not new_messages and not changed_messages:
+            return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    if changed_messages:
+        edge = changed_messages[-1][0]
+        since, since_id = edge.updated_at, edge.id
+    elif since is None:
+        since, since_id = settled, 0
+
+    return message.SocketDelta(
+        messages=await to_socket_models(new_messages),
+        changed=await to_socket_models(changed_messages),
+        last_id=new_messages[-1][0].id if new_messages else last_id,
+        since=since,
+        since_id=since_id
+    )
+
+
+
+
 @router.put("/{id}", include_in_schema=False)
 async def change_message(id_message: int, message_update: message.SocketUpdate,
                          current_user: user_model.User = Depends(oauth2.get_current_user), 
@@ -199,6 +352,8 @@ async def change_message(id_message: int, message_update: message.SocketUpdate,
     message.message = message_update.message
     session.add(message)
     await session.commit()
+    plaintext_cache.invalidate(message.id)
+    hot_tail.invalidate_message(message.id)
 
     return {"message": "Message updated successfully"}
     
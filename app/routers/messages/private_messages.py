@@ -1,8 +1,9 @@
 import logging
 from fastapi import status, HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 from typing import List
-from app.database.database import get_db
+from app.database.async_db import get_async_session
 from app.models import messages_model, user_model
 from app.schemas import private
 
@@ -17,13 +18,13 @@ logger = logging.getLogger(__name__)
 
 
 @router.get("/{user_id}", response_model=List[private.PrivateInfoRecipient])
-async def get_private_recipient(user_id: int, db: Session = Depends(get_db)):
+async def get_private_recipient(user_id: int, db: AsyncSession = Depends(get_async_session)):
     """
     Get a list of recipients in a private chat.
 
     Args:
         user_id (int): The ID of the user whose recipients you want to retrieve.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         List[schemas.PrivateInfoRecipient]: A list of recipients in the private chat.
@@ -33,20 +34,28 @@ async def get_private_recipient(user_id: int, db: Session = Depends(get_db)):
     """
     try:
         # Query for recipients and senders
-        messages_query = db.query(messages_model.PrivateMessage, user_model.User).join(
-            user_model.User, messages_model.PrivateMessage.receiver_id == user_model.User.id
-        ).filter(
+        messages_query = select(messages_model.PrivateMessage).where(
             (messages_model.PrivateMessage.sender_id == user_id) | (messages_model.PrivateMessage.receiver_id == user_id)
         )
 
         # Execute query
-        messages = messages_query.all()
+        messages = (await db.scalars(messages_query)).all()
+
+        # Load every other participant in one query
+        other_user_ids = {message.sender_id if message.receiver_id == user_id else message.receiver_id
+                          for message in messages}
+        users = {}
+        if other_user_ids:
+            users_query = select(user_model.User).where(user_model.User.id.in_(other_user_ids))
+            users = {other_user.id: other_user for other_user in await db.scalars(users_query)}
 
         # Filter and map results
         users_info = {}
-        for message, user in messages:
+        for message in messages:
             other_user_id = message.sender_id if message.receiver_id == user_id else message.receiver_id
-            other_user = db.query(user_model.User).filter(user_model.User.id == other_user_id).first()
+            other_user = users.get(other_user_id)
+            if other_user is None:
+                continue
 
             # Determine if the message is read or not
             is_read = message.is_read if message.receiver_id == user_id else False
@@ -1,9 +1,12 @@
 from fastapi import status, HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 from app.models import messages_model
 from app.schemas import message
 from app.auth import oauth2
-from app.database import database
+from app.database.async_db import get_async_session
+from app.services.hot_tail import hot_tail
 
 router = APIRouter(
     prefix="/vote",
@@ -11,13 +14,13 @@ router = APIRouter(
 )
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def vote(vote: message.Vote, db: Session = Depends(database.get_db), current_user: int = Depends(oauth2.get_current_user)):
+async def vote(vote: message.Vote, db: AsyncSession = Depends(get_async_session), current_user: int = Depends(oauth2.get_current_user)):
     """
     Handles the voting process for a message. Users can cast or retract their vote on a specific message.
 
     Args:
         vote (schemas.Vote): The vote details, including message ID and vote direction.
-        db (Session, optional): Database session dependency. Defaults to Depends(database.get_db).
+        db (AsyncSession, optional): Database session dependency. Defaults to Depends(get_async_session).
         current_user (int): The ID of the current user, obtained through authentication.
 
     Raises:
@@ -29,24 +32,25 @@ def vote(vote: message.Vote, db: Session = Depends(database.get_db), current_use
         dict: A confirmation message indicating the successful addition or deletion of a vote.
     """
     
-    message = db.query(messages_model.Socket).filter(messages_model.Socket.id == vote.message_id).first()
+    message = await db.get(messages_model.Socket, vote.message_id)
     if not message:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Message with id: {vote.message_id} does not exist")
     
-    vote_query = db.query(messages_model.Vote).filter(
+    result = await db.execute(select(messages_model.Vote).where(
         messages_model.Vote.message_id == vote.message_id, messages_model.Vote.user_id == current_user.id
-    )
-    found_vote = vote_query.first()
+    ))
+    found_vote = result.scalars().first()
     
     if (vote.dir == 1):
         if found_vote:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT,
                                 detail=f"User {current_user.id} has already voted on post {vote.message_id}")
         
-        new_vote = messages_model.Vote(message_id = vote.message_id, user_id = current_user.id)
+        new_vote = messages_model.Vote(message_id = vote.message_id, user_id = current_user.id, dir = vote.dir)
         db.add(new_vote)
-        db.commit()
+        await db.commit()
+        hot_tail.invalidate_message(vote.message_id)
         return {"message": "Successfully added voted "}
         
     else:
@@ -54,18 +58,21 @@ def vote(vote: message.Vote, db: Session = Depends(database.get_db), current_use
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                                 detail="Vote does not exist")
             
-        vote_query.delete(synchronize_session=False)
-        db.commit()
+        await db.execute(delete(messages_model.Vote).where(
+            messages_model.Vote.message_id == vote.message_id, messages_model.Vote.user_id == current_user.id
+        ))
+        await db.commit()
+        hot_tail.invalidate_message(vote.message_id)
         
         return {"message": "Successfully deleted vote"}
     
 @router.get('/')
-async def get_votes(id_vote: int, db: Session = Depends(database.get_db), current_user: int = Depends(oauth2.get_current_user)):
+async def get_votes(id_vote: int, db: AsyncSession = Depends(get_async_session), current_user: int = Depends(oauth2.get_current_user_claims)):
     
-    vote_query = db.query(messages_model.Vote).filter(
+    result = await db.execute(select(messages_model.Vote).where(
         messages_model.Vote.message_id == id_vote, messages_model.Vote.user_id == current_user.id
-    )
-    found_vote = vote_query.first()
+    ))
+    found_vote = result.scalars().first()
     if found_vote:
         return True
     else:
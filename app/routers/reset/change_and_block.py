@@ -6,9 +6,9 @@ from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.mail import send_mail
-from ...config import utils
 from app.config.config import settings
-from ...auth import oauth2
+from ...auth import oauth2, passwords
+from ...auth.revocation import revoke_user
 from ...database.async_db import get_async_session
 from app.models import user_model
 from app.schemas import user
@@ -47,10 +47,10 @@ async def reset(password: user.UserUpdatePassword,
     result = await db.execute(query)
     existing_user = result.scalar_one_or_none()
     
-    if not current_user:
+    if not existing_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    if not utils.verify(password.old_password, existing_user.password):
+    if not await passwords.verify_password(password.old_password, existing_user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password."
@@ -58,15 +58,16 @@ async def reset(password: user.UserUpdatePassword,
   
     current_time_utc = datetime.now(pytz.UTC)
     # hashed new password
-    hashed_password = utils.hash(password.new_password)
+    hashed_password = await passwords.hash_password(password.new_password)
 
     # Update password to database
-    current_user.password = hashed_password
-    current_user.password_changed = current_time_utc
-    db.add(current_user)
+    existing_user.password = hashed_password
+    existing_user.password_changed = current_time_utc
+    db.add(existing_user)
     await db.commit()
+    await revoke_user(db, existing_user.id)
     
-    token = current_user.refresh_token
+    token = existing_user.refresh_token
     blocked_link = f"https://{settings.url_address_dns}/api/manipulation/blocked?token={token}"
     await send_mail.send_mail_for_change_password("Changing your account password", current_user.email,
             {
@@ -98,7 +99,7 @@ async def block_account(token: str, request: Request, db: AsyncSession = Depends
     Raises:
     HTTPException: If the user is not found in the database.
     """
-    user = await oauth2.get_current_user(token, db)
+    user = await oauth2.get_token_user(token, db)
     
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
@@ -106,5 +107,6 @@ async def block_account(token: str, request: Request, db: AsyncSession = Depends
     user.blocked = True
     db.add(user)
     await db.commit()
+    await revoke_user(db, user.id)
     
     return templates.TemplateResponse("blocked_account.html", {"request": request})
\ No newline at end of file
@@ -1,15 +1,14 @@
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status
 import pytz
-from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 
 from app.models import user_model
 from app.schemas.reset import PasswordReset, PasswordResetRequest, PasswordResetMobile
-from app.auth import oauth2
-from app.config import utils
+from app.auth import oauth2, passwords
+from app.auth.revocation import revoke_user
 from app.mail.send_mail import password_reset
-from app.database.database import get_db
 from app.database.async_db import get_async_session
 from app.config.config import settings
 
@@ -23,13 +22,13 @@ router = APIRouter(
 
 
 @router.post("/request/", status_code=status.HTTP_202_ACCEPTED, response_description="Reset password")
-async def reset_password(request: PasswordResetRequest, db: Session = Depends(get_db)):
+async def reset_password(request: PasswordResetRequest, db: AsyncSession = Depends(get_async_session)):
     """
     Handles the password reset request. Validates the user's email and initiates the password reset process.
 
     Args:
         request (PasswordResetRequest): The request payload containing the user's email.
-        db (Session, optional): Database session dependency. Defaults to Depends(get_db).
+        db (AsyncSession, optional): Asynchronous database session. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: Raises a 404 error if no user is found with the provided email.
@@ -39,7 +38,8 @@ async def reset_password(request: PasswordResetRequest, db: Session = Depends(ge
         dict: A message confirming that an email has been sent for password reset instructions.
     """
     # Func
-    user = db.query(user_model.User).filter(user_model.User.email == request.email).first()
+    result = await db.execute(select(user_model.User).where(user_model.User.email == request.email))
+    user = result.scalars().first()
     
     
     if not user:
@@ -86,18 +86,19 @@ async def reset(token: str, new_password: PasswordReset, db: AsyncSession = Depe
         dict: A message confirming that the password has been successfully reset.
     """
     
-    user = await oauth2.get_current_user(token, db)
+    user = await oauth2.get_token_user(token, db)
 
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
     current_time_utc = datetime.now(pytz.UTC)
     # hashed new password
-    hashed_password = utils.hash(new_password.password)
+    hashed_password = await passwords.hash_password(new_password.password)
 
     # Update password to database
     user.password = hashed_password
     user.blocked = False
     user.password_changed = current_time_utc
     db.add(user)
-    await db.commit()
\ No newline at end of file
+    await db.commit()
+    await revoke_user(db, user.id)
\ No newline at end of file
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy import update, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 import pytz
 from datetime import datetime, timedelta
 
+from app.auth import passwords, rate_limit
+from app.auth.revocation import revoke_user
 from app.models import user_model, password_model
 from app.schemas.reset import PasswordResetRequest, PasswordResetMobile, PasswordResetV2
 
@@ -47,8 +49,10 @@ async def request_password_reset(email: PasswordResetRequest,
 
 
 @router.post("/code_verification")
-async def reset_password_v2_code(reset: PasswordResetV2, db: AsyncSession = Depends(get_async_session)):
+async def reset_password_v2_code(request: Request, reset: PasswordResetV2, db: AsyncSession = Depends(get_async_session)):
     
+    # Both routes check the same code, so they draw on one budget
+    await rate_limit.enforce(request, "reset_code", reset.email)
     stmt = select(password_model.PasswordReset).where(password_model.PasswordReset.email == reset.email,
                                                  password_model.PasswordReset.reset_code == reset.code,
                                                  password_model.PasswordReset.is_active == True)
@@ -69,8 +73,9 @@ async def reset_password_v2_code(reset: PasswordResetV2, db: AsyncSession = Depe
     return Response(status_code=status.HTTP_200_OK)
 
 @router.post("/reset-password")
-async def reset_password(reset: PasswordResetMobile, db: AsyncSession = Depends(get_async_session)):
+async def reset_password(request: Request, reset: PasswordResetMobile, db: AsyncSession = Depends(get_async_session)):
     
+    await rate_limit.enforce(request, "reset_code", reset.email)
     stmt = select(password_model.PasswordReset).where(password_model.PasswordReset.email == reset.email,
                                                  password_model.PasswordReset.reset_code == reset.code,
                                                  password_model.PasswordReset.is_active == True)
@@ -88,11 +93,16 @@ async def reset_password(reset: PasswordResetMobile, db: AsyncSession = Depends(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Code reset not active")
     
-    stmt_update = update(user_model.User).where(user_model.User.email == reset.email).values(password=utils.hash(reset.password),
+    hashed_password = await passwords.hash_password(reset.password)
+    stmt_update = update(user_model.User).where(user_model.User.email == reset.email).values(password=hashed_password,
                                                                                      blocked=False,
-                                                                                     password_changed=current_time_utc)
+                                                                                     password_changed=current_time_utc
+                                                                                     ).returning(user_model.User.id)
     result = await db.execute(stmt_update)
+    user_ids = result.scalars().all()
     await db.commit()
+    for user_id in user_ids:
+        await revoke_user(db, user_id)
     
     stmt_delete = delete(password_model.PasswordReset).where(password_model.PasswordReset.email == reset.email)
     result = await db.execute(stmt_delete)
@@ -18,7 +18,7 @@ router = APIRouter(
 
 @router.get('/mute-users/{room_id}')
 async def list_mute_users(room_id: int, db: AsyncSession = Depends(get_async_session), 
-                          current_user: user_model.User = Depends(oauth2.get_current_user)):
+                          current_user: user_model.User = Depends(oauth2.get_current_user_claims)):
 
     if current_user.blocked == True:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
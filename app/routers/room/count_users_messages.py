@@ -1,9 +1,9 @@
 from fastapi import status, HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 from typing import List
-from app.database.database import get_db
-from app.models import messages_model, user_model
+from app.database.async_db import get_async_session
+from app.models import room_model
 from app.schemas import room
 
 router = APIRouter(
@@ -14,12 +14,12 @@ router = APIRouter(
 
 
 @router.get("/messages", response_model=List[room.CountMessages])
-async def get_count_messages(db: Session = Depends(get_db)):
+async def get_count_messages(db: AsyncSession = Depends(get_async_session)):
     """
     Get the count of messages in each room.
 
     Parameters:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         List[schemas.CountMessages]: A list of count messages.
@@ -27,8 +27,12 @@ async def get_count_messages(db: Session = Depends(get_db)):
     Raises:
         HTTPException: If no messages found.
     """
-    query_result = db.query(messages_model.Socket.rooms, func.count(messages_model.Socket.id).label('count')).group_by(
-        messages_model.Socket.rooms).filter(messages_model.Socket.rooms != 'Hell').all()
+    # Archived messages still count as messages of the room
+    total = room_model.RoomStats.count_messages + room_model.RoomStats.archived_messages
+    result = await db.execute(select(room_model.Rooms.name_room, total).join(
+        room_model.RoomStats, room_model.RoomStats.room_id == room_model.Rooms.id).where(
+        room_model.Rooms.name_room != 'Hell', total > 0))
+    query_result = result.all()
     
     if not query_result:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
@@ -40,12 +44,12 @@ async def get_count_messages(db: Session = Depends(get_db)):
 
 
 @router.get("/users", response_model=List[room.CountUsers])
-async def get_count_users(db: Session = Depends(get_db)):
+async def get_count_users(db: AsyncSession = Depends(get_async_session)):
     """
     Get the count of users in each room.
 
     Parameters:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         List[schemas.CountUsers]: A list of count users.
@@ -53,8 +57,10 @@ async def get_count_users(db: Session = Depends(get_db)):
     Raises:
         HTTPException: If no users found.
     """
-    query_result = db.query(user_model.User_Status.name_room, func.count(user_model.User_Status.id).label('count')).group_by(
-        user_model.User_Status.name_room).filter(user_model.User_Status.name_room != 'Hell').all()
+    result = await db.execute(select(room_model.Rooms.name_room, room_model.RoomStats.count_users).join(
+        room_model.RoomStats, room_model.RoomStats.room_id == room_model.Rooms.id).where(
+        room_model.Rooms.name_room != 'Hell', room_model.RoomStats.count_users > 0))
+    query_result = result.all()
     
     if not query_result:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
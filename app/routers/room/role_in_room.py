@@ -15,7 +15,7 @@ router = APIRouter(
 
 @router.get('/')
 async def list_role_in_room(db: AsyncSession = Depends(get_async_session), 
-                          current_user: user_model.User = Depends(oauth2.get_current_user)):
+                          current_user: user_model.User = Depends(oauth2.get_current_user_claims)):
     """
     Retrieves the role in room for the authenticated user.
 
@@ -46,7 +46,7 @@ async def list_role_in_room(db: AsyncSession = Depends(get_async_session),
 # Get info user role admin option
 @router.get('/admin/{user_id}')
 async def list_role_in_room(user_id: int, db: AsyncSession = Depends(get_async_session), 
-                          current_user: user_model.User = Depends(oauth2.get_current_user)):
+                          current_user: user_model.User = Depends(oauth2.get_current_user_claims)):
     """
     Admin option to get role in room for a specific user.
 
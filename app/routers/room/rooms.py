@@ -1,20 +1,21 @@
 from typing import List
-from fastapi import File, Form, UploadFile, status, HTTPException, Depends, APIRouter, Response
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from fastapi import File, Form, Request, UploadFile, status, HTTPException, Depends, APIRouter, Response
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth import oauth2
-from app.database.database import get_db
 from app.database.async_db import get_async_session
+from app.database.replica import get_read_session
 
 import random
 
-from app.models import room_model, room_model, messages_model, user_model
+from app.models import room_model, user_model
 from app.schemas import room as room_schema
 from app.config.config import settings
 from app.config import utils
+from app.services import room_cards
+from app.services.room_directory import room_directory
+from app.services.room_meta import room_meta
 
 
 
@@ -26,64 +27,37 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[room_schema.RoomBase])
-async def get_rooms_info(db: Session = Depends(get_db)):
+async def get_rooms_info(request: Request, db: AsyncSession = Depends(get_read_session)):
     
     """
     Retrieves information about chat rooms, excluding a specific room ('Hell'), along with associated message and user counts.
 
+    The list is identical for every caller, so it is served from a pre-serialized snapshot
+    (see `app.services.room_directory`) and only rebuilt after a room write or once it expires.
+
     Args:
-        db (Session, optional): Database session dependency. Defaults to Depends(get_db).
+        request (Request): The incoming request, used for `If-None-Match`.
+        db (AsyncSession, optional): Read-only database session, possibly on the replica. Defaults to Depends(get_read_session).
 
     Returns:
         List[schemas.RoomBase]: A list containing information about each room, such as room name, image, count of users, count of messages, and creation date.
     """
     
-    # get info rooms and not room "Hell"
-    # rooms = db.query(room_model.Rooms).filter(room_model.Rooms.name_room != 'Hell', room_model.Rooms.secret_room != True).order_by(asc(room_model.Rooms.id)).all()
-    rooms = db.query(
-        room_model.Rooms.id,
-        room_model.Rooms.owner,
-        room_model.Rooms.name_room,
-        room_model.Rooms.image_room,
-        room_model.Rooms.created_at,
-        room_model.Rooms.secret_room,
-        room_model.Rooms.block,
-        room_model.Rooms.delete_at,
-        func.count(messages_model.Socket.id).label('count_messages')
-    ).outerjoin(messages_model.Socket, room_model.Rooms.name_room == messages_model.Socket.rooms) \
-    .filter(room_model.Rooms.name_room != 'Hell', room_model.Rooms.secret_room != True) \
-    .group_by(room_model.Rooms.id) \
-    .order_by(desc('count_messages')) \
-    .all()
-    # Count messages for room
-    messages_count = db.query(
-        messages_model.Socket.rooms, 
-        func.count(messages_model.Socket.id).label('count')
-    ).group_by(messages_model.Socket.rooms).filter(messages_model.Socket.rooms != 'Hell').all()
-
-    # Count users for room
-    users_count = db.query(
-        user_model.User_Status.name_room, 
-        func.count(user_model.User_Status.id).label('count')
-    ).group_by(user_model.User_Status.name_room).filter(user_model.User_Status.name_room != 'Hell').all()
-
-    # merge result
-    rooms_info = []
-    for room in rooms:
-        room_info = {
-            "id": room.id,
-            "owner": room.owner,
-            "name_room": room.name_room,
-            "image_room": room.image_room,
-            "count_users": next((uc.count for uc in users_count if uc.name_room == room.name_room), 0),
-            "count_messages": next((mc.count for mc in messages_count if mc.rooms == room.name_room), 0),
-            "created_at": room.created_at,
-            "secret_room": room.secret_room,
-            "block": room.block
-        }
-        rooms_info.append(room_schema.RoomBase(**room_info))
-
-    return rooms_info
+    async def build():
+        # get info rooms and not room "Hell"
+        result = await db.execute(select(room_model.Rooms)
+                                  .where(room_model.Rooms.name_room != 'Hell', room_model.Rooms.secret_room != True))
+        rooms = result.scalars().all()
+
+        rooms_info = await room_cards.build_room_cards(db, rooms)
+        rooms_info.sort(key=lambda card: card.count_messages, reverse=True)
+        return rooms_info
+
+    body, etag = await room_directory.get(build)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
  
 
@@ -141,6 +115,7 @@ async def create_room(room: room_schema.RoomCreate,
         await db.commit()
         await db.refresh(manager_room)
     
+    room_directory.invalidate()
     return new_room
 
 
@@ -210,22 +185,24 @@ async def create_room_v2(name_room: str =Form(...),
         await db.commit()
         await db.refresh(manager_room)
     
+    room_directory.invalidate()
     return new_room
 
 
 @router.get("/{name_room}", response_model=room_schema.RoomUpdate)
-async def get_room(name_room: str, db: Session = Depends(get_db)):
+async def get_room(name_room: str, db: AsyncSession = Depends(get_async_session)):
     """
     Get a specific room by name.
 
     Parameters:
     name_room (str): The name of the room to retrieve.
-    db (Session): The database session.
+    db (AsyncSession): The database session.
 
     Returns:
     schemas.RoomPost: The room with the specified name, or a 404 Not Found error if no room with that name exists.
     """
-    post = db.query(room_model.Rooms).filter(room_model.Rooms.name_room == name_room).first()
+    result = await db.execute(select(room_model.Rooms).where(room_model.Rooms.name_room == name_room))
+    post = result.scalars().first()
     
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
@@ -234,13 +211,13 @@ async def get_room(name_room: str, db: Session = Depends(get_db)):
 
 
 @router.delete("/{room_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_room(room_id: int, db: Session = Depends(get_db), 
+async def delete_room(room_id: int, db: AsyncSession = Depends(get_async_session), 
                 current_user: user_model.User = Depends(oauth2.get_current_user)):
     """Deletes a room.
 
     Args:
         room_id (int): The name of the room to delete.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         current_user (str): The currently authenticated user.
 
     Raises:
@@ -253,7 +230,7 @@ def delete_room(room_id: int, db: Session = Depends(get_db),
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail=f"User with ID {current_user.id} is blocked or not verified")
     
-    room = db.query(room_model.Rooms).filter(room_model.Rooms.id == room_id).first()
+    room = await db.get(room_model.Rooms, room_id)
     
     if room is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
@@ -263,15 +240,18 @@ def delete_room(room_id: int, db: Session = Depends(get_db),
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
     
     # Updating user statuses
-    users_in_room = db.query(user_model.User_Status).filter(user_model.User_Status.room_id == room_id).all()
+    result = await db.execute(select(user_model.User_Status).where(user_model.User_Status.room_id == room_id))
+    users_in_room = result.scalars().all()
     for user_status in users_in_room:
         user_status.name_room = 'Hell'
         user_status.room_id = 1  # Assuming 'Hell' room ID is 1
         db.add(user_status)
     
     # Deleting the room
-    db.delete(room)
-    db.commit()
+    await db.delete(room)
+    await db.commit()
+    room_directory.invalidate()
+    room_meta.invalidate(room_id)
     
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -308,6 +288,8 @@ async def update_room(room_id: int,
 
     await db.commit()  # Commit changes
     await db.refresh(room)  # Refresh the instance to get updated values
+    room_directory.invalidate()
+    room_meta.invalidate(room_id)
 
     # Handle room secrecy logic if applicable
     manager_query = await db.execute(select(room_model.RoomsManager).where(room_model.RoomsManager.room_id == room_id))
@@ -330,14 +312,14 @@ async def update_room(room_id: int,
 
 @router.put('/block/{room_id}', status_code=status.HTTP_200_OK)
 async def block_room(room_id: int, 
-                     db: Session = Depends(get_db), 
+                     db: AsyncSession = Depends(get_async_session), 
                      current_user: user_model.User = Depends(oauth2.get_current_user)):
     """
     Blocks or unblocks a room.
 
     Args:
         room_id (int): The ID of the room to block or unblock.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         current_user (User): The currently authenticated user.
 
     Raises:
@@ -350,7 +332,7 @@ async def block_room(room_id: int,
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail=f"User with ID {current_user.id} is blocked or not verified")
 
-    room = db.query(room_model.Rooms).filter(room_model.Rooms.id == room_id).first()
+    room = await db.get(room_model.Rooms, room_id)
     
     if room is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
@@ -360,7 +342,9 @@ async def block_room(room_id: int,
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
         
     room.block = not room.block
-    db.commit()
+    await db.commit()
+    room_directory.invalidate()
+    room_meta.invalidate(room_id)
     
     status_text = "unblocked" if not room.block else "blocked"
     return {"message": f"Room with ID: {room_id} has been {status_text}"}
@@ -370,14 +354,14 @@ async def block_room(room_id: int,
 
 @router.get("/company/v2/", response_model=List[room_schema.RoomBase])
 async def get_rooms_info_company(current_user: user_model.User = Depends(oauth2.get_current_user),
-                                 db: Session = Depends(get_db)):
+                                 db: AsyncSession = Depends(get_read_session)):
     """
     Retrieves a list of rooms for a specific company, excluding the 'Hell' room and rooms marked as secret.
     The function counts the number of messages and users in each room and returns a list of room information.
 
     Parameters:
     current_user (room_model.User): The currently authenticated user.
-    db (Session): The database session.
+    db (AsyncSession): The database session.
 
     Returns:
     List[room_schema.RoomBase]: A list of room information, including room ID, owner, name, image, creation date,
@@ -385,48 +369,11 @@ async def get_rooms_info_company(current_user: user_model.User = Depends(oauth2.
     """
     company_id = current_user.company_id 
     # get info rooms and not room "Hell"
-    # rooms = db.query(room_model.Rooms).filter(room_model.Rooms.name_room != 'Hell', room_model.Rooms.secret_room != True).order_by(asc(room_model.Rooms.id)).all()
-    rooms = db.query(
-        room_model.Rooms.id,
-        room_model.Rooms.owner,
-        room_model.Rooms.name_room,
-        room_model.Rooms.image_room,
-        room_model.Rooms.created_at,
-        room_model.Rooms.secret_room,
-        room_model.Rooms.block,
-        room_model.Rooms.delete_at,
-        func.count(messages_model.Socket.id).label('count_messages')
-    ).outerjoin(messages_model.Socket, room_model.Rooms.name_room == messages_model.Socket.rooms) \
-    .filter(room_model.Rooms.name_room != 'Hell', room_model.Rooms.secret_room != True, room_model.Rooms.company_id == company_id) \
-    .group_by(room_model.Rooms.id) \
-    .order_by(desc('count_messages')) \
-    .all()
-    # Count messages for room
-    messages_count = db.query(
-        messages_model.Socket.rooms, 
-        func.count(messages_model.Socket.id).label('count')
-    ).group_by(messages_model.Socket.rooms).filter(messages_model.Socket.rooms != 'Hell').all()
-
-    # Count users for room
-    users_count = db.query(
-        user_model.User_Status.name_room, 
-        func.count(user_model.User_Status.id).label('count')
-    ).group_by(user_model.User_Status.name_room).filter(user_model.User_Status.name_room != 'Hell').all()
-
-    # merge result
-    rooms_info = []
-    for room in rooms:
-        room_info = {
-            "id": room.id,
-            "owner": room.owner,
-            "name_room": room.name_room,
-            "image_room": room.image_room,
-            "count_users": next((uc.count for uc in users_count if uc.name_room == room.name_room), 0),
-            "count_messages": next((mc.count for mc in messages_count if mc.rooms == room.name_room), 0),
-            "created_at": room.created_at,
-            "secret_room": room.secret_room,
-            "block": room.block
-        }
-        rooms_info.append(room_schema.RoomBase(**room_info))
+    result = await db.execute(select(room_model.Rooms)
+                              .where(room_model.Rooms.name_room != 'Hell', room_model.Rooms.secret_room != True, room_model.Rooms.company_id == company_id))
+    rooms = result.scalars().all()
+
+    rooms_info = await room_cards.build_room_cards(db, rooms)
+    rooms_info.sort(key=lambda card: card.count_messages, reverse=True)
 
     return rooms_info
\ No newline at end of file
@@ -1,15 +1,15 @@
 from typing import List
 from fastapi import status, HTTPException, Depends, APIRouter, Response
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import delete, func
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.auth import oauth2
-from app.database.database import get_db
 from app.database.async_db import get_async_session
+from app.database.replica import get_read_session
 
-from app.models import messages_model, user_model, room_model
+from app.models import user_model, room_model
 from app.schemas import room as room_schema
+from app.services import room_cards
 
 router = APIRouter(
     prefix='/tabs',
@@ -65,57 +65,37 @@ async def create_user_tab(tab: room_schema.RoomTabsCreate,
 
 
 @router.get("/")
-async def get_user_all_rooms_in_all_tabs(db: Session = Depends(get_db), 
-                                         current_user: user_model.User = Depends(oauth2.get_current_user)) -> list:
+async def get_user_all_rooms_in_all_tabs(db: AsyncSession = Depends(get_read_session), 
+                                         current_user: user_model.User = Depends(oauth2.get_current_user_claims)) -> list:
     """
     Get all tabs for the current user.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         current_user (user_model.User): The currently authenticated user.
 
     Returns:
         List[room_schema.RoomTabs]: A list of tabs for the current user.
     """
     # Fetch all tabs for the current user
-    user_tabs = db.query(room_model.RoomTabsInfo).filter(room_model.RoomTabsInfo.owner_id == current_user.id).all()
+    result = await db.execute(select(room_model.RoomTabsInfo).where(room_model.RoomTabsInfo.owner_id == current_user.id))
+    user_tabs = result.scalars().all()
 
     # Initialize a list to store tabs along with their rooms
     tabs_with_rooms = []
 
     # Fetch rooms and tabs details for the current user
-    rooms_and_tabs = db.query(room_model.Rooms, room_model.RoomsTabs
+    result = await db.execute(select(room_model.Rooms, room_model.RoomsTabs
         ).join(room_model.RoomsTabs, room_model.Rooms.id == room_model.RoomsTabs.room_id
-        ).filter(room_model.RoomsTabs.user_id == current_user.id).all()
-
-    # Fetch message count for each user-associated room
-    messages_count = db.query(
-        messages_model.Socket.rooms, 
-        func.count(messages_model.Socket.id).label('count')
-    ).group_by(messages_model.Socket.rooms).filter(messages_model.Socket.rooms != 'Hell').all()
-
-    # Count users for each room
-    users_count = db.query(
-        user_model.User_Status.name_room, 
-        func.count(user_model.User_Status.id).label('count')
-    ).group_by(user_model.User_Status.name_room).filter(user_model.User_Status.name_room != 'Hell').all()
+        ).where(room_model.RoomsTabs.user_id == current_user.id))
+    rooms_and_tabs = result.all()
 
     # Organize rooms into the appropriate tabs
+    favorites = {room.id: tab.favorite for room, tab in rooms_and_tabs}
+    cards = await room_cards.build_room_cards(db, (room for room, _ in rooms_and_tabs), favorites)
     room_dict = {tab_id: [] for tab_id in [tab.id for tab in user_tabs]}
-    for room, tab in rooms_and_tabs:
-        room_info = {
-            "id": room.id,
-            "owner": room.owner,
-            "name_room": room.name_room,
-            "image_room": room.image_room,
-            "count_users": next((uc.count for uc in users_count if uc.name_room == room.name_room), 0),
-            "count_messages": next((mc.count for mc in messages_count if mc.rooms == room.name_room), 0),
-            "created_at": room.created_at,
-            "secret_room": room.secret_room,
-            "favorite": tab.favorite,
-            "block": room.block
-        }
-        room_dict[tab.tab_id].append(room_info)
+    for card, (_, tab) in zip(cards, rooms_and_tabs):
+        room_dict[tab.tab_id].append(card)
 
     # Create the final list of tabs with sorted rooms
     for tab in user_tabs:
@@ -123,7 +103,7 @@ async def get_user_all_rooms_in_all_tabs(db: Session = Depends(get_db),
             "name_tab": tab.name_tab,
             "image_tab": tab.image_tab,
             "id": tab.id,
-            "rooms": sorted(room_dict[tab.id], key=lambda x: x['favorite'], reverse=True)
+            "rooms": sorted(room_dict[tab.id], key=lambda x: x.favorite, reverse=True)
         }
         tabs_with_rooms.append(tab_info)
 
@@ -134,14 +114,14 @@ async def get_user_all_rooms_in_all_tabs(db: Session = Depends(get_db),
 
 
 @router.get('/{tab_id}')
-async def get_rooms_in_one_tab(db: Session = Depends(get_db), 
-                              current_user: user_model.User = Depends(oauth2.get_current_user),
+async def get_rooms_in_one_tab(db: AsyncSession = Depends(get_read_session), 
+                              current_user: user_model.User = Depends(oauth2.get_current_user_claims),
                               tab_id: int = None):
     """
     Get all rooms in a specific tab.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         current_user (user_model.User): The currently authenticated user.
         tab (str): The name of the tab.
 
@@ -152,8 +132,9 @@ async def get_rooms_in_one_tab(db: Session = Depends(get_db),
         HTTPException: If the tab does not exist.
     """
 
-    tab_exists = db.query(room_model.RoomTabsInfo).filter(room_model.RoomTabsInfo.owner_id == current_user.id, 
-                                                      room_model.RoomTabsInfo.id == tab_id).first()
+    result = await db.execute(select(room_model.RoomTabsInfo).where(room_model.RoomTabsInfo.owner_id == current_user.id, 
+                                                                    room_model.RoomTabsInfo.id == tab_id))
+    tab_exists = result.scalars().first()
     if not tab_exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -161,46 +142,17 @@ async def get_rooms_in_one_tab(db: Session = Depends(get_db),
         )
 
     # Fetch rooms and tabs details for the current user in the specified tab
-    rooms_and_tabs = db.query(room_model.Rooms, room_model.RoomsTabs
+    result = await db.execute(select(room_model.Rooms, room_model.RoomsTabs
         ).join(room_model.RoomsTabs, room_model.Rooms.id == room_model.RoomsTabs.room_id
-        ).filter(room_model.RoomsTabs.user_id == current_user.id,
-                 room_model.RoomsTabs.tab_id == tab_id).all()
+        ).where(room_model.RoomsTabs.user_id == current_user.id,
+                room_model.RoomsTabs.tab_id == tab_id))
+    rooms_and_tabs = result.all()
          
-    # Fetch message count for each user-associated room
-    messages_count = db.query(
-        messages_model.Socket.rooms, 
-        func.count(messages_model.Socket.id).label('count')
-    ).group_by(messages_model.Socket.rooms).filter(messages_model.Socket.rooms != 'Hell').all()
-
-    # Count users for room
-    users_count = db.query(
-        user_model.User_Status.name_room, 
-        func.count(user_model.User_Status.id).label('count')
-    ).group_by(user_model.User_Status.name_room).filter(user_model.User_Status.name_room != 'Hell').all()
-
-
-    # Initialize an empty dictionary to store tabs with their associated rooms
-     # Prepare room details
-    room_details = []
-    for room, tab_info in rooms_and_tabs:
-        room_info = {
-            "id": room.id,
-            "owner": room.owner,
-            "name_room": room.name_room,
-            "image_room": room.image_room,
-            "count_users": next((uc.count for uc in users_count if uc.name_room == room.name_room), 0),
-            "count_messages": next((mc.count for mc in messages_count if mc.rooms == room.name_room), 0),
-            "created_at": room.created_at,
-            "secret_room": room.secret_room,
-            "favorite": tab_info.favorite,
-            "block": room.block
-        }
-
-        # Append room info to the list
-        room_details.append(room_info)
+    favorites = {room.id: tab_info.favorite for room, tab_info in rooms_and_tabs}
+    room_details = await room_cards.build_room_cards(db, (room for room, _ in rooms_and_tabs), favorites)
 
     # Optionally, sort rooms by a specific criterion
-    room_details.sort(key=lambda x: x['favorite'], reverse=True)
+    room_details.sort(key=lambda x: x.favorite, reverse=True)
 
     return room_details
 
@@ -208,7 +160,7 @@ async def get_rooms_in_one_tab(db: Session = Depends(get_db),
 
 @router.post('/add-room-to-tab/{tab_id}')
 async def add_rooms_to_tab(tab_id: int, room_ids: List[int], 
-                           db: Session = Depends(get_db), 
+                           db: AsyncSession = Depends(get_async_session), 
                            current_user: user_model.User = Depends(oauth2.get_current_user)):
     """
     Add multiple rooms to a tab, remove them from other tabs if they exist.
@@ -216,7 +168,7 @@ async def add_rooms_to_tab(tab_id: int, room_ids: List[int],
     Args:
         tab_id (int): The ID of the tab to add the rooms to.
         room_ids (List[int]): A list of room IDs to add.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         current_user (user_model.User): The currently authenticated user.
 
     Returns:
@@ -230,30 +182,35 @@ async def add_rooms_to_tab(tab_id: int, room_ids: List[int],
                             detail=f"User with ID {current_user.id} is blocked")
 
     # Check if the tab exists and belongs to the current user
-    tab = db.query(room_model.RoomTabsInfo).filter(room_model.RoomTabsInfo.id == tab_id, 
-                                               room_model.RoomTabsInfo.owner_id == current_user.id).first()
+    result = await db.execute(select(room_model.RoomTabsInfo).where(room_model.RoomTabsInfo.id == tab_id, 
+                                                                    room_model.RoomTabsInfo.owner_id == current_user.id))
+    tab = result.scalars().first()
     if not tab:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tab not found")
 
-    # Process each room
-    for room_id in room_ids:
-        room = db.query(room_model.Rooms).filter(room_model.Rooms.id == room_id).first()
-        if not room:
+    # The whole list is handled in a fixed number of queries, not three per room
+    room_ids_to_add = list(dict.fromkeys(room_ids))
+    found = set(await db.scalars(select(room_model.Rooms.id).where(room_model.Rooms.id.in_(room_ids_to_add))))
+    for room_id in room_ids_to_add:
+        if room_id not in found:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Room {room_id} not found")
 
-        existing_link = db.query(room_model.RoomsTabs).filter(room_model.RoomsTabs.room_id == room_id,
-                                                          room_model.RoomsTabs.tab_id == tab_id).first()
-        if existing_link:
-            continue  # Skip if room is already in the tab
+    # Skip rooms already in the tab
+    linked = set(await db.scalars(select(room_model.RoomsTabs.room_id).where(
+        room_model.RoomsTabs.tab_id == tab_id, room_model.RoomsTabs.room_id.in_(room_ids_to_add))))
+    new_room_ids = [room_id for room_id in room_ids_to_add if room_id not in linked]
 
-        # Remove the room from any other tab
-        db.query(room_model.RoomsTabs).filter(room_model.RoomsTabs.room_id == room_id).delete()
+    if new_room_ids:
+        # Remove the rooms from any other tab
+        await db.execute(delete(room_model.RoomsTabs).where(room_model.RoomsTabs.room_id.in_(new_room_ids)))
 
-        # Add the room to the tab
-        new_room_tab = room_model.RoomsTabs(room_id=room_id, tab_id=tab_id, user_id=current_user.id, tab_name=tab.name_tab)
-        db.add(new_room_tab)
+        # Add the rooms to the tab
+        db.add_all([
+            room_model.RoomsTabs(room_id=room_id, tab_id=tab_id, user_id=current_user.id, tab_name=tab.name_tab)
+            for room_id in new_room_ids
+        ])
 
-    db.commit()
+    await db.commit()
 
     return {"message": f"Rooms {room_ids} added to tab {tab_id}"}
 
@@ -261,15 +218,16 @@ async def add_rooms_to_tab(tab_id: int, room_ids: List[int],
 
 @router.put('/', status_code=status.HTTP_200_OK)
 async def update_tab(id: int, update: room_schema.TabUpdate,
-                     db: Session = Depends(get_db), 
+                     db: AsyncSession = Depends(get_async_session), 
                      current_user: user_model.User = Depends(oauth2.get_current_user)):
     
     if current_user.blocked == True:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail=f"User with ID {current_user.id} is blocked")
         
-    tab = db.query(room_model.RoomTabsInfo).filter(room_model.RoomTabsInfo.id == id,
-                                               room_model.RoomTabsInfo.owner_id == current_user.id).first()
+    result = await db.execute(select(room_model.RoomTabsInfo).where(room_model.RoomTabsInfo.id == id,
+                                                                    room_model.RoomTabsInfo.owner_id == current_user.id))
+    tab = result.scalars().first()
     if not tab:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tab not found")
     
@@ -278,14 +236,14 @@ async def update_tab(id: int, update: room_schema.TabUpdate,
         tab.name_tab = update.name_tab
     if update.image_tab is not None:
         tab.image_tab = update.image_tab
-    db.commit()
+    await db.commit()
     return {"message": "Tab updated successfully"}
 
 
 @router.put('/{room_id}')
 async def room_update_to_favorites(room_id: int,
                                 favorite: bool,
-                                db: Session = Depends(get_db), 
+                                db: AsyncSession = Depends(get_async_session), 
                                 current_user: user_model.User = Depends(oauth2.get_current_user)):
     """
     Updates the favorite status of a room in tab for a specific user.
@@ -293,7 +251,7 @@ async def room_update_to_favorites(room_id: int,
     Args:
         room_id (int): The ID of the room to update.
         favorite (bool): The new favorite status for the room.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         current_user (user_model.User): The currently authenticated user.
 
     Returns:
@@ -308,15 +266,16 @@ async def room_update_to_favorites(room_id: int,
                             detail=f"User with ID {current_user.id} is blocked")
 
     # Fetch room
-    room = db.query(room_model.Rooms).filter(room_model.Rooms.id == room_id).first()
+    room = await db.get(room_model.Rooms, room_id)
     if room is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Room not found")
     
     # Check if there is already a favorite record
-    favorite_record = db.query(room_model.RoomsTabs).filter(
+    result = await db.execute(select(room_model.RoomsTabs).where(
         room_model.RoomsTabs.room_id == room_id,
         room_model.RoomsTabs.user_id == current_user.id
-    ).first()
+    ))
+    favorite_record = result.scalars().first()
 
     # Update if exists, else create a new record
     if favorite_record:
@@ -327,7 +286,7 @@ async def room_update_to_favorites(room_id: int,
         )
         db.add(new_favorite)
 
-    db.commit()
+    await db.commit()
     return {"room_id": room_id, "favorite": favorite}
     
 
@@ -335,14 +294,14 @@ async def room_update_to_favorites(room_id: int,
 
 @router.delete('/')
 async def deleted_tab(id: int,
-                      db: Session = Depends(get_db), 
+                      db: AsyncSession = Depends(get_async_session), 
                       current_user: user_model.User = Depends(oauth2.get_current_user)):
     """
     Delete a tab.
 
     Args:
         id (int): The ID of the tab to delete.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         current_user (user_model.User): The currently authenticated user.
 
     Raises:
@@ -354,20 +313,21 @@ async def deleted_tab(id: int,
     if current_user.blocked == True:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail=f"User with ID {current_user.id} is blocked")
-    tab = db.query(room_model.RoomTabsInfo).filter(room_model.RoomTabsInfo.id == id,
-                                               room_model.RoomTabsInfo.owner_id == current_user.id).first()
+    result = await db.execute(select(room_model.RoomTabsInfo).where(room_model.RoomTabsInfo.id == id,
+                                                                    room_model.RoomTabsInfo.owner_id == current_user.id))
+    tab = result.scalars().first()
     if not tab:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tab not found")
     
-    db.delete(tab)
-    db.commit()
+    await db.delete(tab)
+    await db.commit()
     
     return Response(status_code=status.HTTP_204_NO_CONTENT)
     
     
 @router.delete('/delete-room-in-tab/{tab_id}')
 async def delete_room_from_tab(tab_id: int, room_ids: List[int],
-                               db: Session = Depends(get_db), 
+                               db: AsyncSession = Depends(get_async_session), 
                                current_user: user_model.User = Depends(oauth2.get_current_user)):
     """
     Remove rooms from a tab.
@@ -375,7 +335,7 @@ async def delete_room_from_tab(tab_id: int, room_ids: List[int],
     Args:
         tab_id (int): The ID of the tab to remove rooms from.
         room_ids (List[int]): List of room IDs to remove.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         current_user (user_model.User): The currently authenticated user.
 
     Returns:
@@ -383,19 +343,21 @@ async def delete_room_from_tab(tab_id: int, room_ids: List[int],
     """
 
     # Check if the tab exists and belongs to the current user
-    if not db.query(room_model.RoomTabsInfo).filter(room_model.RoomTabsInfo.id == tab_id, 
-                                                room_model.RoomTabsInfo.owner_id == current_user.id).first():
+    result = await db.execute(select(room_model.RoomTabsInfo).where(room_model.RoomTabsInfo.id == tab_id, 
+                                                                    room_model.RoomTabsInfo.owner_id == current_user.id))
+    if not result.scalars().first():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tab not found")
 
     # Remove specified rooms from the tab
     for room_id in room_ids:
-        room_link = db.query(room_model.RoomsTabs).filter(room_model.RoomsTabs.room_id == room_id,
-                                                      room_model.RoomsTabs.tab_id == tab_id).first()
+        result = await db.execute(select(room_model.RoomsTabs).where(room_model.RoomsTabs.room_id == room_id,
+                                                                     room_model.RoomsTabs.tab_id == tab_id))
+        room_link = result.scalars().first()
         if not room_link:
             continue  # If room not found in the tab, skip it
         
-        db.delete(room_link)
+        await db.delete(room_link)
 
-    db.commit()  # Commit all changes at once
+    await db.commit()  # Commit all changes at once
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
@@ -1,10 +1,9 @@
 
 from fastapi import APIRouter, Response, status, HTTPException, Depends
-from sqlalchemy.orm import Session
-from app.database.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.async_db import get_async_session
 
 from app.auth import oauth2
-from app.models.user_model import User
 
 
 router = APIRouter(tags=['ASS'])
@@ -16,29 +15,32 @@ credentials_exception = HTTPException(
 )
 
 @router.get('/ass')
-def ass_endpoint(token: str, session: Session = Depends(get_db)):
-    """_summary_
+async def ass_endpoint(token: str, session: AsyncSession = Depends(get_async_session)):
+    """Introspect a token for the gateway's auth_request.
+
+    The signature is checked locally and the user's status comes from the token claims
+    or the principal cache, so a warm worker answers without any database I/O.
 
     Args:
         token (str): token verification
-        session (Session, optional): session database. Defaults to Depends(get_db).
+        session (AsyncSession, optional): session database, used only on a cache miss. Defaults to Depends(get_async_session).
 
     Raises:
-        HTTPException:: Token not validation
+        HTTPException: 401 if the token is invalid or its user no longer exists.
+        HTTPException: 403 if the user is blocked or deactivated.
 
     Returns:
         Response: return server
     """
-    
-    try:
-        user_data = oauth2.verify_access_token(token, credentials_exception)
-        user = session.query(User).filter(User.id == user_data.id).first()
-        
-        if user.blocked == True:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                                detail=f"User with ID {user.id} is blocked")
-
-            
-        return Response(status_code=status.HTTP_200_OK)
-    except HTTPException as ex_error:
-        raise ex_error
\ No newline at end of file
+    user = await oauth2.get_current_user_claims(token, session)
+    if user is None:
+        raise credentials_exception
+
+    if user.blocked:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail=f"User with ID {user.id} is blocked")
+    if not user.active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail=f"User with ID {user.id} is not active")
+
+    return Response(status_code=status.HTTP_200_OK)
@@ -1,7 +1,7 @@
 
 import logging
 from typing import Annotated
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, Request, status, HTTPException
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -9,8 +9,7 @@ from sqlalchemy.future import select
 
 from app.database import async_db
 
-from ...config import utils
-from ...auth import oauth2
+from ...auth import oauth2, passwords, rate_limit
 from app.config.config import settings
 from app.models import user_model
 from app.schemas.token import Token
@@ -25,7 +24,8 @@ logger = logging.getLogger(__name__)
 router = APIRouter(tags=['Authentication'])
 
 @router.post('/login', response_model=Token)
-async def login(user_credentials: Annotated[OAuth2PasswordRequestForm, Depends()],
+async def login(request: Request,
+                user_credentials: Annotated[OAuth2PasswordRequestForm, Depends()],
                 db: AsyncSession = Depends(async_db.get_async_session)):
         
     """
@@ -48,6 +48,8 @@ async def login(user_credentials: Annotated[OAuth2PasswordRequestForm, Depends()
     - Generates an access token using the user's ID.
     - Returns the access token and the token type as a JSON object.
     """
+    await rate_limit.enforce(request, "login", user_credentials.username)
+
     try:
         query = select(user_model.User).where(user_model.User.email == user_credentials.username)
         result = await db.execute(query)
@@ -63,10 +65,10 @@ async def login(user_credentials: Annotated[OAuth2PasswordRequestForm, Depends()
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                                 detail=f"User with ID {user.id} is not active")
         
-        if not utils.verify(user_credentials.password, user.password):
+        if not await passwords.verify_password(user_credentials.password, user.password):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Credentials")
 
-        access_token = await oauth2.create_access_token(data={"user_id": user.id})
+        access_token = await oauth2.create_access_token(data={"user_id": user.id}, user=user)
         
         refresh_token = await oauth2.create_refresh_token(user.id)
         user.refresh_token = refresh_token
@@ -89,7 +91,7 @@ async def login(user_credentials: Annotated[OAuth2PasswordRequestForm, Depends()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while processing the request.")
 
 @router.post("/refresh")
-async def refresh_access_token(refresh_token: str, db: AsyncSession = Depends(async_db.get_async_session)):
+async def refresh_access_token(request: Request, refresh_token: str, db: AsyncSession = Depends(async_db.get_async_session)):
     """
     Endpoint to refresh an access token using a refresh token.
 
@@ -103,6 +105,8 @@ async def refresh_access_token(refresh_token: str, db: AsyncSession = Depends(as
     Raises:
         HTTPException: If the refresh token is invalid or expired.
     """
+    await rate_limit.enforce(request, "refresh", by_ip=rate_limit.refresh_ip_limiter)
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid refresh token",
@@ -125,7 +129,7 @@ async def refresh_access_token(refresh_token: str, db: AsyncSession = Depends(as
         if user_id is None:
             raise credentials_exception
         
-        new_access_token = await oauth2.create_access_token({"user_id": user_id})
+        new_access_token = await oauth2.create_access_token({"user_id": user_id}, user=user)
         return {"access_token": new_access_token, "token_type": "bearer"}
     except JWTError:
         raise credentials_exception
\ No newline at end of file
@@ -1,12 +1,13 @@
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
 from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 
-from ...database.database import get_db
-from app.models import user_model, room_model, messages_model
+from ...database.replica import get_read_session
+from app.models import user_model, room_model
 from app.schemas import user as user_schema
-from app.schemas import room as schema_room
+from app.services import room_cards
 
 
 router = APIRouter(
@@ -15,13 +16,13 @@ router = APIRouter(
 )
 
 @router.get('/{substring}')
-def search_users_and_rooms(substring: str, db: Session = Depends(get_db)):
+async def search_users_and_rooms(substring: str, db: AsyncSession = Depends(get_read_session)):
     """
     Search for users and rooms based on a substring.
 
     Parameters:
     - `substring`: The substring to filter by. This parameter is case-insensitive.
-    - `db`: The database session. It is injected by the `get_db` function.
+    - `db`: The database session. It is injected by `get_read_session` and may read from the replica.
 
     Returns:
     - A dictionary containing a list of users and rooms that match the search criteria.
@@ -46,28 +47,17 @@ def search_users_and_rooms(substring: str, db: Session = Depends(get_db)):
     pattern = f"%{substring.lower()}%"
     
     # Search for users
-    users = db.query(user_model.User).filter(func.lower(user_model.User.user_name).like(pattern)).all()
+    result = await db.execute(select(user_model.User).where(func.lower(user_model.User.user_name).like(pattern)))
+    users = result.scalars().all()
     
     # Search for rooms
-    rooms = db.query(room_model.Rooms).filter(
+    result = await db.execute(select(room_model.Rooms).where(
         room_model.Rooms.name_room != 'Hell', 
         room_model.Rooms.secret_room != True, 
         func.lower(room_model.Rooms.name_room).like(pattern)
-    ).all()
+    ))
+    rooms = result.scalars().all()
 
-    # Count messages for room
-    messages_count = db.query(
-        messages_model.Socket.rooms, 
-        func.count(messages_model.Socket.id).label('count')
-    ).group_by(messages_model.Socket.rooms).filter(messages_model.Socket.rooms != 'Hell').all()
-
-    # Count users for room
-    users_count = db.query(
-        user_model.User_Status.name_room, 
-        func.count(user_model.User_Status.id).label('count')
-    ).group_by(user_model.User_Status.name_room).filter(user_model.User_Status.name_room != 'Hell').all()
-    
-    
     users_info =[]
     for user in users:
         user_info = {
@@ -79,19 +69,7 @@ def search_users_and_rooms(substring: str, db: Session = Depends(get_db)):
         users_info.append(user_schema.UserOut(**user_info))
 
     # Prepare room info
-    rooms_info = []
-    for room in rooms:
-        room_info = {
-            "id": room.id,
-            "owner": room.owner,
-            "name_room": room.name_room,
-            "image_room": room.image_room,
-            "count_users": next((uc.count for uc in users_count if uc.name_room == room.name_room), 0),
-            "count_messages": next((mc.count for mc in messages_count if mc.rooms == room.name_room), 0),
-            "created_at": room.created_at,
-            "secret_room": room.secret_room
-        }
-        rooms_info.append(schema_room.RoomBase(**room_info))
+    rooms_info = await room_cards.build_room_cards(db, rooms)
     
     # Return the results
     return {
@@ -100,13 +78,13 @@ def search_users_and_rooms(substring: str, db: Session = Depends(get_db)):
     }
     
 @router.get("/users/{substring}")
-def search_users(substring: str, db: Session = Depends(get_db)):
+async def search_users(substring: str, db: AsyncSession = Depends(get_read_session)):
     """
     Search for users based on a substring.
 
     Parameters:
     - `substring`: The substring to filter by. This parameter is case-insensitive.
-    - `db`: The database session. It is injected by the `get_db` function.
+    - `db`: The database session. It is injected by `get_read_session` and may read from the replica.
 
     Returns:
     - A dictionary containing a list of users that match the search criteria.
@@ -121,7 +99,8 @@ def search_users(substring: str, db: Session = Depends(get_db)):
     pattern = f"%{substring.lower()}%"
     
     # Search for users
-    users = db.query(user_model.User).filter(func.lower(user_model.User.user_name).like(pattern)).all()
+    result = await db.execute(select(user_model.User).where(func.lower(user_model.User.user_name).like(pattern)))
+    users = result.scalars().all()
     
     users_info =[]
     for user in users:
@@ -1,7 +1,8 @@
+from typing import List, Tuple
 
-from sqlalchemy import insert
+from sqlalchemy import func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import messages_model
-from app.database.async_db import async_session_maker
 
 
 
@@ -23,26 +24,42 @@ messages = ["👋 Вітаю! Я тут, щоб розповісти про мо
     "З любов'ю, команда розробників. 💖"]
 
 
-async def say_hello_system(receiver_id: int):
+async def say_hello_system(receiver_id: int, session: AsyncSession):
     """
     Say hello to a user.
 
+    The messages are added to the caller's session, which commits them; this keeps
+    the request on its one pooled connection.
+
     Args:
-        recipient_id (int): The ID of the recipient."""
+        recipient_id (int): The ID of the recipient.
+        session (AsyncSession): The database session of the request."""
         
-    async with async_session_maker() as session:
-        for message in messages:
-            # await asyncio.sleep(5)
-            stmt = insert(messages_model.PrivateMessage).values(message=message, sender_id=2, receiver_id=receiver_id)
-            await session.execute(stmt)
-            await session.commit()
+    # clock_timestamp() keeps the messages in order; now() is the same for the whole transaction
+    stmt = insert(messages_model.PrivateMessage).values(
+        [{"message": message, "sender_id": 2, "receiver_id": receiver_id, "created_at": func.clock_timestamp()}
+         for message in messages]
+    )
+    await session.execute(stmt)
 
 
-async def system_notification_change_owner(receiver_id: int, message: str):
+async def system_notification_change_owner(receiver_id: int, message: str, session: AsyncSession):
 
-        
-    async with async_session_maker() as session:
- 
-        stmt = insert(messages_model.PrivateMessage).values(message=message, sender_id=2, receiver_id=receiver_id)
-        await session.execute(stmt)
-        await session.commit()
\ No newline at end of file
+    await system_notifications_change_owner([(receiver_id, message)], session)
+
+
+async def system_notifications_change_owner(notifications: List[Tuple[int, str]], session: AsyncSession):
+    """
+    Send system messages to several users in one statement.
+
+    Args:
+        notifications (List[Tuple[int, str]]): (receiver ID, message) pairs.
+        session (AsyncSession): The database session of the request, which commits them.
+    """
+    if not notifications:
+        return
+
+    stmt = insert(messages_model.PrivateMessage).values(
+        [{"message": message, "sender_id": 2, "receiver_id": receiver_id} for receiver_id, message in notifications]
+    )
+    await session.execute(stmt)
\ No newline at end of file
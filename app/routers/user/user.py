@@ -3,7 +3,6 @@ from typing import List
 from fastapi import Form, Response, status, HTTPException, Depends, APIRouter, UploadFile, File
 
 import pytz
-from sqlalchemy.orm import Session
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -12,13 +11,16 @@ from app.mail import send_mail
 from ...config import utils
 from app.config.config import settings
 
-from .hello import say_hello_system, system_notification_change_owner
+from .hello import say_hello_system, system_notifications_change_owner
 from .created_image import generate_image_with_letter
-from ...auth import oauth2
+from ...auth import oauth2, passwords
+from ...auth.principal import principal_cache
+from ...auth.revocation import revoke_user
 from ...database.async_db import get_async_session
-from ...database.database import get_db
 from app.models import user_model, room_model
 from app.schemas import user
+from app.services.room_directory import room_directory
+from app.services.room_meta import room_meta
 
 
 
@@ -57,7 +59,7 @@ async def created_user(user: user.UserCreate, db: AsyncSession = Depends(get_asy
                             detail=f"User {existing_user.email} already exists")
     
     # Hash the user's password
-    hashed_password = utils.hash(user.password)
+    hashed_password = await passwords.hash_password(user.password)
     user.password = hashed_password
     
     verification_token = utils.generate_unique_token(user.email)
@@ -82,7 +84,8 @@ async def created_user(user: user.UserCreate, db: AsyncSession = Depends(get_asy
                                             "name": user.user_name,
                                             "registration_link": registration_link
                                             })
-    await say_hello_system(new_user.id)
+    await say_hello_system(new_user.id, db)
+    await db.commit()
     
     return new_user
 
@@ -145,7 +148,7 @@ async def created_user_v2(email: str = Form(...),
                             detail=f"User with user_name {existing_username_user.user_name} already exists")
     
     # Hash the user's password
-    hashed_password = utils.hash(user_data.password)
+    hashed_password = await passwords.hash_password(user_data.password)
     user_data.password = hashed_password
     
     verification_token = utils.generate_unique_token(user_data.email)
@@ -177,7 +180,8 @@ async def created_user_v2(email: str = Form(...),
                                             "name": user_data.user_name,
                                             "registration_link": registration_link
                                             })
-    await say_hello_system(new_user.id)
+    await say_hello_system(new_user.id, db)
+    await db.commit()
     
     return new_user
 
@@ -227,7 +231,7 @@ async def delete_user(
             detail="Only verified users can delete their profiles or user in blocked."
         )
     
-    if not utils.verify(password.password, existing_user.password):
+    if not await passwords.verify_password(password.password, existing_user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password."
@@ -237,26 +241,40 @@ async def delete_user(
     result_room = await db.execute(query_room)
     rooms_to_update = result_room.scalars().all()
     
+    # The moderators of every owned room in one query; the longest-standing one takes over
+    moderators = {}
+    if rooms_to_update:
+        query_moderators = select(room_model.RoleInRoom).where(
+            room_model.RoleInRoom.room_id.in_([room.id for room in rooms_to_update]),
+            room_model.RoleInRoom.role == 'moderator'
+        ).order_by(room_model.RoleInRoom.id)
+        for moderator in await db.scalars(query_moderators):
+            moderators.setdefault(moderator.room_id, moderator)
+
+    notifications = []
     for room in rooms_to_update:
-        query_moderators = select(room_model.RoleInRoom).where(room_model.RoleInRoom.room_id == room.id, room_model.RoleInRoom.role == 'moderator')
-        result_moderators = await db.execute(query_moderators)
-        moderator = result_moderators.scalars().first()
+        moderator = moderators.get(room.id)
         
         message = f"Room {room.name_room} is now owned by YOU"
         if moderator:
             room.owner = moderator.user_id
             moderator.role = 'owner'
-            await system_notification_change_owner(moderator.user_id, message)
+            notifications.append((moderator.user_id, message))
         else:
             room.owner = 0
         room.delete_at = datetime.now(pytz.utc)
-        
+
+    await system_notifications_change_owner(notifications, db)
     await db.commit()
+    room_directory.invalidate()
+    for room in rooms_to_update:
+        room_meta.invalidate(room.id)
 
     
     # delete user
     await db.delete(existing_user)
     await db.commit()
+    await revoke_user(db, current_user.id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -264,14 +282,14 @@ async def delete_user(
         
 @router.put('/', response_model=user.UserInfo)
 async def update_user(update: user.UserUpdate, 
-                      db: Session = Depends(get_db), 
+                      db: AsyncSession = Depends(get_async_session), 
                       current_user: user_model.User = Depends(oauth2.get_current_user)):
     """
     Update a user's information.
 
     Args:
         update (schemas.UserUpdate): The updated user information.
-        db (Session): The database session to use.
+        db (AsyncSession): The database session to use.
         current_user (user_model.User): The currently authenticated user.
 
     Returns:
@@ -292,8 +310,7 @@ async def update_user(update: user.UserUpdate,
             detail="User not verification or blocked."
         )
         
-    user_query = db.query(user_model.User).filter(user_model.User.id == current_user.id)
-    user = user_query.first()
+    user = await db.get(user_model.User, current_user.id)
     
     if user is None:
         raise HTTPException(
@@ -301,8 +318,8 @@ async def update_user(update: user.UserUpdate,
             detail=f"User with ID: {current_user.id} not found"
         )
     
-    user_status_query = db.query(user_model.User_Status).filter(user_model.User_Status.user_id == current_user.id)
-    user_status = user_status_query.first()
+    result = await db.execute(select(user_model.User_Status).where(user_model.User_Status.user_id == current_user.id))
+    user_status = result.scalars().first()
     
     if user_status is None:
         raise HTTPException(
@@ -313,19 +330,21 @@ async def update_user(update: user.UserUpdate,
     # Assuming model_dump() returns a dictionary of attributes to update
     update_data = update.model_dump()
 
-    user_query.update(update_data, synchronize_session=False)
-    user_status_query.update({"user_name": update.user_name}, synchronize_session="fetch")
+    for key, value in update_data.items():
+        setattr(user, key, value)
+    user_status.user_name = update.user_name
     
-    db.commit()
+    await db.commit()
+    principal_cache.invalidate(current_user.id)
 
     # Re-fetch or update the user object to reflect the changes
-    updated_user = user_query.first()
-    return updated_user
+    await db.refresh(user)
+    return user
     
     
 @router.put('/v2/avatar')
 async def update_user_v2(file: UploadFile = File(...), 
-                        db: Session = Depends(get_db), 
+                        db: AsyncSession = Depends(get_async_session), 
                         current_user: user_model.User = Depends(oauth2.get_current_user)):
 
         
@@ -335,8 +354,7 @@ async def update_user_v2(file: UploadFile = File(...),
             detail="User not verification or blocked."
         )
         
-    user_query = db.query(user_model.User).filter(user_model.User.id == current_user.id)
-    user_data = user_query.first()
+    user_data = await db.get(user_model.User, current_user.id)
     
     if user_data is None:
         raise HTTPException(
@@ -344,8 +362,8 @@ async def update_user_v2(file: UploadFile = File(...),
             detail=f"User with ID: {current_user.id} not found"
         )
     
-    user_status_query = db.query(user_model.User_Status).filter(user_model.User_Status.user_id == current_user.id)
-    user_status = user_status_query.first()
+    result = await db.execute(select(user_model.User_Status).where(user_model.User_Status.user_id == current_user.id))
+    user_status = result.scalars().first()
     
     if user_status is None:
         raise HTTPException(
@@ -357,15 +375,17 @@ async def update_user_v2(file: UploadFile = File(...),
     update = user.UserUpdateAvatar(avatar=avatar)
     update_data = update.model_dump()
 
-    user_query.update(update_data, synchronize_session=False)
-    db.commit()
+    for key, value in update_data.items():
+        setattr(user_data, key, value)
+    await db.commit()
+    principal_cache.invalidate(current_user.id)
 
  
     return "updated avatar"
 
 @router.put('/v2/username')
 async def update_user_v2(user_name: str = Form(...),
-                        db: Session = Depends(get_db), 
+                        db: AsyncSession = Depends(get_async_session), 
                         current_user: user_model.User = Depends(oauth2.get_current_user)):
     """
     Update a user's username.
@@ -377,7 +397,7 @@ async def update_user_v2(user_name: str = Form(...),
 
     Parameters:
     - user_name (str): The new username to be updated. This parameter is obtained from the request form.
-    - db (Session): The database session to use for querying and updating the user's information.
+    - db (AsyncSession): The database session to use for querying and updating the user's information.
     - current_user (user_model.User): The currently authenticated user. This parameter is obtained from the dependency injection.
 
     Returns:
@@ -393,8 +413,7 @@ async def update_user_v2(user_name: str = Form(...),
             detail="User not verification or blocked."
         )
         
-    user_query = db.query(user_model.User).filter(user_model.User.id == current_user.id)
-    user_data = user_query.first()
+    user_data = await db.get(user_model.User, current_user.id)
     
     if user_data is None:
         raise HTTPException(
@@ -402,8 +421,8 @@ async def update_user_v2(user_name: str = Form(...),
             detail=f"User with ID: {current_user.id} not found"
         )
     
-    user_status_query = db.query(user_model.User_Status).filter(user_model.User_Status.user_id == current_user.id)
-    user_status = user_status_query.first()
+    result = await db.execute(select(user_model.User_Status).where(user_model.User_Status.user_id == current_user.id))
+    user_status = result.scalars().first()
     
     if user_status is None:
         raise HTTPException(
@@ -414,23 +433,23 @@ async def update_user_v2(user_name: str = Form(...),
     update = user.UserUpdateUsername(user_name=user_name)
     update_data = update.model_dump()
 
-    user_query.update(update_data, synchronize_session=False)
-    user_status_query.update({"user_name": update.user_name}, synchronize_session="fetch")
-    db.commit()
+    for key, value in update_data.items():
+        setattr(user_data, key, value)
+    user_status.user_name = update.user_name
+    await db.commit()
+    principal_cache.invalidate(current_user.id)
 
-    # Re-fetch or update the user object to reflect the changes
-    updated_user = user_query.first()
     return "updated username"
 
 
 @router.get('/{email}', response_model=user.UserInfo)
-def get_user_mail(email: str, db: Session = Depends(get_db)):
+async def get_user_mail(email: str, db: AsyncSession = Depends(get_async_session)):
     """
     Get a user by their email.
 
     Parameters:
     email (str): The email of the user to retrieve.
-    db (Session): The database session to use.
+    db (AsyncSession): The database session to use.
 
     Returns:
     schemas.UserInfo: The user information, if found.
@@ -440,7 +459,8 @@ def get_user_mail(email: str, db: Session = Depends(get_db)):
     """
     
     # Query the database for a user with the given email
-    user = db.query(user_model.User).filter(user_model.User.email == email).first()
+    result = await db.execute(select(user_model.User).where(user_model.User.email == email))
+    user = result.scalars().first()
     
     # If the user is not found, raise an HTTP 404 error
     if not user:
@@ -450,13 +470,13 @@ def get_user_mail(email: str, db: Session = Depends(get_db)):
     return user
 
 @router.get('/audit/{user_name}', response_model=user.UserInfo)
-def get_user_name(user_name: str, db: Session = Depends(get_db)):
+async def get_user_name(user_name: str, db: AsyncSession = Depends(get_async_session)):
     """
     Get a user by their use_name.
 
     Parameters:
     user_name (str): The user_name of the user to retrieve.
-    db (Session): The database session to use.
+    db (AsyncSession): The database session to use.
 
     Returns:
     schemas.UserInfo: The user information, if found.
@@ -466,7 +486,8 @@ def get_user_name(user_name: str, db: Session = Depends(get_db)):
     """
     
     # Query the database for a user with the given email
-    user = db.query(user_model.User).filter(user_model.User.user_name == user_name).first()
+    result = await db.execute(select(user_model.User).where(user_model.User.user_name == user_name))
+    user = result.scalars().first()
     
     # If the user is not found, raise an HTTP 404 error
     if not user:
@@ -504,7 +525,7 @@ async def read_users(db: AsyncSession = Depends(get_async_session)):
 async def created_user_test(user: user.UserCreateDel, db: AsyncSession = Depends(get_async_session)):
 
     # Hash the user's password
-    hashed_password = utils.hash(user.password)
+    hashed_password = await passwords.hash_password(user.password)
     user.password = hashed_password
 
     # Create a new user and add it to the database
@@ -1,7 +1,8 @@
 from fastapi import status, HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 from ...auth import oauth2
-from app.database.database import get_db
+from app.database.async_db import get_async_session
 from app.models import user_model
 from app.schemas import user
 
@@ -12,28 +13,29 @@ router = APIRouter(
 
 
 @router.get("/")
-async def get_posts(db: Session = Depends(get_db)): # , current_user: int = Depends(oauth2.get_current_user)
+async def get_posts(db: AsyncSession = Depends(get_async_session)): # , current_user: int = Depends(oauth2.get_current_user)
     """
     Get a list of all user status.
 
     Args:
-        db (Session, optional): The database session object.
+        db (AsyncSession, optional): The database session object.
 
     Returns:
         List[schemas.UserStatus]: A list of user status objects.
     """
-    posts = db.query(user_model.User_Status).all()
+    result = await db.execute(select(user_model.User_Status))
+    posts = result.scalars().all()
     return posts
 
 
 @router.get("/{user_name}")
-async def get_post(user_name: str, db: Session = Depends(get_db)):  # , current_user: int = Depends(oauth2.get_current_user)
+async def get_post(user_name: str, db: AsyncSession = Depends(get_async_session)):  # , current_user: int = Depends(oauth2.get_current_user)
     """
     Get a single user status by their username.
 
     Args:
         user_name (str): The username of the user whose status is to be retrieved.
-        db (Session, optional): The database session object.
+        db (AsyncSession, optional): The database session object.
 
     Raises:
         HTTPException: A 404 NOT FOUND error is raised if no user status is found for the given username.
@@ -41,7 +43,8 @@ async def get_post(user_name: str, db: Session = Depends(get_db)):  # , current_
     Returns:
         List[schemas.UserStatus]: A list of user status objects, or an empty list if no user status is found.
     """
-    post = db.query(user_model.User_Status).filter(user_model.User_Status.user_name == user_name).all()
+    result = await db.execute(select(user_model.User_Status).where(user_model.User_Status.user_name == user_name))
+    post = result.scalars().all()
     
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
@@ -62,14 +65,14 @@ async def get_post(user_name: str, db: Session = Depends(get_db)):  # , current_
 
 
 @router.put("/{user_id}", status_code=status.HTTP_200_OK)
-def update_post(user_id: int, update_post: user.UserStatusUpdate, db: Session = Depends(get_db)): # , current_user: int = Depends(oauth2.get_current_user)
+async def update_post(user_id: int, update_post: user.UserStatusUpdate, db: AsyncSession = Depends(get_async_session)): # , current_user: int = Depends(oauth2.get_current_user)
     """
     Updates the status of a user post based on the provided user ID and updated post details.
 
     Args:
         user_id (int): The ID of the user whose post is to be updated.
         update_post (schemas.UserStatusUpdate): The updated post details.
-        db (Session, optional): Database session dependency. Defaults to Depends(get_db).
+        db (AsyncSession, optional): Database session dependency. Defaults to Depends(get_async_session).
 
     Raises:
         HTTPException: Raises a 404 error if no post is found for the given user ID.
@@ -78,14 +81,16 @@ def update_post(user_id: int, update_post: user.UserStatusUpdate, db: Session =
         user_model.User_Status: The updated user post after the changes have been committed to the database.
     """
     
-    post_query = db.query(user_model.User_Status).filter(user_model.User_Status.user_id == user_id)
-    post = post_query.first()
+    result = await db.execute(select(user_model.User_Status).where(user_model.User_Status.user_id == user_id))
+    post = result.scalars().first()
     
     if post == None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"post with user_id: {user_id} not found")
     
-    post_query.update(update_post.model_dump(), synchronize_session=False)
+    for key, value in update_post.model_dump().items():
+        setattr(post, key, value)
     
-    db.commit()
-    return post_query.first()
\ No newline at end of file
+    await db.commit()
+    await db.refresh(post)
+    return post
\ No newline at end of file
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from fastapi.templating import Jinja2Templates
+from app.auth.revocation import revoke_user
 from app.models import user_model
 from app.database.async_db import get_async_session
 
@@ -43,5 +44,6 @@ async def verify_email(token: str, request: Request, db: AsyncSession = Depends(
     user.verified = True
     user.token_verify = None  # Clear the token once verified
     await db.commit()
+    await revoke_user(db, user.id)
 
     return templates.TemplateResponse("success_registration.html", {"request": request})
\ No newline at end of file
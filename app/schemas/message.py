@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
 
@@ -21,6 +21,14 @@ class SocketModel(BaseModel):
     id_return: Optional[int] = None 
     edited: bool
 
+
+class SocketDelta(BaseModel):
+    messages: List[SocketModel]
+    changed: List[SocketModel]
+    last_id: int
+    since: Optional[datetime] = None
+    since_id: int = 0
+
         
 class SocketUpdate(BaseModel):
     message: str
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Optional
+
+from b2sdk.v2 import InMemoryAccountInfo, B2Api
+from fastapi import HTTPException, status
+from supabase import create_client
+
+from app.config.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class LazyClient:
+    """
+    A client of an external service that is created off the event loop, never at import.
+
+    The lifespan hook calls `start()` in the background, with a bounded number of
+    attempts; a worker boots and serves everything else even if the service is slow
+    or down. `get()` returns the client, trying once more if it is not up yet.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], attempts: int, delay: float, timeout: float):
+        self.name = name
+        self.factory = factory
+        self.attempts = attempts
+        self.delay = delay
+        self.timeout = timeout
+        self._client: Optional[Any] = None
+        self._lock = asyncio.Lock()
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+
+    async def _create(self):
+        started = time.perf_counter()
+        try:
+            self._client = await asyncio.wait_for(asyncio.to_thread(self.factory), timeout=self.timeout)
+        except Exception as error:
+            self.error = f"{type(error).__name__}: {error}"
+            raise
+        self.state = "ready"
+        self.error = None
+        self.started_at = time.time()
+        logger.info("%s client ready in %.2f s", self.name, time.perf_counter() - started)
+
+    async def start(self) -> bool:
+        """
+        Create the client, retrying up to `attempts` times with a growing delay.
+
+        Returns:
+            bool: Whether the client is ready.
+        """
+        if self._client is not None:
+            return True
+
+        self.state = "starting"
+        for attempt in range(1, self.attempts + 1):
+            # The lock is held per attempt only, so a request calling `get()` waits for one attempt at most
+            async with self._lock:
+                if self._client is not None:
+                    return True
+                try:
+                    await self._create()
+                    return True
+                except Exception:
+                    logger.warning("%s client failed to start (attempt %d/%d): %s",
+                                   self.name, attempt, self.attempts, self.error)
+            if attempt < self.attempts:
+                await asyncio.sleep(self.delay * attempt)
+
+        self.state = "failed"
+        return False
+
+    async def get(self) -> Any:
+        """
+        Return the client, creating it now if startup has not managed to.
+
+        Raises:
+            HTTPException: 503 if the service cannot be reached.
+        """
+        if self._client is not None:
+            return self._client
+
+        async with self._lock:
+            if self._client is None:
+                try:
+                    await self._create()
+                except Exception:
+                    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                        detail=f"{self.name} is unavailable, please try again later",
+                                        headers={"Retry-After": "5"})
+        return self._client
+
+    def as_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "error": self.error,
+        }
+
+
+def _authorize_b2():
+    b2_api = B2Api(InMemoryAccountInfo())
+    b2_api.authorize_account("production", settings.backblaze_id, settings.backblaze_key)
+    return b2_api
+
+
+def _connect_supabase():
+    return create_client(settings.supabase_url, settings.supabase_key)
+
+
+b2 = LazyClient("backblaze", _authorize_b2, attempts=settings.startup_attempts,
+                delay=settings.startup_retry_delay, timeout=settings.client_start_timeout)
+supabase = LazyClient("supabase", _connect_supabase, attempts=settings.startup_attempts,
+                      delay=settings.startup_retry_delay, timeout=settings.client_start_timeout)
+
+external_clients = (b2, supabase)
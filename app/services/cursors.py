@@ -0,0 +1,42 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Tuple
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(created_at: datetime, message_id: int) -> str:
+    """
+    Encode the position of a message as an opaque, URL-safe cursor token.
+
+    Args:
+        created_at (datetime): Creation time of the message.
+        message_id (int): ID of the message, the tie-breaker for equal timestamps.
+
+    Returns:
+        str: The cursor token.
+    """
+    raw = f"{created_at.isoformat()}|{message_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Args:
+        token (str): The cursor token sent by the client.
+
+    Returns:
+        Tuple[datetime, int]: The `(created_at, id)` position.
+
+    Raises:
+        HTTPException: 400 if the token is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+        created_at, message_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
@@ -0,0 +1,120 @@
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.config.config import settings
+from app.schemas import message as message_schema
+
+
+class _Tail:
+    __slots__ = ("messages", "has_more", "built_at")
+
+    def __init__(self, messages: List[message_schema.SocketModel], has_more: bool):
+        self.messages = messages
+        self.has_more = has_more
+        self.built_at = time.monotonic()
+
+
+class HotTail:
+    """
+    Per-worker buffer of the newest assembled messages of each recently read room.
+
+    Each room holds at most `depth` messages in chronological order, together with
+    whether older ones exist. Rooms are evicted least-recently-read first once more
+    than `max_rooms` are held or their messages together exceed `max_messages`.
+
+    New messages are written by the socket service, which this process never sees,
+    so a tail is only served for `max_age` seconds after it was read from the
+    database. Edits and votes handled by this worker drop the affected room at once.
+    """
+
+    def __init__(self, depth: int, max_age: float, max_rooms: int, max_messages: int):
+        self.depth = depth
+        self.max_age = max_age
+        self.max_rooms = max_rooms
+        self.max_messages = max_messages
+        self._tails: "OrderedDict[int, _Tail]" = OrderedDict()
+        self._message_rooms: Dict[int, int] = {}
+        self._versions: Dict[int, int] = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, room_id: int) -> int:
+        return self._versions.get(room_id, 0)
+
+    def page(self, room_id: int, limit: int) -> Optional[Tuple[List[message_schema.SocketModel], bool]]:
+        """
+        Return the newest `limit` messages of a room and whether older ones exist, or None on a miss.
+        """
+        tail = self._tails.get(room_id)
+        if tail is None or limit > self.depth or time.monotonic() - tail.built_at >= self.max_age:
+            self.misses += 1
+            return None
+
+        self._tails.move_to_end(room_id)
+        self.hits += 1
+        return tail.messages[-limit:], tail.has_more or len(tail.messages) > limit
+
+    def fill(self, room_id: int, version: int, messages: List[message_schema.SocketModel], has_more: bool):
+        """
+        Store the newest messages of a room, read from the database.
+
+        Args:
+            room_id (int): The ID of the room.
+            version (int): `version(room_id)` taken before the read; a fill that raced with
+                an invalidation is dropped.
+            messages (List[SocketModel]): Up to `depth` newest messages, in chronological order.
+            has_more (bool): Whether the room has older messages than these.
+        """
+        if version != self.version(room_id):
+            return
+
+        self._drop(room_id)
+        has_more = has_more or len(messages) > self.depth
+        messages = messages[-self.depth:]
+        self._tails[room_id] = _Tail(messages, has_more)
+        self._size += len(messages)
+        for item in messages:
+            self._message_rooms[item.id] = room_id
+
+        while self._tails and (len(self._tails) > self.max_rooms or self._size > self.max_messages):
+            cold_room, _ = next(iter(self._tails.items()))
+            self._drop(cold_room)
+            self.evictions += 1
+
+    def invalidate_room(self, room_id: int):
+        self._versions[room_id] = self.version(room_id) + 1
+        self._drop(room_id)
+
+    def invalidate_message(self, message_id: int):
+        room_id = self._message_rooms.get(message_id)
+        if room_id is not None:
+            self.invalidate_room(room_id)
+
+    def _drop(self, room_id: int):
+        tail = self._tails.pop(room_id, None)
+        if tail is None:
+            return
+        self._size -= len(tail.messages)
+        for item in tail.messages:
+            self._message_rooms.pop(item.id, None)
+
+    def as_dict(self) -> dict:
+        return {
+            "rooms": len(self._tails),
+            "messages": self._size,
+            "max_messages": self.max_messages,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+hot_tail = HotTail(
+    depth=settings.messages_page_max,
+    max_age=settings.hot_tail_max_age,
+    max_rooms=settings.hot_tail_max_rooms,
+    max_messages=settings.hot_tail_max_messages,
+)
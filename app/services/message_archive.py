@@ -0,0 +1,326 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Literal, NamedTuple, Optional, Set, Tuple
+
+from cachetools import LRUCache
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.config import settings
+from app.models import messages_model, room_model
+
+
+logger = logging.getLogger(__name__)
+
+# Taken per room, together with the room ID, while a batch of its messages is archived
+ARCHIVE_LOCK_KEY = 7305002
+
+# A message's place in a room's history, the same (created_at, id) order as the cursors
+Position = Tuple[datetime, int]
+
+# Columns of `socket` kept in the archive; the text stays encrypted, as stored
+ARCHIVED_COLUMNS = [
+    messages_model.Socket.id,
+    messages_model.Socket.created_at,
+    messages_model.Socket.receiver_id,
+    messages_model.Socket.message,
+    messages_model.Socket.fileUrl,
+    messages_model.Socket.id_return,
+    messages_model.Socket.edited,
+    messages_model.Socket.vote_count,
+]
+
+
+class Segment(NamedTuple):
+    file: str
+    first: Position
+    last: Position
+    count: int
+
+
+def _position(row: dict) -> Position:
+    return row["created_at"], row["id"]
+
+
+def _aware(position: Position) -> Position:
+    created_at, message_id = position
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at, message_id
+
+
+def _encode(position: Position) -> list:
+    return [position[0].isoformat(), position[1]]
+
+
+def _decode(value: list) -> Position:
+    return datetime.fromisoformat(value[0]), value[1]
+
+
+class MessageArchive:
+    """
+    Append-only archive of old room messages, in gzip-compressed JSON-lines segment files.
+
+    Every room has a directory holding its segments and an `index.jsonl` with one line
+    per segment: the file and the (created_at, id) range it covers. A room is archived
+    oldest first, so its segments seldom overlap; a message committed late, behind
+    what was already archived, goes into a segment of its own that may. Segments are
+    never modified once written; decoded ones are kept in an LRU of `cache_segments`
+    entries. The index is re-read whenever the file changes, so a worker sees segments
+    written by another worker's job.
+
+    The directory is the only copy of archived messages. It has to be on persistent
+    storage and, with several hosts, shared by all of them: a host that cannot see a
+    segment silently skips its messages when paging.
+    """
+
+    def __init__(self, directory: str, cache_segments: int = 32):
+        self.directory = directory
+        self._indexes: Dict[int, Tuple[Tuple[int, int], List[Segment]]] = {}
+        self._segments = LRUCache(maxsize=cache_segments)
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.segment_loads = 0
+        self.segments_written = 0
+
+    def _room_directory(self, room_id: int) -> str:
+        return os.path.join(self.directory, str(room_id))
+
+    def segments(self, room_id: int) -> List[Segment]:
+        """The segments of a room, oldest first."""
+        path = os.path.join(self._room_directory(room_id), "index.jsonl")
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return []
+
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._indexes.get(room_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        segments = []
+        with open(path) as file:
+            for line in file:
+                if line.endswith("\n"):
+                    entry = json.loads(line)
+                    segments.append(Segment(entry["file"], _decode(entry["first"]), _decode(entry["last"]),
+                                            entry["count"]))
+        with self._lock:
+            self._indexes[room_id] = (version, segments)
+        return segments
+
+    def count(self, room_id: int) -> int:
+        """The number of messages in the segments of a room."""
+        return sum(segment.count for segment in self.segments(room_id))
+
+    def archived_ids(self, room_id: int, first: Position, last: Position) -> Set[int]:
+        """The IDs of the archived messages of a room between `first` and `last`, inclusive."""
+        ids = set()
+        for segment in self.segments(room_id):
+            if segment.last >= first and segment.first <= last:
+                ids.update(row["id"] for row in self._load(room_id, segment))
+        return ids
+
+    def check_writable(self):
+        """
+        Raise unless the archive directory is an absolute path that already exists and is writable.
+
+        The directory is never created here: it is provisioned as a volume or state
+        directory, so a missing one means the persistent storage is not mounted.
+        """
+        if not os.path.isabs(self.directory):
+            raise RuntimeError(f"ARCHIVE_DIR must be an absolute path on persistent storage, got {self.directory!r}")
+        if not os.path.isdir(self.directory):
+            raise RuntimeError(f"Archive directory {self.directory} does not exist; is its volume mounted?")
+        if not os.access(self.directory, os.W_OK | os.X_OK):
+            raise RuntimeError(f"Archive directory {self.directory} is not writable")
+
+    def _load(self, room_id: int, segment: Segment) -> List[dict]:
+        key = (room_id, segment.file)
+        with self._lock:
+            rows = self._segments.get(key)
+        if rows is not None:
+            return rows
+
+        with gzip.open(os.path.join(self._room_directory(room_id), segment.file), "rt") as file:
+            rows = [json.loads(line) for line in file]
+        for row in rows:
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+        with self._lock:
+            self._segments[key] = rows
+            self.segment_loads += 1
+        return rows
+
+    def _page(self, room_id: int, cursor: Optional[Position], direction: str, limit: int) -> List[dict]:
+        before = direction == "before"
+        if before:
+            segments = [segment for segment in self.segments(room_id) if cursor is None or segment.first < cursor]
+            segments.sort(key=lambda segment: segment.last, reverse=True)
+        else:
+            segments = [segment for segment in self.segments(room_id) if cursor is None or segment.last > cursor]
+            segments.sort(key=lambda segment: segment.first)
+
+        rows = []
+        for segment in segments:
+            # Segments may overlap: stop once no remaining one can hold a row of the page
+            if len(rows) >= limit and (segment.last < _position(rows[-1]) if before
+                                       else segment.first > _position(rows[-1])):
+                break
+            rows.extend(row for row in self._load(room_id, segment)
+                        if cursor is None or (_position(row) < cursor if before else _position(row) > cursor))
+            rows.sort(key=_position, reverse=before)
+            del rows[limit:]
+        return rows
+
+    async def page(self, room_id: int, cursor: Optional[Position],
+                   direction: Literal["before", "after"], limit: int) -> List[dict]:
+        """
+        Read up to `limit` archived messages of a room next to a cursor position.
+
+        Args:
+            room_id (int): The ID of the room.
+            cursor (Position, optional): The position to page from; None starts at the newest
+                archived message going back, or at the oldest going forward.
+            direction (str): "before" for older messages, newest first; "after" for newer ones, oldest first.
+            limit (int): Maximum number of messages.
+
+        Returns:
+            List[dict]: The messages, with the columns of `ARCHIVED_COLUMNS`.
+        """
+        self.reads += 1
+        if cursor is not None:
+            cursor = _aware(cursor)
+        return await asyncio.to_thread(self._page, room_id, cursor, direction, limit)
+
+    def write_segment(self, room_id: int, rows: List[dict]) -> Segment:
+        """
+        Write messages of a room, in history order and not archived yet, as a new segment.
+
+        The segment is synced to disk before it is added to the index, and the index line
+        before this returns: the caller may then delete the rows from the database.
+        """
+        directory = self._room_directory(room_id)
+        os.makedirs(directory, exist_ok=True)
+        first, last = _position(rows[0]), _position(rows[-1])
+        segment = Segment(f"{first[1]}-{last[1]}.jsonl.gz", first, last, len(rows))
+
+        path = os.path.join(directory, segment.file)
+        lines = "".join(json.dumps({**row, "created_at": row["created_at"].isoformat()}) + "\n" for row in rows)
+        with open(path + ".tmp", "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as file:
+                file.write(lines.encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(path + ".tmp", path)
+
+        entry = {"file": segment.file, "first": _encode(first), "last": _encode(last), "count": segment.count}
+        with open(os.path.join(directory, "index.jsonl"), "a") as index:
+            index.write(json.dumps(entry) + "\n")
+            index.flush()
+            os.fsync(index.fileno())
+
+        self.segments_written += 1
+        return segment
+
+    def as_dict(self) -> dict:
+        return {
+            "directory": self.directory,
+            "reads": self.reads,
+            "segment_loads": self.segment_loads,
+            "cached_segments": len(self._segments),
+            "segments_written": self.segments_written,
+        }
+
+
+message_archive = MessageArchive(settings.archive_dir, cache_segments=settings.archive_cache_segments)
+
+
+async def archive_old_messages(db: AsyncSession, older_than: timedelta,
+                               segment_messages: int = settings.archive_segment_messages) -> int:
+    """
+    Move the room messages older than `older_than` from `socket` into `message_archive`.
+
+    Each room is archived oldest first, one segment of up to `segment_messages` messages
+    per transaction: its rows are locked, so they cannot be edited or deleted meanwhile,
+    the segment is written and synced, then the rows are deleted and counted in
+    `room_stats.archived_messages`. A batch interrupted after its segment was
+    written is not archived twice, since rows whose IDs are already in a segment are
+    only deleted. Rooms being archived by another worker are skipped.
+
+    Nothing is deleted unless the archive directory is writable and holds at least as
+    many messages of the room as `room_stats` says were archived; fewer means segments
+    were lost or written to another host's archive.
+
+    Args:
+        db (AsyncSession): The database session.
+        older_than (timedelta): Age from which a message is archived.
+        segment_messages (int, optional): Messages per segment and transaction.
+
+    Returns:
+        int: The number of messages moved.
+
+    Raises:
+        RuntimeError: If the archive is not writable or is missing archived messages.
+    """
+    message_archive.check_writable()
+
+    cutoff = datetime.now(timezone.utc) - older_than
+    rooms = (await db.execute(
+        select(room_model.Rooms.id, func.coalesce(room_model.RoomStats.archived_messages, 0))
+        .outerjoin(room_model.RoomStats, room_model.RoomStats.room_id == room_model.Rooms.id)
+    )).all()
+    await db.commit()
+
+    moved = 0
+    for room_id, archived in rooms:
+        in_archive = await asyncio.to_thread(message_archive.count, room_id)
+        if in_archive < archived:
+            raise RuntimeError(f"Archive {message_archive.directory} holds {in_archive} messages of room {room_id}, "
+                               f"room_stats counts {archived} archived: refusing to delete more")
+
+        while True:
+            locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(:key, :room_id)"),
+                                     {"key": ARCHIVE_LOCK_KEY, "room_id": room_id})
+            if not locked:
+                await db.rollback()
+                break
+
+            result = await db.execute(select(*ARCHIVED_COLUMNS).where(
+                messages_model.Socket.room_id == room_id,
+                messages_model.Socket.created_at < cutoff
+            ).order_by(messages_model.Socket.created_at, messages_model.Socket.id).limit(segment_messages)
+                .with_for_update())
+            rows = [dict(row) for row in result.mappings()]
+            if not rows:
+                await db.rollback()
+                break
+
+            archived_ids = await asyncio.to_thread(message_archive.archived_ids, room_id,
+                                                   _position(rows[0]), _position(rows[-1]))
+            fresh = [row for row in rows if row["id"] not in archived_ids]
+            if fresh:
+                await asyncio.to_thread(message_archive.write_segment, room_id, fresh)
+
+            deleted = (await db.execute(delete(messages_model.Socket).where(
+                messages_model.Socket.id.in_([row["id"] for row in rows]),
+                messages_model.Socket.created_at < cutoff
+            ).execution_options(synchronize_session=False))).rowcount
+            await db.execute(update(room_model.RoomStats).where(room_model.RoomStats.room_id == room_id).values(
+                archived_messages=room_model.RoomStats.archived_messages + deleted
+            ))
+            await db.commit()
+            moved += deleted
+
+            if len(rows) < segment_messages:
+                break
+
+    if moved:
+        logger.info("Archived %d messages older than %s", moved, cutoff)
+    return moved
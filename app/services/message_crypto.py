@@ -0,0 +1,149 @@
+import asyncio
+import base64
+import binascii
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from app.config.config import settings
+from app.services.plaintext_cache import MISSING, plaintext_cache
+
+
+logger = logging.getLogger(__name__)
+
+cipher = Fernet(settings.key_crypto)
+
+DECRYPT_WORKERS = settings.decrypt_workers or os.cpu_count() or 1
+# Below this many rows a chunk is not worth a hand-off to another thread
+MIN_CHUNK = 32
+
+_executor = ThreadPoolExecutor(max_workers=DECRYPT_WORKERS, thread_name_prefix="decrypt")
+
+
+class DecryptStats:
+    """Running totals of the decryption work done by this worker."""
+
+    def __init__(self):
+        self.batches = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.last_batch_rows = 0
+        self.last_batch_seconds = 0.0
+
+    def observe(self, rows: int, seconds: float):
+        self.batches += 1
+        self.rows += rows
+        self.seconds += seconds
+        self.last_batch_rows = rows
+        self.last_batch_seconds = seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "workers": DECRYPT_WORKERS,
+            "batches": self.batches,
+            "rows": self.rows,
+            "seconds": round(self.seconds, 6),
+            "avg_row_us": round(self.seconds / self.rows * 1e6, 2) if self.rows else 0.0,
+            "last_batch_rows": self.last_batch_rows,
+            "last_batch_ms": round(self.last_batch_seconds * 1e3, 3),
+        }
+
+
+stats = DecryptStats()
+
+
+def decrypt(encoded_data: Optional[str]) -> Optional[str]:
+    """
+    Decrypt one stored message.
+
+    Messages are stored as standard base64 of a Fernet token. Anything that is not
+    base64 is legacy plaintext and is returned unchanged; a base64 payload that is not
+    a valid token yields None. The payload is decoded exactly once.
+
+    Args:
+        encoded_data (str): The stored message.
+
+    Returns:
+        Optional[str]: The plaintext.
+    """
+    if encoded_data is None:
+        return None
+
+    try:
+        encrypted = base64.b64decode(encoded_data, validate=True)
+    except (binascii.Error, ValueError):
+        return encoded_data
+
+    try:
+        return cipher.decrypt(encrypted).decode('utf-8')
+    except InvalidToken:
+        return None
+
+
+def _decrypt_chunk(payloads: Sequence[Optional[str]]) -> List[Optional[str]]:
+    return [decrypt(payload) for payload in payloads]
+
+
+async def decrypt_batch(payloads: Sequence[Optional[str]]) -> List[Optional[str]]:
+    """
+    Decrypt a page of messages off the event loop, preserving order.
+
+    The page is split into contiguous chunks, one per pool thread at most, and the
+    chunks are decrypted concurrently. Per-batch and average per-row timings are
+    recorded in `stats` and logged at debug level.
+
+    Args:
+        payloads (Sequence[Optional[str]]): Stored messages in display order.
+
+    Returns:
+        List[Optional[str]]: Plaintexts in the same order.
+    """
+    if not payloads:
+        return []
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+
+    chunks = max(1, min(DECRYPT_WORKERS, len(payloads) // MIN_CHUNK))
+    size = math.ceil(len(payloads) / chunks)
+    parts = await asyncio.gather(*(
+        loop.run_in_executor(_executor, _decrypt_chunk, payloads[i:i + size])
+        for i in range(0, len(payloads), size)
+    ))
+    plaintexts = [text for part in parts for text in part]
+
+    elapsed = time.perf_counter() - started
+    stats.observe(len(payloads), elapsed)
+    logger.debug("Decrypted %d messages in %.3f ms (%.1f us/row)",
+                 len(payloads), elapsed * 1e3, elapsed / len(payloads) * 1e6)
+    return plaintexts
+
+
+async def decrypt_messages(message_ids: Sequence[int], payloads: Sequence[Optional[str]]) -> List[Optional[str]]:
+    """
+    Decrypt a page of messages, serving recently seen ones from `plaintext_cache`.
+
+    Only cache misses are sent to `decrypt_batch`; their plaintexts are cached afterwards.
+
+    Args:
+        message_ids (Sequence[int]): Message IDs, aligned with `payloads`.
+        payloads (Sequence[Optional[str]]): Stored messages in display order.
+
+    Returns:
+        List[Optional[str]]: Plaintexts in the same order.
+    """
+    plaintexts = [plaintext_cache.get(message_id, payload) for message_id, payload in zip(message_ids, payloads)]
+    misses = [i for i, plaintext in enumerate(plaintexts) if plaintext is MISSING]
+
+    if misses:
+        decrypted = await decrypt_batch([payloads[i] for i in misses])
+        for i, plaintext in zip(misses, decrypted):
+            plaintexts[i] = plaintext
+            plaintext_cache.put(message_ids[i], payloads[i], plaintext)
+
+    return plaintexts
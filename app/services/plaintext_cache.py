@@ -0,0 +1,78 @@
+import sys
+from typing import Optional, Tuple
+
+from cachetools import LRUCache
+
+from app.config.config import settings
+
+
+# Rough per-entry overhead of the key tuple, the value tuple and the LRU bookkeeping
+ENTRY_OVERHEAD = 200
+
+MISSING = object()
+
+
+class _CountingLRU(LRUCache):
+    def __init__(self, maxsize, getsizeof=None):
+        super().__init__(maxsize, getsizeof)
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+def _entry_size(value: Tuple[int, Optional[str]]) -> int:
+    return sys.getsizeof(value[1]) + ENTRY_OVERHEAD
+
+
+class PlaintextCache:
+    """
+    Memory-bounded LRU of decrypted messages, keyed by message ID.
+
+    Each entry remembers the edit version it was decrypted from, a fingerprint of the
+    stored ciphertext: an edited message has a new ciphertext, so a stale plaintext is
+    never served even when the edit came from another worker or from the socket service.
+    Entries are evicted least-recently-used first once their total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._entries = _CountingLRU(maxsize=max_bytes, getsizeof=_entry_size)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def version(payload: Optional[str]) -> int:
+        return hash(payload)
+
+    def get(self, message_id: int, payload: Optional[str]):
+        entry = self._entries.get(message_id, MISSING)
+        if entry is not MISSING and entry[0] == self.version(payload):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return MISSING
+
+    def put(self, message_id: int, payload: Optional[str], plaintext: Optional[str]):
+        try:
+            self._entries[message_id] = (self.version(payload), plaintext)
+        except ValueError:
+            # Larger than the whole cache
+            pass
+
+    def invalidate(self, message_id: int):
+        self._entries.pop(message_id, None)
+
+    def as_dict(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._entries.currsize,
+            "max_bytes": self._entries.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self._entries.evictions,
+        }
+
+
+plaintext_cache = PlaintextCache(max_bytes=settings.plaintext_cache_bytes)
@@ -0,0 +1,67 @@
+from typing import Dict, Iterable, List, Mapping, Optional, Union
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import room_model
+from app.schemas import room as room_schema
+
+
+async def fetch_room_stats(db: AsyncSession, room_ids: Iterable[int]) -> Dict[int, room_model.RoomStats]:
+    """
+    Load the statistics of the given rooms in a single primary-key lookup.
+
+    Args:
+        db (AsyncSession): The database session.
+        room_ids (Iterable[int]): IDs of the rooms to load.
+
+    Returns:
+        Dict[int, room_model.RoomStats]: Statistics keyed by room ID. Rooms without a row are absent.
+    """
+    room_ids = set(room_ids)
+    if not room_ids:
+        return {}
+
+    result = await db.execute(select(room_model.RoomStats).where(room_model.RoomStats.room_id.in_(room_ids)))
+    return {stats.room_id: stats for stats in result.scalars()}
+
+
+async def build_room_cards(db: AsyncSession,
+                     rooms: Iterable[room_model.Rooms],
+                     favorites: Optional[Mapping[int, Optional[bool]]] = None
+                     ) -> List[Union[room_schema.RoomBase, room_schema.RoomFavorite]]:
+    """
+    Assemble the room cards shown in every room listing.
+
+    Args:
+        db (AsyncSession): The database session.
+        rooms (Iterable[room_model.Rooms]): The rooms to describe, in display order.
+        favorites (Mapping[int, bool], optional): Favorite flag per room ID. When given,
+            `RoomFavorite` cards are returned instead of `RoomBase`.
+
+    Returns:
+        List[room_schema.RoomBase | room_schema.RoomFavorite]: One card per room, in the order received.
+    """
+    rooms = list(rooms)
+    stats_by_room = await fetch_room_stats(db, (room.id for room in rooms))
+
+    cards = []
+    for room in rooms:
+        stats = stats_by_room.get(room.id)
+        card = {
+            "id": room.id,
+            "owner": room.owner,
+            "name_room": room.name_room,
+            "image_room": room.image_room,
+            "count_users": stats.count_users if stats is not None else 0,
+            "count_messages": stats.count_messages + stats.archived_messages if stats is not None else 0,
+            "created_at": room.created_at,
+            "secret_room": room.secret_room,
+            "block": room.block
+        }
+        if favorites is None:
+            cards.append(room_schema.RoomBase(**card))
+        else:
+            cards.append(room_schema.RoomFavorite(favorite=bool(favorites.get(room.id)), **card))
+
+    return cards
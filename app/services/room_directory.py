@@ -0,0 +1,68 @@
+import asyncio
+import hashlib
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+
+from app.config.config import settings
+from app.schemas import room as room_schema
+
+
+_cards_adapter = TypeAdapter(List[room_schema.RoomBase])
+
+
+class RoomDirectory:
+    """
+    Per-worker snapshot of the public room list, kept as ready-to-send JSON bytes.
+
+    Room writes handled by this worker call `invalidate()`, which bumps the version
+    and drops the snapshot. Counts change on every message, so a snapshot is also
+    rebuilt once it is older than `max_age` seconds; that window also bounds how
+    long another worker's invalidation can go unnoticed here.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self.version = 0
+        self._body: Optional[bytes] = None
+        self._etag: Optional[str] = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self.version += 1
+        self._body = None
+
+    def _fresh(self) -> bool:
+        return self._body is not None and time.monotonic() - self._built_at < self.max_age
+
+    async def get(self, build: Callable[[], Awaitable[List[room_schema.RoomBase]]]) -> Tuple[bytes, str]:
+        """
+        Return the serialized directory and its ETag, rebuilding it at most once per expiry.
+
+        Args:
+            build (Callable): Coroutine function producing the room cards.
+
+        Returns:
+            Tuple[bytes, str]: The JSON body and its ETag.
+        """
+        if self._fresh():
+            return self._body, self._etag
+
+        async with self._lock:
+            # Another request may have rebuilt it while we waited for the lock
+            if self._fresh():
+                return self._body, self._etag
+
+            version = self.version
+            body = _cards_adapter.dump_json(await build())
+            etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+            # Do not publish a snapshot that a concurrent write already invalidated
+            if version == self.version:
+                self._body, self._etag, self._built_at = body, etag, time.monotonic()
+            return body, etag
+
+
+room_directory = RoomDirectory(max_age=settings.room_directory_max_age)
@@ -0,0 +1,79 @@
+from typing import NamedTuple, Optional
+
+from cachetools import TTLCache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.config import settings
+from app.models import room_model
+
+
+class RoomMeta(NamedTuple):
+    id: int
+    name_room: str
+    block: bool
+    secret_room: bool
+    owner: int
+
+
+class RoomMetaCache:
+    """
+    Per-worker cache of the room fields checked on hot paths, keyed by room ID.
+
+    Room writes handled by this worker call `invalidate()` (or `clear()` when many
+    rooms change at once). Entries expire after `max_age` seconds, which bounds
+    how long another worker's block, rename or deletion can go unnoticed here.
+    """
+
+    def __init__(self, max_age: float, max_rooms: int):
+        self._rooms = TTLCache(maxsize=max_rooms, ttl=max_age)
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db: AsyncSession, room_id: int) -> Optional[RoomMeta]:
+        """
+        Return the metadata of a room, reading it from the database on a miss.
+
+        Args:
+            db (AsyncSession): The database session.
+            room_id (int): The ID of the room.
+
+        Returns:
+            Optional[RoomMeta]: The room metadata, or None if the room does not exist.
+        """
+        meta = self._rooms.get(room_id)
+        if meta is not None:
+            self.hits += 1
+            return meta
+
+        self.misses += 1
+        result = await db.execute(select(
+            room_model.Rooms.id,
+            room_model.Rooms.name_room,
+            room_model.Rooms.block,
+            room_model.Rooms.secret_room,
+            room_model.Rooms.owner
+        ).where(room_model.Rooms.id == room_id))
+        row = result.one_or_none()
+        if row is None:
+            return None
+
+        meta = RoomMeta(*row)
+        self._rooms[room_id] = meta
+        return meta
+
+    def invalidate(self, room_id: int):
+        self._rooms.pop(room_id, None)
+
+    def clear(self):
+        self._rooms.clear()
+
+    def as_dict(self) -> dict:
+        return {
+            "rooms": len(self._rooms),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+room_meta = RoomMetaCache(max_age=settings.room_meta_max_age, max_rooms=settings.room_meta_max_rooms)
@@ -0,0 +1,98 @@
+import logging
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.models import room_model, messages_model, user_model
+
+
+logger = logging.getLogger(__name__)
+
+# Held by a running reconcile; another run started meanwhile skips it
+RECONCILE_LOCK_KEY = 7305003
+
+
+async def reconcile_room(conn: AsyncConnection, room_id: int) -> bool:
+    """
+    Recount one room under a lock on its `room_stats` row and correct the row if it drifted.
+
+    The row is locked before counting. Writers whose trigger already updated it have
+    committed by then, so the count includes their rows. The others wait on the lock
+    and add their increments on top of the recount.
+
+    Args:
+        conn (AsyncConnection): A connection; the caller commits.
+        room_id (int): The ID of the room.
+
+    Returns:
+        bool: True if the row was corrected.
+    """
+    stats = room_model.RoomStats
+    stored = (await conn.execute(
+        select(stats.count_messages, stats.count_users, stats.last_activity)
+        .where(stats.room_id == room_id).with_for_update()
+    )).one_or_none()
+    if stored is None:
+        return False
+
+    count_messages, last_activity, count_users = (await conn.execute(select(
+        select(func.count()).where(messages_model.Socket.room_id == room_id).scalar_subquery(),
+        select(func.max(messages_model.Socket.created_at)).where(messages_model.Socket.room_id == room_id)
+        .scalar_subquery(),
+        select(func.count()).where(user_model.User_Status.room_id == room_id).scalar_subquery(),
+    ))).one()
+    # A room whose messages were all archived keeps its last activity
+    actual = (count_messages, count_users, last_activity or stored.last_activity)
+    if tuple(stored) == actual:
+        return False
+
+    await conn.execute(update(stats).where(stats.room_id == room_id).values(
+        count_messages=actual[0], count_users=actual[1], last_activity=actual[2]
+    ))
+    return True
+
+
+async def reconcile_room_stats(conn: AsyncConnection) -> int:
+    """
+    Repair the drift of the per-room statistics against `socket` and `user_status`.
+
+    The triggers in `app.database.schema` keep the counters current between runs;
+    this repairs anything they missed. Rooms are recounted one transaction at a
+    time, see `reconcile_room`. A session-level advisory lock keeps a second run,
+    such as one started by hand, from overlapping the scheduled one.
+
+    Args:
+        conn (AsyncConnection): A connection of its own, which keeps the advisory lock across commits.
+
+    Returns:
+        int: The number of rooms corrected.
+    """
+    locked = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": RECONCILE_LOCK_KEY})
+    await conn.commit()
+    if not locked:
+        return 0
+
+    corrected = 0
+    try:
+        # Rooms created before their trigger existed have no row yet
+        await conn.execute(insert(room_model.RoomStats).from_select(
+            ['room_id'], select(room_model.Rooms.id)
+        ).on_conflict_do_nothing(index_elements=[room_model.RoomStats.room_id]))
+        room_ids = (await conn.scalars(
+            select(room_model.RoomStats.room_id).order_by(room_model.RoomStats.room_id)
+        )).all()
+        await conn.commit()
+
+        for room_id in room_ids:
+            corrected += await reconcile_room(conn, room_id)
+            await conn.commit()
+    finally:
+        await conn.rollback()
+        await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": RECONCILE_LOCK_KEY})
+        await conn.commit()
+
+    if corrected:
+        logger.info("Corrected room_stats of %d rooms", corrected)
+    return corrected
+
@@ -0,0 +1,51 @@
+import inspect
+
+from fastapi.routing import APIRoute
+from sqlalchemy.orm import Session
+
+from app.main import app
+from app.database.async_db import get_async_session
+
+
+def _dependencies(dependant):
+    for dependency in dependant.dependencies:
+        yield dependency
+        yield from _dependencies(dependency)
+
+
+def _routes():
+    return [route for route in app.routes if isinstance(route, APIRoute)]
+
+
+def _name(route):
+    return f"{', '.join(route.methods)} {route.path}"
+
+
+def test_no_endpoint_uses_sync_session():
+    """
+    Every endpoint runs on the event loop, where a blocking `Session` stalls all other requests.
+
+    Fails if any endpoint or dependency still takes a sync `Session`.
+    """
+    offenders = [
+        _name(route)
+        for route in _routes()
+        for call in [route.endpoint] + [dependency.call for dependency in _dependencies(route.dependant)]
+        if any(parameter.annotation is Session for parameter in inspect.signature(call).parameters.values())
+    ]
+
+    assert not offenders, f"Endpoints using the sync database session: {offenders}"
+
+
+def test_one_session_per_request():
+    """
+    The endpoint and its dependencies must share one cached session, i.e. one pooled connection.
+    """
+    offenders = [
+        _name(route)
+        for route in _routes()
+        if any(dependency.call is get_async_session and not dependency.use_cache
+               for dependency in _dependencies(route.dependant))
+    ]
+
+    assert not offenders, f"Endpoints opening more than one database session: {offenders}"
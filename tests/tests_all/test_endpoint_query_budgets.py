@@ -0,0 +1,64 @@
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from app.database.async_db import async_session_maker
+from app.main import app
+from app.models import messages_model, room_model
+from tests.utils.query_budget import query_budget
+from .utils import auth_headers, create_room, create_user
+
+# Rows per test. The budgets leave a few statements of slack, far fewer than the
+# ROWS extra statements a query inside the endpoint's loop would cost.
+ROWS = 8
+
+
+@pytest.mark.asyncio
+async def test_delete_user_query_budget():
+    async with async_session_maker() as session:
+        owner = await create_user(session)
+        moderator = await create_user(session)
+        for _ in range(ROWS):
+            room = await create_room(session, owner.id)
+            session.add(room_model.RoleInRoom(user_id=moderator.id, room_id=room.id, role="moderator"))
+        await session.commit()
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        headers = await auth_headers(owner)
+        with query_budget(15):
+            response = await client.request("DELETE", "/users/", headers=headers,
+                                            content=json.dumps({"password": "password123"}))
+    assert response.status_code == 204
+
+
+@pytest.mark.asyncio
+async def test_add_rooms_to_tab_query_budget():
+    async with async_session_maker() as session:
+        owner = await create_user(session)
+        room_ids = [(await create_room(session, owner.id)).id for _ in range(ROWS)]
+        tab = room_model.RoomTabsInfo(owner_id=owner.id, name_tab="budget")
+        session.add(tab)
+        await session.commit()
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        headers = await auth_headers(owner)
+        with query_budget(8):
+            response = await client.post(f"/tabs/add-room-to-tab/{tab.id}", headers=headers, json=room_ids)
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_private_recipients_query_budget():
+    async with async_session_maker() as session:
+        user = await create_user(session)
+        for _ in range(ROWS):
+            sender = await create_user(session)
+            session.add(messages_model.PrivateMessage(sender_id=sender.id, receiver_id=user.id, is_read=False))
+        await session.commit()
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        with query_budget(4):
+            response = await client.get(f"/direct/{user.id}")
+    assert response.status_code == 200
+    assert len(response.json()) == ROWS
@@ -0,0 +1,51 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+
+from app.config.config import settings
+from app.database.async_db import async_session_maker
+from app.main import app
+from app.models import messages_model
+from .utils import create_room, create_user
+
+
+@pytest.mark.asyncio
+async def test_sync_pages_through_more_changes_than_a_page(monkeypatch):
+    """
+    More already-seen messages change than fit in one page: every call must move the watermark.
+    """
+    monkeypatch.setattr(settings, "messages_page_max", 3)
+    monkeypatch.setattr(settings, "sync_settle_seconds", 0)
+
+    async with async_session_maker() as session:
+        owner = await create_user(session)
+        room = await create_room(session, owner.id)
+        messages = [messages_model.Socket(room_id=room.id, receiver_id=owner.id) for _ in range(7)]
+        session.add_all(messages)
+        await session.commit()
+        ids = [message.id for message in messages]
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get(f"/messages/{room.id}/sync", params={"last_id": max(ids)})
+        assert response.status_code == 200
+        watermark = response.json()
+
+        async with async_session_maker() as session:
+            await session.execute(update(messages_model.Socket).where(
+                messages_model.Socket.id.in_(ids)).values(edited=True))
+            await session.commit()
+
+        changed = []
+        for _ in range(len(ids)):
+            response = await client.get(f"/messages/{room.id}/sync", params={
+                "last_id": watermark["last_id"], "since": watermark["since"], "since_id": watermark["since_id"]
+            })
+            if response.status_code == 204:
+                break
+            watermark = response.json()
+            assert len(watermark["changed"]) <= settings.messages_page_max
+            changed += [item["id"] for item in watermark["changed"]]
+        else:
+            pytest.fail("sync never reached an empty 204")
+
+    assert sorted(changed) == sorted(ids)
@@ -0,0 +1,106 @@
+import re
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import schema
+from app.database.async_db import ASINC_SQLALCHEMY_DATABASE_URL
+from app.database.migrate import SCHEMA_VERSION, migrate, verify_schema
+
+
+# Migrations run here from an empty schema; the test database's own tables are never touched
+SCRATCH_SCHEMA = "migrations_test"
+
+
+def _body(function_sql: str) -> str:
+    return " ".join(function_sql.split("$$")[1].split())
+
+
+@pytest_asyncio.fixture
+async def scratch_engine():
+    engine = create_async_engine(ASINC_SQLALCHEMY_DATABASE_URL,
+                                 connect_args={"server_settings": {"search_path": SCRATCH_SCHEMA}})
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCRATCH_SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCRATCH_SCHEMA}"))
+    try:
+        yield engine
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCRATCH_SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_migrations_build_the_catalogue(scratch_engine):
+    """
+    A database migrated from nothing ends up with exactly the triggers and functions `app.database.schema` describes.
+    """
+    assert await migrate(scratch_engine) == list(range(1, SCHEMA_VERSION + 1))
+    await verify_schema(scratch_engine)
+
+    async with scratch_engine.connect() as conn:
+        assert await schema.missing_objects(conn) == []
+
+        triggers = {(name, table) for name, table in await conn.execute(text("""
+            SELECT t.tgname, c.relname FROM pg_trigger AS t JOIN pg_class AS c ON c.oid = t.tgrelid
+             WHERE c.relnamespace = (SELECT oid FROM pg_namespace WHERE nspname = current_schema())
+               AND NOT c.relispartition AND NOT t.tgisinternal
+        """))}
+        assert triggers == {(name, table) for name, table, _, _ in schema.TRIGGERS}
+
+        for function_sql in schema.FUNCTIONS:
+            name = re.search(r"FUNCTION (\w+)\(", function_sql).group(1)
+            source = await conn.scalar(text("""
+                SELECT prosrc FROM pg_proc
+                 WHERE proname = :name AND pronamespace = (SELECT oid FROM pg_namespace WHERE nspname = current_schema())
+            """), {"name": name})
+            assert source is not None, name
+            assert " ".join(source.split()) == _body(function_sql), name
+
+        # Partitioned, the message tables keep `id` unique only through the sequence they share
+        for table in ("socket", "private_messages"):
+            assert await conn.scalar(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}) is not None
+
+    # Re-running is a no-op
+    assert await migrate(scratch_engine) == []
+
+
+@pytest.mark.asyncio
+async def test_room_id_backfill_recounts_room_stats(scratch_engine):
+    """
+    Messages written before socket.room_id existed name only their room: after the backfill every room is counted by room_id.
+    """
+    await migrate(scratch_engine, target=1)
+    async with scratch_engine.begin() as conn:
+        await conn.execute(text("""
+            INSERT INTO users (email, user_name, password, avatar)
+            VALUES ('legacy@test.dev', 'legacy', 'x', 'a')
+        """))
+        await conn.execute(text("""
+            INSERT INTO rooms (name_room, image_room, owner)
+            SELECT 'legacy ' || g, 'i', (SELECT id FROM users) FROM generate_series(1, 2) AS g
+        """))
+        await conn.execute(text("""
+            INSERT INTO socket (rooms, message) SELECT 'legacy 1', 'm' || g FROM generate_series(1, 3) AS g
+        """))
+        await conn.execute(text("INSERT INTO socket (rooms, message) VALUES ('legacy 2', 'm')"))
+        await conn.execute(text("""
+            INSERT INTO user_status (room_id, name_room, user_id, user_name)
+            SELECT id, name_room, (SELECT id FROM users), 'legacy' FROM rooms WHERE name_room = 'legacy 2'
+        """))
+
+    # Keyed by room_id, the triggers now miss the deletion of a message whose room_id is still NULL
+    await migrate(scratch_engine, target=5)
+    async with scratch_engine.begin() as conn:
+        await conn.execute(text("DELETE FROM socket WHERE message = 'm1'"))
+
+    await migrate(scratch_engine, target=6)
+    async with scratch_engine.connect() as conn:
+        counts = {name: (messages, users) for name, messages, users in await conn.execute(text("""
+            SELECT rooms.name_room, room_stats.count_messages, room_stats.count_users
+              FROM room_stats JOIN rooms ON rooms.id = room_stats.room_id
+        """))}
+    assert counts == {"legacy 1": (2, 0), "legacy 2": (1, 1)}
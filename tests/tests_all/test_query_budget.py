@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.database.query_counter import track_queries
+from tests.utils.query_budget import query_budget
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    yield engine
+    engine.dispose()
+
+
+def test_counts_statements_and_repeats(engine):
+    with engine.connect() as conn, track_queries() as stats:
+        for _ in range(3):
+            conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+
+    assert stats.count == 4
+    assert stats.most_repeated() == ("SELECT 1", 3)
+
+
+def test_nested_trackers_both_count(engine):
+    with engine.connect() as conn, track_queries() as outer:
+        conn.execute(text("SELECT 1"))
+        with track_queries() as inner:
+            conn.execute(text("SELECT 2"))
+
+    assert (outer.count, inner.count) == (2, 1)
+
+
+def test_nothing_counted_outside_a_tracker(engine):
+    with track_queries() as stats:
+        pass
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert stats.count == 0
+
+
+def test_budget_exceeded_lists_the_statements(engine):
+    with pytest.raises(AssertionError, match="1 x SELECT 1"):
+        with engine.connect() as conn, query_budget(1):
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
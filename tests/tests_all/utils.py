@@ -35,3 +35,46 @@ def random_email() -> str:
     str: A random email address in the format "random_string@random_string.testuser"
     """
     return f"{random_lower_string()}@{random_lower_string()}.testuser"
+
+
+async def create_user(session, password: str = "password123", verified: bool = True):
+    """
+    Insert a user straight into the database, for tests that need rows rather than the sign-up flow.
+
+    Returns:
+    user_model.User: The new user, committed.
+    """
+    from app.auth import passwords
+    from app.models import user_model
+
+    new_user = user_model.User(email=random_email(), user_name=random_lower_string(),
+                               password=await passwords.hash_password(password),
+                               avatar="avatar", verified=verified)
+    session.add(new_user)
+    await session.commit()
+    return new_user
+
+
+async def create_room(session, owner_id: int):
+    """
+    Insert a room owned by `owner_id`.
+
+    Returns:
+    room_model.Rooms: The new room, committed.
+    """
+    from app.models import room_model
+
+    room = room_model.Rooms(name_room=random_lower_string(), image_room="image", owner=owner_id)
+    session.add(room)
+    await session.commit()
+    return room
+
+
+async def auth_headers(user) -> dict:
+    """
+    The Authorization header of an access token for `user`.
+    """
+    from app.auth import oauth2
+
+    token = await oauth2.create_access_token(data={"user_id": user.id}, user=user)
+    return {"Authorization": f"Bearer {token}"}
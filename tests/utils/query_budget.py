@@ -0,0 +1,17 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.database.query_counter import QueryStats, track_queries
+
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[QueryStats]:
+    """
+    Fail the test if the block runs more than `max_queries` SQL statements.
+
+    The failure lists every statement with how often it ran, so a query in a loop
+    shows up as the one repeated once per row.
+    """
+    with track_queries() as stats:
+        yield stats
+    assert stats.count <= max_queries, f"Query budget of {max_queries} exceeded: {stats.report()}"